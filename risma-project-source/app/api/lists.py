@@ -103,6 +103,8 @@ def delete_list(
     if list_obj.owner_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="権限がありません")
     
+    # リストの重複キーの索引も削除する
+    db.query(models.CompanyKey).filter(models.CompanyKey.list_id == list_id).delete()
     db.delete(list_obj)
     db.commit()
     return list_obj
@@ -1,19 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from typing import Any, List
+from typing import Any, Dict, Iterable, List, Optional
 import asyncio
 import datetime  # ← 修正ポイント！
+import logging
+import os
 
 from app.db.database import get_db
 from app.models import models
 from app.schemas import schemas
-from app.api.auth import get_current_user
+from app.api.auth import get_current_user, get_current_active_superuser
 from app.services.scraper import WebScraper
 from app.services.data_processor import DataProcessor
+from app.services.parallel_normalizer import ParallelNormalizer
+from app.services.checkpoint import CrawlCheckpoint
+from app.services.company_record import CompanyRecord
+from app.services.list_dedup import ListDedupIndex
+from app.services import pipeline
+from app.services.suppression import SuppressionSet, get_suppression_store
+from app.services.budget import CrawlBudget
+from app.services.fetch_broker import get_fetch_broker
+from app.services.crawl_stats import CrawlStats
+from app.services.processing_profile import ProcessingProfile
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-scraper = WebScraper()
+# すべての検索ジョブでプロセス共通のリクエスト枠を分け合う
+scraper = WebScraper(broker=get_fetch_broker())
 data_processor = DataProcessor()
+# 件数の多いジョブの正規化はプロセスプールで並列に行う
+normalizer = ParallelNormalizer(data_processor)
+# すべてのジョブで正規化・重複削除・保存の処理時間を計測する（ジョブごとにはパラメータ profile で指定できる）
+PROFILE_PROCESSING = os.getenv("RISMA_PROFILE_PROCESSING", "").lower() in ("1", "true", "yes")
 
 @router.post("/keyword", response_model=schemas.SearchJob)
 async def create_keyword_search(
@@ -36,7 +56,11 @@ async def create_keyword_search(
         params={
             "keywords": search_params.keywords,
             "exclude_keywords": search_params.exclude_keywords,
-            "max_results": search_params.max_results
+            "max_results": search_params.max_results,
+            "budget": search_params.budget.dict(exclude_none=True) if search_params.budget else None,
+            "suppression_lists": _check_suppression_lists(search_params.suppression_lists),
+            "profile": search_params.profile,
+            "fuzzy_dedup": search_params.fuzzy_dedup,
         },
         status="pending"
     )
@@ -78,7 +102,11 @@ async def create_industry_location_search(
             "industry_codes": search_params.industry_codes,
             "prefectures": search_params.prefectures,
             "cities": search_params.cities,
-            "max_results": search_params.max_results
+            "max_results": search_params.max_results,
+            "budget": search_params.budget.dict(exclude_none=True) if search_params.budget else None,
+            "suppression_lists": _check_suppression_lists(search_params.suppression_lists),
+            "profile": search_params.profile,
+            "fuzzy_dedup": search_params.fuzzy_dedup,
         },
         status="pending"
     )
@@ -125,6 +153,170 @@ def read_search_job(
         raise HTTPException(status_code=403, detail="権限がありません")
     return job
 
+@router.get("/jobs/{job_id}/stats", response_model=Dict[str, Any])
+def read_search_job_stats(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    ジョブのクロールの計測値を取得する（実行中のジョブは現時点の値）
+    """
+    job = db.query(models.SearchJob).filter(models.SearchJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="検索ジョブが見つかりません")
+    if job.user_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="権限がありません")
+    active = scraper.active_stats.get(f"job:{job.id}")
+    if active is not None:
+        return active.to_dict()
+    return job.stats or {}
+
+@router.get("/stats", response_model=Dict[str, Any])
+def read_crawl_stats(
+    current_user: models.User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    プロセス全体のクロールの計測値（完了したクロールの合計と実行中のクロール）を取得する
+    """
+    return {
+        "completed": scraper.stats.to_dict(),
+        "active": {key: stats.to_dict(top_hosts=10) for key, stats in scraper.active_stats.items()},
+        "broker": scraper.broker.snapshot() if scraper.broker is not None else None,
+    }
+
+# 進捗の更新がこの秒数を超えて途絶えたジョブは中断されたものとみなす
+JOB_HEARTBEAT_TIMEOUT = 300
+# 正規化・重複削除・保存の間にハートビートを更新する間隔（秒）
+JOB_HEARTBEAT_INTERVAL = JOB_HEARTBEAT_TIMEOUT / 5
+# 中断ジョブを探す間隔（秒）
+ORPHAN_CHECK_INTERVAL = 60
+
+# 再開したジョブのタスク（GCで破棄されないよう参照を保持する）
+_resumed_tasks = set()
+# このプロセスで実行中のジョブのID（ハートビートが遅れても中断されたジョブとして再開しない）
+_running_jobs = set()
+
+def _load_budget(job: models.SearchJob) -> CrawlBudget:
+    """
+    ジョブのクロール予算を復元する（再開時は前回までの使用量を引き継ぐ）
+    """
+    params = (job.params or {}).get("budget")
+    if params is None and scraper.budget is not None:
+        params = scraper.budget.limits()
+    usage = (job.checkpoint or {}).get("budget")
+    return CrawlBudget.from_params(params, usage=usage)
+
+def _check_suppression_lists(names: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    指定された除外リストが存在することを確かめる
+    """
+    store = get_suppression_store()
+    missing = [name for name in names or [] if name not in store.names()]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"除外リストが見つかりません: {', '.join(missing)}")
+    return names or None
+
+def _load_suppression(job: models.SearchJob) -> Optional[SuppressionSet]:
+    """
+    ジョブに指定された除外リストを読み込む（指定がない場合は None）
+    """
+    return get_suppression_store().load_many((job.params or {}).get("suppression_lists"))
+
+def _profile_for(job: models.SearchJob) -> Optional[ProcessingProfile]:
+    """
+    ジョブの処理時間を計測する場合は計測値の入れ物を返す
+    """
+    if PROFILE_PROCESSING or (job.params or {}).get("profile"):
+        return ProcessingProfile()
+    return None
+
+def _load_checkpoint(db: Session, job: models.SearchJob, budget: CrawlBudget) -> CrawlCheckpoint:
+    """
+    ジョブに保存された進捗からチェックポイントを復元する
+    """
+    records = {
+        record.url: CompanyRecord(record.data)
+        for record in db.query(models.SearchJobRecord)
+        .filter(models.SearchJobRecord.job_id == job.id)
+        .order_by(models.SearchJobRecord.id)
+    }
+
+    def save(checkpoint: CrawlCheckpoint) -> None:
+        try:
+            for url, data in checkpoint.new_records():
+                db.add(models.SearchJobRecord(job_id=job.id, url=url, data=dict(data)))
+            state = checkpoint.to_state()
+            state["budget"] = budget.usage()
+            job.checkpoint = state
+            job.heartbeat_at = datetime.datetime.utcnow()
+            db.add(job)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    return CrawlCheckpoint(state=job.checkpoint, records=records, on_flush=save)
+
+def _heartbeat(db: Session, job: models.SearchJob) -> pipeline.Stage:
+    """
+    クロール後の処理の間もジョブのハートビートを更新する段階（中断されたジョブとして再開されないようにする）
+    """
+    def beat() -> None:
+        job.heartbeat_at = datetime.datetime.utcnow()
+        db.add(job)
+        db.commit()
+
+    return pipeline.heartbeat(beat, JOB_HEARTBEAT_INTERVAL)
+
+def _start_job(db: Session, job_id: int):
+    job = db.query(models.SearchJob).filter(models.SearchJob.id == job_id).first()
+    if not job:
+        return None
+
+    job.status = "processing"
+    job.heartbeat_at = datetime.datetime.utcnow()
+    db.add(job)
+    db.commit()
+    return job
+
+def _store_results(db: Session, job: models.SearchJob, list_id: int, unique: Iterable[dict], budget: CrawlBudget,
+                   stats: CrawlStats = None, profile: ProcessingProfile = None) -> None:
+    """
+    企業データをリストに保存し、ジョブを完了状態にする
+
+    unique はジェネレーターでもよく、まとめて読んだ分ずつ保存する。
+    profile を渡した場合は、処理時間の計測値をジョブの計測値（stats）の processing に保存する。
+    """
+    # リストに保存済みの企業データと重複するものはマージする（まとめて INSERT し、その都度コミットする。
+    # List.total_records には保存した件数が加算される）
+    counts = ListDedupIndex(db, list_id, data_processor, commit=True).store(unique)
+    logger.info(f"Stored results for job {job.id} into list {list_id}: {counts}")
+
+    # 完了したジョブの途中経過は不要
+    db.query(models.SearchJobRecord).filter(models.SearchJobRecord.job_id == job.id).delete()
+    job.checkpoint = None
+
+    job.status = "completed"
+    job.budget_exhausted = budget.exhausted
+    if stats is not None:
+        job.stats = stats.to_dict()
+    if profile is not None:
+        job.stats = {**(job.stats or {}), "processing": profile.to_dict()}
+    job.result_count = sum(counts.values())
+    job.completed_at = datetime.datetime.utcnow()  # ← 修正ポイント！
+    db.add(job)
+    db.commit()
+
+def _fail_job(db: Session, job: models.SearchJob, error: Exception, stats: CrawlStats = None) -> None:
+    db.rollback()
+    job.status = "failed"
+    job.error_message = str(error)
+    if stats is not None:
+        job.stats = stats.to_dict()
+    db.add(job)
+    db.commit()
+
 async def process_keyword_search(
     job_id: int,
     keywords: List[str],
@@ -137,67 +329,43 @@ async def process_keyword_search(
         from app.db.database import SessionLocal
         db = SessionLocal()
 
+    _running_jobs.add(job_id)
     try:
-        job = db.query(models.SearchJob).filter(models.SearchJob.id == job_id).first()
+        job = _start_job(db, job_id)
         if not job:
             return
 
-        job.status = "processing"
-        db.add(job)
-        db.commit()
-
+        stats = CrawlStats()
         try:
-            results = await scraper.search_by_keyword(keywords, max_results)
-
-            if exclude_keywords:
-                results = [
-                    r for r in results
-                    if not any(
-                        k.lower() in r.get("name", "").lower() or k.lower() in r.get("description", "").lower()
-                        for k in exclude_keywords
-                    )
-                ]
-
-            normalized = data_processor.normalize_company_data(results)
-            unique = data_processor.remove_duplicates(normalized)
-
-            for company_data in unique:
-                company = models.Company(
-                    list_id=list_id,
-                    name=company_data.get("name", ""),
-                    address=company_data.get("address", ""),
-                    phone=company_data.get("phone", ""),
-                    email=company_data.get("email", ""),
-                    website=company_data.get("website", ""),
-                    industry=company_data.get("industry", ""),
-                    industry_code=company_data.get("industry_code", ""),
-                    prefecture=company_data.get("prefecture", ""),
-                    city=company_data.get("city", ""),
-                    representative=company_data.get("representative", ""),
-                    has_fax=company_data.get("has_fax", False),
-                    has_contact_form=company_data.get("has_contact_form", False),
-                    source_url=company_data.get("source_url", "")
-                )
-                db.add(company)
-
-            list_obj = db.query(models.List).filter(models.List.id == list_id).first()
-            if list_obj:
-                list_obj.total_records = db.query(models.Company).filter(models.Company.list_id == list_id).count()
-                db.add(list_obj)
-
-            job.status = "completed"
-            job.result_count = len(unique)
-            job.completed_at = datetime.datetime.utcnow()  # ← 修正ポイント！
-            db.add(job)
-            db.commit()
+            budget = _load_budget(job)
+            checkpoint = _load_checkpoint(db, job, budget)
+            suppression = _load_suppression(job)
+            results = await scraper.search_by_keyword(
+                keywords, max_results, checkpoint=checkpoint, budget=budget,
+                job_key=f"job:{job.id}", user_key=f"user:{job.user_id}", stats=stats, suppression=suppression
+            )
+
+            # 除外・正規化・重複削除・保存の間でリストの複製を作らない
+            # （保存までは同期的に行うため、計測の間に他のジョブの処理は混ざらない）
+            profile = _profile_for(job)
+            with data_processor.profiling(profile):
+                unique = pipeline.Pipeline([
+                    pipeline.exclude_keywords(exclude_keywords),
+                    # ParallelNormalizer が並列に処理できる件数ずつ正規化する
+                    pipeline.normalize(normalizer.normalize_records, batch_size=normalizer.min_rows),
+                    _heartbeat(db, job),
+                    pipeline.suppress(suppression),
+                    pipeline.deduplicate(data_processor, fuzzy=(job.params or {}).get("fuzzy_dedup")),
+                    # 保存する件数ずつ読まれるため、保存の間も更新される
+                    _heartbeat(db, job),
+                ]).run(results, profile)
+                _store_results(db, job, list_id, unique, budget, stats, profile)
 
         except Exception as e:
-            job.status = "failed"
-            job.error_message = str(e)
-            db.add(job)
-            db.commit()
+            _fail_job(db, job, e, stats)
 
     finally:
+        _running_jobs.discard(job_id)
         db.close()
 
 async def process_industry_location_search(
@@ -213,59 +381,126 @@ async def process_industry_location_search(
         from app.db.database import SessionLocal
         db = SessionLocal()
 
+    _running_jobs.add(job_id)
     try:
-        job = db.query(models.SearchJob).filter(models.SearchJob.id == job_id).first()
+        job = _start_job(db, job_id)
         if not job:
             return
 
-        job.status = "processing"
-        db.add(job)
-        db.commit()
-
+        stats = CrawlStats()
         try:
-            results = await scraper.search_by_industry_location(industry_codes, prefectures, cities, max_results)
-            normalized = data_processor.normalize_company_data(results)
-            filtered = data_processor.filter_by_location(
-                data_processor.filter_by_industry(normalized, industry_codes),
-                prefectures, cities
+            budget = _load_budget(job)
+            checkpoint = _load_checkpoint(db, job, budget)
+            suppression = _load_suppression(job)
+            results = await scraper.search_by_industry_location(
+                industry_codes, prefectures, cities, max_results, checkpoint=checkpoint, budget=budget,
+                job_key=f"job:{job.id}", user_key=f"user:{job.user_id}", stats=stats, suppression=suppression
             )
-            unique = data_processor.remove_duplicates(filtered)
-
-            for company_data in unique:
-                company = models.Company(
-                    list_id=list_id,
-                    name=company_data.get("name", ""),
-                    address=company_data.get("address", ""),
-                    phone=company_data.get("phone", ""),
-                    email=company_data.get("email", ""),
-                    website=company_data.get("website", ""),
-                    industry=company_data.get("industry", ""),
-                    industry_code=company_data.get("industry_code", ""),
-                    prefecture=company_data.get("prefecture", ""),
-                    city=company_data.get("city", ""),
-                    representative=company_data.get("representative", ""),
-                    has_fax=company_data.get("has_fax", False),
-                    has_contact_form=company_data.get("has_contact_form", False),
-                    source_url=company_data.get("source_url", "")
-                )
-                db.add(company)
-
-            list_obj = db.query(models.List).filter(models.List.id == list_id).first()
-            if list_obj:
-                list_obj.total_records = db.query(models.Company).filter(models.Company.list_id == list_id).count()
-                db.add(list_obj)
-
-            job.status = "completed"
-            job.result_count = len(unique)
-            job.completed_at = datetime.datetime.utcnow()  # ← 修正ポイント！
-            db.add(job)
-            db.commit()
+            profile = _profile_for(job)
+            with data_processor.profiling(profile):
+                unique = pipeline.Pipeline([
+                    # ParallelNormalizer が並列に処理できる件数ずつ正規化する
+                    pipeline.normalize(normalizer.normalize_records, batch_size=normalizer.min_rows),
+                    _heartbeat(db, job),
+                    pipeline.filter_by_industry(data_processor, industry_codes),
+                    pipeline.filter_by_location(data_processor, prefectures, cities),
+                    pipeline.suppress(suppression),
+                    pipeline.deduplicate(data_processor, fuzzy=(job.params or {}).get("fuzzy_dedup")),
+                    # 保存する件数ずつ読まれるため、保存の間も更新される
+                    _heartbeat(db, job),
+                ]).run(results, profile)
+                _store_results(db, job, list_id, unique, budget, stats, profile)
 
         except Exception as e:
-            job.status = "failed"
-            job.error_message = str(e)
-            db.add(job)
-            db.commit()
+            _fail_job(db, job, e, stats)
 
     finally:
+        _running_jobs.discard(job_id)
         db.close()
+
+def find_orphaned_jobs(db: Session, now: datetime.datetime = None) -> List[models.SearchJob]:
+    """
+    進捗の更新が途絶えた未完了のジョブ（プロセス再起動などで中断されたもの）を探す
+    （このプロセスで実行中のジョブは除く）
+    """
+    now = now or datetime.datetime.utcnow()
+    threshold = now - datetime.timedelta(seconds=JOB_HEARTBEAT_TIMEOUT)
+    return db.query(models.SearchJob).filter(
+        models.SearchJob.status.in_(["pending", "processing"]),
+        models.SearchJob.id.not_in(_running_jobs),
+        or_(
+            models.SearchJob.heartbeat_at < threshold,
+            and_(models.SearchJob.heartbeat_at.is_(None), models.SearchJob.updated_at < threshold),
+        ),
+    ).all()
+
+def _claim_job(db: Session, job_id: int, observed_heartbeat: datetime.datetime = None) -> bool:
+    """
+    他のワーカーと重複して再開しないよう、観測時のハートビートを条件に更新してジョブを確保する
+    """
+    heartbeat_condition = (
+        models.SearchJob.heartbeat_at.is_(None) if observed_heartbeat is None
+        else models.SearchJob.heartbeat_at == observed_heartbeat
+    )
+    claimed = db.query(models.SearchJob).filter(
+        models.SearchJob.id == job_id, heartbeat_condition
+    ).update({models.SearchJob.heartbeat_at: datetime.datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def _resume_job(job: models.SearchJob):
+    params = job.params or {}
+    if job.job_type == "keyword":
+        return process_keyword_search(
+            job.id,
+            params.get("keywords", []),
+            params.get("exclude_keywords"),
+            params.get("max_results", 1000),
+            job.list_id
+        )
+    if job.job_type == "industry_location":
+        return process_industry_location_search(
+            job.id,
+            params.get("industry_codes", []),
+            params.get("prefectures"),
+            params.get("cities"),
+            params.get("max_results", 1000),
+            job.list_id
+        )
+    return None
+
+def resume_orphaned_jobs() -> int:
+    """
+    中断されたジョブを最後のチェックポイントから再開する
+    """
+    from app.db.database import SessionLocal
+    db = SessionLocal()
+    resumed = 0
+    try:
+        # コミットで再読み込みされる前に、検出時点のハートビートを控えておく
+        candidates = [(job, job.heartbeat_at) for job in find_orphaned_jobs(db)]
+        for job, observed_heartbeat in candidates:
+            if not _claim_job(db, job.id, observed_heartbeat):
+                continue
+            coroutine = _resume_job(job)
+            if coroutine is None:
+                continue
+            logger.info(f"Resuming orphaned search job {job.id} ({job.job_type})")
+            task = asyncio.create_task(coroutine)
+            _resumed_tasks.add(task)
+            task.add_done_callback(_resumed_tasks.discard)
+            resumed += 1
+    finally:
+        db.close()
+    return resumed
+
+async def watch_orphaned_jobs(interval: float = ORPHAN_CHECK_INTERVAL) -> None:
+    """
+    中断されたジョブを定期的に検出して再開する
+    """
+    while True:
+        try:
+            resume_orphaned_jobs()
+        except Exception as e:
+            logger.error(f"Error resuming orphaned search jobs: {str(e)}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Any, List
+import os
+import shutil
+import tempfile
+
+from app.models import models
+from app.schemas import schemas
+from app.api.auth import get_current_user, get_current_manager_or_superuser
+from app.services.suppression import get_suppression_store
+
+router = APIRouter()
+
+@router.get("/", response_model=List[schemas.SuppressionList])
+def read_suppression_lists(
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    除外リストの一覧を取得する
+    """
+    store = get_suppression_store()
+    return [store.load(name).info() for name in store.names()]
+
+@router.put("/{name}", response_model=schemas.SuppressionList)
+def upload_suppression_list(
+    name: str,
+    file: UploadFile = File(...),
+    current_user: models.User = Depends(get_current_manager_or_superuser)
+) -> Any:
+    """
+    CSVファイル（電話番号・ドメインまたはURL・メールアドレスの列）から除外リストを作成する（同じ名前の除外リストは置き換える）
+    """
+    store = get_suppression_store()
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as temp:
+        shutil.copyfileobj(file.file, temp)
+    try:
+        suppression = store.import_csv(name, temp.name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(temp.name)
+    return suppression.info()
+
+@router.delete("/{name}", response_model=schemas.SuppressionList)
+def delete_suppression_list(
+    name: str,
+    current_user: models.User = Depends(get_current_manager_or_superuser)
+) -> Any:
+    """
+    除外リストを削除する
+    """
+    store = get_suppression_store()
+    try:
+        info = store.load(name).info()
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=404, detail="除外リストが見つかりません")
+    store.delete(name)
+    return info
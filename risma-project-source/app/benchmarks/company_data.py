@@ -0,0 +1,225 @@
+"""
+DataProcessor の計測用に、実際の収集結果に近い日本の企業データを生成する
+
+    python -m app.benchmarks.company_data --rows 100000 --output companies.csv
+
+会社名は行ごとに異なる組み合わせから作り、dirty_rate の割合で表記ゆれ（法人格の略称・全角英数字・
+電話番号の区切り・都道府県の省略・余分な空白など）を加える。duplicate_rate の割合の行は、
+それより前の行の企業を別の表記で書いた重複（一部の項目が欠けたもの）になる。
+同じ引数からは常に同じデータを生成する。
+"""
+import argparse
+import csv
+import random
+from typing import Dict, Any, Iterator
+
+from app.benchmarks.synthetic_web import INDUSTRIES, LOCATIONS
+from app.services.text_normalizer import LEGAL_FORMS
+
+# 生成するデータの版（生成規則を変えた場合は上げ、計測の基準値を取り直す）
+GENERATOR_VERSION = 1
+
+# 会社名に使う語彙（3語と業態の組み合わせで約170万通り）
+NAME_PARTS = ["サン", "テック", "ミライ", "アオバ", "ヒカリ", "ニッポン", "グローバル", "フロンティア",
+              "さくら", "みどり", "大和", "東邦", "中央", "富士", "ユニオン", "アルファ", "コスモ", "ネクスト",
+              "エース", "ライフ", "アース", "スカイ", "ブルー", "日本", "東洋", "北斗", "青山", "丸福",
+              "三光", "平和", "昭和", "光洋", "松竹", "双葉", "若葉", "朝日", "旭", "扇", "協和", "共栄",
+              "太陽", "明星", "銀河", "港", "新栄", "栄光", "和光", "信和"]
+NAME_SUFFIXES = ["", "商事", "工業", "建設", "電機", "システムズ", "物産", "食品", "不動産", "運輸",
+                 "ソリューションズ", "製作所", "興産", "技研", "企画", "サービス"]
+DOMAIN_WORDS = ["sun", "tech", "mirai", "aoba", "hikari", "nippon", "global", "frontier", "sakura", "midori",
+                "yamato", "toho", "chuo", "fuji", "union", "alpha", "cosmo", "next", "ace", "life", "earth",
+                "sky", "blue", "nihon", "toyo", "hokuto", "aoyama", "marufuku", "sanko", "heiwa", "showa",
+                "koyo", "shochiku", "futaba", "wakaba", "asahi", "kyokuto", "ogi", "kyowa", "kyoei", "taiyo",
+                "myojo", "ginga", "minato", "shinei", "eiko", "wako", "shinwa"]
+# (法人格, 会社名の前に付けるか)
+COMPANY_FORMS = [("株式会社", True), ("株式会社", False), ("有限会社", True), ("合同会社", True)]
+AREA_CODES = {"東京都": "03", "大阪府": "06", "神奈川県": "045", "愛知県": "052", "福岡県": "092",
+              "北海道": "011", "宮城県": "022", "京都府": "075"}
+REPRESENTATIVES = ["山田太郎", "佐藤花子", "鈴木一郎", "高橋次郎", "田中美咲", "伊藤健", "渡辺直樹", "中村陽子"]
+EMAIL_USERS = ["info", "contact", "sales", "support"]
+
+_NAME_SPACE = len(NAME_PARTS) ** 3 * len(NAME_SUFFIXES)
+# 行番号から会社名の組み合わせへの並べ替え（_NAME_SPACE と互いに素な奇数の乗数）
+_NAME_STRIDE = 1_000_003
+
+_FULLWIDTH = str.maketrans(
+    "0123456789-()ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+    "０１２３４５６７８９－（）ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ",
+)
+
+
+def to_fullwidth(text: str) -> str:
+    return text.translate(_FULLWIDTH)
+
+
+def company_base(index: int) -> Dict[str, Any]:
+    """
+    行番号から決定的に企業の表記ゆれのない値を作る（行番号ごとに会社名が異なる）
+    """
+    code = (index * _NAME_STRIDE) % _NAME_SPACE
+    code, suffix = divmod(code, len(NAME_SUFFIXES))
+    parts = []
+    for _ in range(3):
+        code, part = divmod(code, len(NAME_PARTS))
+        parts.append(part)
+    rng = random.Random(index)
+    form, prefix = COMPANY_FORMS[index % len(COMPANY_FORMS)]
+    base = "".join(NAME_PARTS[part] for part in parts) + NAME_SUFFIXES[suffix]
+    domain = "-".join(DOMAIN_WORDS[part] for part in parts) + f"{suffix or ''}.co.jp"
+    prefecture, city, _ = rng.choice(LOCATIONS)
+    area = AREA_CODES.get(prefecture, "0" + str(rng.randint(120, 999)))
+    local = f"{rng.randint(1000, 9999)}{rng.randint(0, 9999):04d}"[:10 - len(area)]
+    return {
+        "name": f"{form}{base}" if prefix else f"{base}{form}",
+        "block": f"{rng.randint(1, 9)}-{rng.randint(1, 30)}-{rng.randint(1, 20)}",
+        "building": f"{rng.choice(['第一', '中央', 'センター'])}ビル{rng.randint(2, 12)}階" if rng.random() < 0.4 else "",
+        "phone": f"{area}-{local[:-4]}-{local[-4:]}",
+        "email": f"{rng.choice(EMAIL_USERS)}@{domain}",
+        "website": f"https://www.{domain}/",
+        "industry": rng.choice(INDUSTRIES),
+        "prefecture": prefecture,
+        "city": city,
+        "representative": rng.choice(REPRESENTATIVES),
+        "established_year": rng.randint(1950, 2022),
+        "capital": rng.choice([300, 1000, 3000, 5000, 10000]),
+        "employees": rng.randint(3, 3000),
+        "has_fax": rng.random() < 0.6,
+        "has_contact_form": rng.random() < 0.5,
+    }
+
+
+def dirty_name(name: str, rng: random.Random) -> str:
+    variant = rng.randrange(5)
+    for full, short in LEGAL_FORMS.items():
+        if full in name:
+            if variant == 0:
+                return name.replace(full, short)
+            if variant == 1:
+                return name.replace(full, "（" + short[1:-1] + "）") if short.startswith("(") else name
+            if variant == 2:
+                return name.replace(full, full + "　") if name.startswith(full) else "　" + name
+            break
+    if variant == 3:
+        return to_fullwidth(name) + " "
+    return "\t" + name + "\n"
+
+
+def dirty_phone(phone: str, rng: random.Random) -> str:
+    digits = phone.replace("-", "")
+    area, local, number = phone.split("-")
+    return rng.choice([
+        digits,
+        f"({area}){local}-{number}",
+        to_fullwidth(phone),
+        f"{area} {local} {number}",
+        f"TEL:{phone}",
+        f"+81-{area[1:]}-{local}-{number}",
+    ])
+
+
+def dirty_address(company: Dict[str, Any], rng: random.Random) -> str:
+    prefecture, city, block = company["prefecture"], company["city"], company["block"]
+    building = " " + company["building"] if company["building"] else ""
+    variant = rng.randrange(4)
+    if variant == 0:
+        return to_fullwidth(f"{prefecture}{city}{block}") + building
+    if variant == 1:
+        # 都道府県を省略する（市区町村から補う必要がある）
+        return f"{city}{block}{building}"
+    if variant == 2:
+        chome, banchi, go = block.split("-")
+        return f"{prefecture}{city}{chome}丁目{banchi}番{go}号{building}"
+    return f" {prefecture} {city}{block}{building}"
+
+
+def render_company(index: int, rng: random.Random, dirty: bool, partial: bool) -> Dict[str, Any]:
+    """
+    企業の値を収集結果の形（scraper の項目）にする（dirty: 表記ゆれを加える, partial: 一部の項目を欠く）
+    """
+    company = company_base(index)
+    address = f"{company['prefecture']}{company['city']}{company['block']}"
+    if company["building"]:
+        address += " " + company["building"]
+    record = {
+        "name": company["name"],
+        "address": address,
+        "phone": company["phone"],
+        "email": company["email"],
+        "website": company["website"],
+        "industry": company["industry"],
+        "prefecture": company["prefecture"],
+        "city": company["city"],
+        "representative": "代表取締役 " + company["representative"],
+        "established_year": company["established_year"],
+        "capital": company["capital"],
+        "employees": company["employees"],
+        "has_fax": company["has_fax"],
+        "has_contact_form": company["has_contact_form"],
+        "source_url": company["website"] + ("company/" if rng.random() < 0.5 else "about.html"),
+    }
+    if dirty:
+        record["name"] = dirty_name(record["name"], rng)
+        record["phone"] = dirty_phone(record["phone"], rng)
+        record["address"] = dirty_address(company, rng)
+        record["industry"] = to_fullwidth(record["industry"]) if rng.random() < 0.5 else " " + record["industry"]
+        # 住所から都道府県・市区町村を求める必要のある行
+        record["prefecture"] = ""
+        record["city"] = ""
+    if partial:
+        for key in rng.sample(["phone", "email", "website", "industry", "representative", "address"], 2):
+            record[key] = ""
+    return record
+
+
+def generate_companies(rows: int, duplicate_rate: float = 0.1, dirty_rate: float = 0.3,
+                       seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    企業データを rows 件生成する（重複はそれより前に生成した企業の別の表記）
+    """
+    rng = random.Random(seed)
+    unique = 0
+    for _ in range(rows):
+        if unique and rng.random() < duplicate_rate:
+            yield render_company(rng.randrange(unique), rng, dirty=True, partial=rng.random() < 0.5)
+        else:
+            yield render_company(unique, rng, dirty=rng.random() < dirty_rate, partial=rng.random() < 0.05)
+            unique += 1
+
+
+# CSVの列名（DataProcessor.standardize_column_names で標準の列名になる名前）
+CSV_COLUMNS = {
+    "name": "会社名", "address": "住所", "phone": "電話番号", "email": "メールアドレス", "website": "URL",
+    "industry": "業種", "representative": "代表者", "established_year": "設立年", "capital": "資本金",
+    "employees": "従業員数",
+}
+
+
+def write_csv(path: str, companies: Iterator[Dict[str, Any]], encoding: str = "utf-8") -> int:
+    """
+    企業データを取り込み用のCSVファイル（日本語の列名）に書き出し、書き出した行数を返す
+    """
+    rows = 0
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS.values())
+        for company in companies:
+            writer.writerow([company[key] for key in CSV_COLUMNS])
+            rows += 1
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="計測用の企業データを生成する")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--dirty-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+    rows = write_csv(args.output, generate_companies(args.rows, args.duplicate_rate, args.dirty_rate, args.seed))
+    print(f"{rows} rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+企業データのリストへの保存の処理速度（行/秒）の計測
+
+    python -m app.benchmarks.company_insert_benchmark                          # 基準値と比較（劣化していれば終了コード1）
+    python -m app.benchmarks.company_insert_benchmark --sizes 10000 100000     # 件数を指定する
+    python -m app.benchmarks.company_insert_benchmark --update-baseline        # 基準値を更新
+
+入力は company_data.generate_companies で生成した企業データ。保存の方法ごとに、一時ファイルの SQLite の
+新しいデータベースに保存する時間を測る（ORM で1件ずつ db.add する以前の方法と、CompanyWriter の Core の INSERT）。
+処理時間は extraction_benchmark と同じく、キャリブレーションの時間との比で基準値と比較する。
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.benchmarks.company_data import GENERATOR_VERSION, generate_companies
+from app.benchmarks.data_processor_benchmark import DEFAULT_SIZES, scaling
+from app.benchmarks.extraction_benchmark import BASELINE_DIR, DEFAULT_TOLERANCE, calibrate
+from app.db.database import Base
+from app.models import models
+from app.services.company_record import CompanyRecord, as_record
+from app.services.company_writer import COMPANY_INSERT_BATCH_SIZE, CompanyWriter
+from app.services.list_dedup import ListDedupIndex
+from app.services.pipeline import batched
+
+LIST_ID = 1
+
+
+def orm_insert(db: Session, records: List[CompanyRecord], batch_size: int) -> int:
+    """
+    以前の保存方法（1件ずつ ORM のオブジェクトを db.add し、最後に件数を数え直す）
+    """
+    for batch in batched(records, batch_size):
+        for record in batch:
+            db.add(models.Company(list_id=LIST_ID, **record.column_values()))
+        db.commit()
+    list_obj = db.get(models.List, LIST_ID)
+    list_obj.total_records = db.query(models.Company).filter(models.Company.list_id == LIST_ID).count()
+    db.commit()
+    return len(records)
+
+
+def insert_cases(batch_size: int) -> Dict[str, Callable[[Session, List[CompanyRecord]], Any]]:
+    """
+    保存の方法ごとの計測する関数（リストは空の状態から保存する）
+    """
+    return {
+        "orm_add": lambda db, records: orm_insert(db, records, batch_size),
+        "core_executemany": lambda db, records: CompanyWriter(db, LIST_ID, batch_size).write(records),
+        "core_returning": lambda db, records: CompanyWriter(db, LIST_ID, batch_size, returning=True).write(records),
+        # 検索ジョブの保存（重複キーの照会・マージを含む）
+        "list_dedup_store": lambda db, records: ListDedupIndex(db, LIST_ID, chunk_size=min(batch_size, 500),
+                                                               commit=True).store(records),
+    }
+
+
+def measure(func: Callable[[Session, List[CompanyRecord]], Any], records: List[CompanyRecord],
+            iterations: int, directory: str) -> float:
+    """
+    新しいデータベースへの保存にかかる時間の最短（秒）
+    """
+    best = None
+    for iteration in range(iterations):
+        path = os.path.join(directory, f"insert_{iteration}.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        db.add(models.List(id=LIST_ID, title="benchmark"))
+        db.commit()
+        gc.collect()
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            func(db, records)
+            elapsed = time.perf_counter() - started
+        finally:
+            if enabled:
+                gc.enable()
+            db.close()
+            engine.dispose()
+            os.remove(path)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class CompanyInsertBenchmark:
+    """
+    件数ごと・保存の方法ごとの処理速度を計測するクラス
+    """
+    def __init__(self, sizes: Optional[List[int]] = None, iterations: int = 1,
+                 methods: Optional[List[str]] = None, batch_size: int = COMPANY_INSERT_BATCH_SIZE, seed: int = 0):
+        self.sizes = sorted(sizes or DEFAULT_SIZES)
+        self.iterations = iterations
+        self.batch_size = batch_size
+        self.seed = seed
+        cases = insert_cases(batch_size)
+        unknown = [name for name in methods or [] if name not in cases]
+        if unknown:
+            raise ValueError(f"Unknown methods: {unknown}")
+        self.cases = {name: case for name, case in cases.items() if not methods or name in methods}
+
+    def run(self, progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        metrics: Dict[str, Dict[str, Any]] = {name: {} for name in self.cases}
+        directory = tempfile.mkdtemp(prefix="risma_insert_")
+        try:
+            for rows in self.sizes:
+                records = [as_record(record) for record in generate_companies(rows, seed=self.seed)]
+                for name, case in self.cases.items():
+                    seconds = measure(case, records, self.iterations, directory)
+                    metrics[name][str(rows)] = {"seconds": round(seconds, 6), "rows_per_sec": round(rows / seconds, 1)}
+                    if progress:
+                        progress(f"{name:<20} {rows:>9} rows  {rows / seconds:12.0f} rows/s")
+                del records
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        return {
+            "generator_version": GENERATOR_VERSION,
+            "batch_size": self.batch_size,
+            "calibration_seconds": calibrate(),
+            "metrics": metrics,
+        }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    基準値と同じ件数・保存の方法で、tolerance を超えて遅くなった項目を返す
+    """
+    if baseline.get("generator_version") != report["generator_version"]:
+        raise ValueError(f"Baseline is for generator v{baseline.get('generator_version')}, "
+                         f"but the report is for v{report['generator_version']}")
+    regressions = []
+    for name, base_metric in baseline["metrics"].items():
+        metric = report["metrics"].get(name, {})
+        for rows, base in base_metric.items():
+            current = metric.get(rows)
+            if not current:
+                continue
+            ratio = ((current["seconds"] / report["calibration_seconds"])
+                     / (base["seconds"] / baseline["calibration_seconds"]))
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name}@{rows}: {ratio:.2f}x slower than baseline")
+    return regressions
+
+
+def baseline_path(version: int = GENERATOR_VERSION) -> str:
+    return os.path.join(BASELINE_DIR, f"company_insert_v{version}.json")
+
+
+def format_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    lines = [f"calibration {report['calibration_seconds'] * 1000:.2f} ms  batch_size {report['batch_size']}"]
+    orm = report["metrics"].get("orm_add", {})
+    for name, metric in report["metrics"].items():
+        base_metric = (baseline or {}).get("metrics", {}).get(name, {})
+        for rows, values in metric.items():
+            base = base_metric.get(rows)
+            ratio = "-"
+            if base:
+                ratio = (f"{(values['seconds'] / report['calibration_seconds']) / (base['seconds'] / baseline['calibration_seconds']):.2f}x")
+            # ORM で1件ずつ保存した場合に対する速さ
+            speedup = f"{orm[rows]['seconds'] / values['seconds']:.1f}x" if rows in orm else "-"
+            lines.append(f"  {name:<20} {int(rows):>9}  {values['rows_per_sec']:12.0f} rows/s  {speedup:>6} vs orm  {ratio:>6}")
+        curve = scaling(metric)
+        if curve:
+            lines.append(f"  {'':<20} scaling " + "  ".join(f"{span}: {exponent:.2f}" for span, exponent in curve.items()))
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="企業データの保存のスループットのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--methods", nargs="+")
+    parser.add_argument("--iterations", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=COMPANY_INSERT_BATCH_SIZE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    benchmark = CompanyInsertBenchmark(sizes=args.sizes, iterations=args.iterations, methods=args.methods,
+                                       batch_size=args.batch_size)
+    report = benchmark.run(progress=lambda line: print(line, file=sys.stderr))
+    path = baseline_path()
+
+    if args.update_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(format_report(report))
+        print(f"Baseline written to {path}")
+        return
+
+    baseline = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    regressions = compare(report, baseline, args.tolerance) if baseline else []
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
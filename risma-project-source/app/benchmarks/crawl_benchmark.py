@@ -0,0 +1,296 @@
+"""
+合成Webに対してクロールを実行し、同時実行数ごとのスループット・レイテンシ・メモリ使用量を計測する
+
+    python -m app.benchmarks.crawl_benchmark --concurrency 5,10,20 --jobs 4 --max-results 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+import aiohttp
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.benchmarks.synthetic_web import SyntheticWebConfig, SyntheticWebServer, INDUSTRIES, configure_scraper
+from app.db.database import Base
+from app.models import models
+from app.services.data_processor import DataProcessor
+from app.services.fetch_broker import FetchBroker
+from app.services.scraper import WebScraper
+from app.services.transport import LiveTransport
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover
+    psutil = None
+
+# ジョブの種類ごとの検索条件（合成Webは検索語から決定的に結果を返す）
+KEYWORD_SETS = [["システム開発"], ["物流", "倉庫"], ["不動産"], ["製造", "部品"], ["人材紹介"], ["飲食店"]]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    最近傍順位法による百分位数
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class PeakRSSSampler:
+    """
+    計測中のプロセスの最大常駐メモリ（RSS）を一定間隔で記録する
+    """
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process = psutil.Process(os.getpid()) if psutil is not None else None
+
+    def _rss(self) -> int:
+        if self._process is not None:
+            return self._process.memory_info().rss
+        # psutil がない場合はプロセス開始以降の最大値（Linux では KB 単位）
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakRSSSampler":
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+class CrawlBenchmark:
+    """
+    合成Webに対して複数のジョブを同時に実行する
+
+    mode が "scraper" の場合は search_* のみ、"pipeline" の場合は process_*_search で正規化・保存まで実行する。
+    """
+    def __init__(self, base_url: str, mode: str = "pipeline", jobs: int = 4, max_results: int = 100,
+                 global_limit: Optional[int] = None, timeout: int = 30):
+        self.base_url = base_url
+        self.mode = mode
+        self.jobs = jobs
+        self.max_results = max_results
+        self.global_limit = global_limit
+        self.timeout = timeout
+
+    def job_specs(self) -> List[Dict[str, Any]]:
+        """
+        キーワード検索と業種・地域検索を交互に並べたジョブ一覧
+        """
+        industry_codes = DataProcessor().industry_code_mapping
+        specs = []
+        for i in range(self.jobs):
+            if i % 2 == 0:
+                specs.append({"job_type": "keyword", "keywords": KEYWORD_SETS[(i // 2) % len(KEYWORD_SETS)]})
+            else:
+                specs.append({"job_type": "industry_location",
+                              "industry_codes": [industry_codes[INDUSTRIES[(i // 2) % len(INDUSTRIES)]]]})
+        return specs
+
+    def make_scraper(self, concurrency: int) -> WebScraper:
+        broker = FetchBroker(self.global_limit) if self.global_limit else None
+        scraper = WebScraper(max_concurrent_requests=concurrency, timeout=self.timeout,
+                             delay_between_requests=0.0, broker=broker)
+        scraper.transport = LiveTransport(scraper.headers)
+        configure_scraper(scraper, self.base_url)
+        return scraper
+
+    async def _server_stats(self, reset: bool = False) -> Dict[str, int]:
+        async with aiohttp.ClientSession() as session:
+            if reset:
+                async with session.post(self.base_url + "/__reset") as response:
+                    return await response.json()
+            async with session.get(self.base_url + "/__stats") as response:
+                return await response.json()
+
+    async def _run_scraper_job(self, scraper: WebScraper, spec: Dict[str, Any], index: int) -> int:
+        if spec["job_type"] == "keyword":
+            results = await scraper.search_by_keyword(spec["keywords"], self.max_results,
+                                                      job_key=f"bench:{index}", user_key=f"bench:{index}")
+        else:
+            results = await scraper.search_by_industry_location(spec["industry_codes"], max_results=self.max_results,
+                                                                job_key=f"bench:{index}", user_key=f"bench:{index}")
+        return len(results)
+
+    async def _run_pipeline_job(self, session_factory, spec: Dict[str, Any], list_id: int, user_id: int) -> int:
+        from app.api import search
+
+        db = session_factory()
+        job = models.SearchJob(list_id=list_id, user_id=user_id, job_type=spec["job_type"],
+                               status="pending", params={**spec, "max_results": self.max_results})
+        db.add(job)
+        db.commit()
+        job_id = job.id
+        db.close()
+
+        if spec["job_type"] == "keyword":
+            await search.process_keyword_search(job_id, spec["keywords"], None, self.max_results,
+                                                list_id, db=session_factory())
+        else:
+            await search.process_industry_location_search(job_id, spec["industry_codes"], None, None,
+                                                           self.max_results, list_id, db=session_factory())
+
+        db = session_factory()
+        try:
+            job = db.query(models.SearchJob).filter(models.SearchJob.id == job_id).first()
+            if job.status != "completed":
+                raise RuntimeError(f"Benchmark job {job_id} {job.status}: {job.error_message}")
+            return job.result_count
+        finally:
+            db.close()
+
+    @contextmanager
+    def _pipeline_database(self):
+        """
+        計測用の一時SQLiteデータベースとリストを用意する
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+                                   connect_args={"check_same_thread": False})
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            db = session_factory()
+            user = models.User(email="bench@example.com", hashed_password="", full_name="benchmark")
+            db.add(user)
+            db.commit()
+            list_obj = models.List(title="benchmark", owner_id=user.id)
+            db.add(list_obj)
+            db.commit()
+            ids = (list_obj.id, user.id)
+            db.close()
+            try:
+                yield session_factory, ids
+            finally:
+                engine.dispose()
+
+    async def run(self, concurrency: int) -> Dict[str, Any]:
+        """
+        1つの同時実行数の設定で全ジョブを実行し、計測結果を返す
+        """
+        from app.api import search
+
+        scraper = self.make_scraper(concurrency)
+        specs = self.job_specs()
+        latencies: List[float] = []
+
+        async def timed(coro) -> int:
+            started = time.perf_counter()
+            count = await coro
+            latencies.append(time.perf_counter() - started)
+            return count
+
+        await self._server_stats(reset=True)
+        with PeakRSSSampler() as rss:
+            started = time.perf_counter()
+            if self.mode == "pipeline":
+                original_scraper = search.scraper
+                search.scraper = scraper
+                try:
+                    with self._pipeline_database() as (session_factory, (list_id, user_id)):
+                        counts = await asyncio.gather(*[
+                            timed(self._run_pipeline_job(session_factory, spec, list_id, user_id)) for spec in specs
+                        ])
+                finally:
+                    search.scraper = original_scraper
+            else:
+                counts = await asyncio.gather(*[
+                    timed(self._run_scraper_job(scraper, spec, i)) for i, spec in enumerate(specs)
+                ])
+            elapsed = time.perf_counter() - started
+        server = await self._server_stats()
+
+        companies = sum(counts)
+        return {
+            "concurrency": concurrency,
+            "global_limit": self.global_limit,
+            "mode": self.mode,
+            "jobs": len(specs),
+            "companies": companies,
+            "requests": server["requests"],
+            "errors": server["errors"],
+            "bytes": server["bytes"],
+            "elapsed_seconds": round(elapsed, 3),
+            "companies_per_sec": round(companies / elapsed, 2) if elapsed else 0.0,
+            "requests_per_sec": round(server["requests"] / elapsed, 2) if elapsed else 0.0,
+            "job_latency_p50": round(percentile(latencies, 50), 3),
+            "job_latency_p99": round(percentile(latencies, 99), 3),
+            "job_latency_mean": round(statistics.mean(latencies), 3) if latencies else 0.0,
+            "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+            "bottleneck": scraper.stats.bottleneck(),
+            "time_breakdown": scraper.stats.time_breakdown(),
+        }
+
+    async def sweep(self, concurrency_levels: List[int]) -> List[Dict[str, Any]]:
+        return [await self.run(concurrency) for concurrency in concurrency_levels]
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    columns = ["concurrency", "companies", "requests", "errors", "elapsed_seconds", "companies_per_sec",
+               "requests_per_sec", "job_latency_p50", "job_latency_p99", "peak_rss_mb", "bottleneck"]
+    widths = [max(len(column), *(len(str(row[column])) for row in results)) for column in columns]
+    lines = ["  ".join(column.rjust(width) for column, width in zip(columns, widths))]
+    for row in results:
+        lines.append("  ".join(str(row[column]).rjust(width) for column, width in zip(columns, widths)))
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成Webに対するクロールのスケーリング計測")
+    parser.add_argument("--concurrency", default="1,5,10,20", help="ジョブあたりの同時リクエスト数（カンマ区切り）")
+    parser.add_argument("--global-limit", type=int, default=None, help="FetchBroker によるプロセス全体の上限")
+    parser.add_argument("--mode", choices=["scraper", "pipeline"], default="pipeline")
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--max-results", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--companies", type=int, default=10000)
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--page-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果をJSONで書き出すパス")
+    args = parser.parse_args()
+
+    config = SyntheticWebConfig(
+        companies=args.companies, results_per_page=args.results_per_page, latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma, error_rate=args.error_rate, page_size=args.page_size, seed=args.seed,
+    )
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+
+    with SyntheticWebServer(config, port=args.port) as server:
+        benchmark = CrawlBenchmark(server.base_url, mode=args.mode, jobs=args.jobs,
+                                   max_results=args.max_results, global_limit=args.global_limit)
+        results = asyncio.run(benchmark.sweep(levels))
+
+    print(format_table(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": config.to_dict(), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+DataProcessor の公開メソッドごとの処理速度（行/秒）とピークメモリの計測
+
+    python -m app.benchmarks.data_processor_benchmark                          # 基準値と比較（劣化していれば終了コード1）
+    python -m app.benchmarks.data_processor_benchmark --sizes 10000 100000     # 件数を指定する
+    python -m app.benchmarks.data_processor_benchmark --update-baseline        # 基準値を更新
+
+入力は company_data.generate_companies で生成した企業データ（表記ゆれと重複を含む）。
+件数ごとに計測し、件数を増やしたときの処理時間の伸び（スケーリングの指数。線形なら1）も基準値と比較する。
+処理時間は extraction_benchmark と同じく、キャリブレーションの時間との比で比較する。
+ピークメモリは tracemalloc で測った、入力を用意した後にメソッドが追加で確保したメモリの最大値。
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import cached_property
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import pandas as pd
+
+from app.benchmarks.company_data import GENERATOR_VERSION, generate_companies, write_csv
+from app.benchmarks.extraction_benchmark import BASELINE_DIR, DEFAULT_TOLERANCE, calibrate
+from app.services.company_record import as_record
+from app.services.data_processor import DataProcessor
+from app.services.suppression import SuppressionList
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+# スケーリングの指数の許容幅（線形の処理が O(n log n) 程度になったものまでは許容する）
+SCALING_TOLERANCE = 0.25
+# 1つの計測の繰り返しに使う時間の下限と上限（秒。短い処理は下限に達するまで繰り返して最短を取る）
+MIN_SAMPLE_SECONDS = 0.2
+MAX_SAMPLE_SECONDS = 10.0
+
+# 行数によらない処理や、データを処理しないため計測しない公開メソッド
+NOT_MEASURED = {
+    "standardize_column_names": "列名だけを処理する",
+    "memo_stats": "メモの統計を返すだけ",
+    "clear_memos": "計測の前に毎回呼ぶ",
+    "profiling": "計測を有効にするだけ",
+}
+
+
+class BenchmarkData:
+    """
+    1つの件数の計測に使う入力（必要になったものだけ作る）
+    """
+    def __init__(self, processor: DataProcessor, rows: int, directory: str, seed: int = 0):
+        self.processor = processor
+        self.rows = rows
+        self.directory = directory
+        self.seed = seed
+
+    @cached_property
+    def records(self) -> List[Dict[str, Any]]:
+        # WebScraper と同じく CompanyRecord のリスト
+        return [as_record(company) for company in generate_companies(self.rows, seed=self.seed)]
+
+    @cached_property
+    def normalized(self) -> List[Dict[str, Any]]:
+        # 重複削除・絞り込みは正規化した後のデータに対して行う
+        return self.processor.normalize_company_data_batch(self.records)
+
+    @cached_property
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame([record.to_dict() for record in self.records])
+
+    @cached_property
+    def normalized_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([record.to_dict() for record in self.normalized])
+
+    def column(self, key: str) -> List[str]:
+        return [record.get(key, "") for record in self.records]
+
+    @cached_property
+    def csv_path(self) -> str:
+        path = os.path.join(self.directory, f"companies-{self.rows}.csv")
+        write_csv(path, iter(self.records))
+        return path
+
+    @cached_property
+    def csv_text(self) -> str:
+        with open(self.csv_path, encoding="utf-8") as f:
+            return f.read()
+
+    @cached_property
+    def suppression(self) -> SuppressionList:
+        # 生成した企業の1割の電話番号を除外する
+        phones = self.normalized_frame["phone"].iloc[::10]
+        return SuppressionList.build(("phone", phone) for phone in phones)
+
+    def release(self) -> None:
+        """
+        レコードのリスト以外の入力を解放する（1,000,000件でも入力をすべて同時にメモリに置かない）
+        """
+        for name in ("frame", "normalized_frame", "csv_text", "suppression"):
+            self.__dict__.pop(name, None)
+
+    def output_path(self, suffix: str) -> str:
+        return os.path.join(self.directory, f"output-{self.rows}{suffix}")
+
+
+def _consume(iterator) -> int:
+    return sum(1 for _ in iterator)
+
+
+def benchmark_cases(processor: DataProcessor) -> Dict[str, Callable[[BenchmarkData], Callable[[], Any]]]:
+    """
+    計測項目ごとに、入力から「計測する処理」を作る関数（入力の準備は計測に含めない）
+    """
+    p = processor
+    industries = ["233", "220"]
+    return {
+        "normalize_company_data": lambda d: (lambda records=d.records: p.normalize_company_data(records)),
+        "normalize_company_data_batch": lambda d: (lambda records=d.records: p.normalize_company_data_batch(records)),
+        "normalize_company_data_batch[frame]": lambda d: (lambda df=d.frame: p.normalize_company_data_batch(df)),
+        "normalize_company_name": lambda d: (lambda values=d.column("name"): [p.normalize_company_name(v) for v in values]),
+        "normalize_phone_number": lambda d: (lambda values=d.column("phone"): [p.normalize_phone_number(v) for v in values]),
+        "normalize_address": lambda d: (lambda values=d.column("address"): [p.normalize_address(v) for v in values]),
+        "extract_prefecture_city": lambda d: (
+            lambda values=[r.get("address", "") for r in d.normalized]: [p.extract_prefecture_city(v) for v in values]),
+        "normalize_industry": lambda d: (lambda values=d.column("industry"): [p.normalize_industry(v) for v in values]),
+        "get_industry_code": lambda d: (
+            lambda values=[r.get("industry", "") for r in d.normalized]: [p.get_industry_code(v) for v in values]),
+        "classify_industries": lambda d: (
+            lambda values=d.normalized_frame["industry"].to_numpy(dtype=object): p.classify_industries(values)),
+        "clean_whitespace": lambda d: (lambda values=d.column("name"): [p.clean_whitespace(v) for v in values]),
+        "convert_fullwidth_to_halfwidth": lambda d: (
+            lambda values=d.column("address"): [p.convert_fullwidth_to_halfwidth(v) for v in values]),
+        "duplicate_key": lambda d: (lambda records=d.normalized: [p.duplicate_key(r) for r in records]),
+        "merge_company_data": lambda d: (
+            lambda records=d.normalized: [p.merge_company_data(a, b) for a, b in zip(records, records[1:])]),
+        "remove_duplicates": lambda d: (lambda records=d.normalized: p.remove_duplicates(records)),
+        "remove_duplicates_external": lambda d: (
+            lambda records=d.normalized: _consume(p.remove_duplicates_external(records, tmp_dir=d.directory))),
+        "remove_fuzzy_duplicates": lambda d: (lambda records=d.normalized: p.remove_fuzzy_duplicates(records)),
+        "resolve_entities": lambda d: (lambda records=d.normalized: p.resolve_entities(records)),
+        "deduplicate": lambda d: (lambda records=d.normalized: p.deduplicate(records, fuzzy=True)),
+        "filter_by_industry": lambda d: (lambda records=d.normalized: p.filter_by_industry(records, industries)),
+        "matches_industry": lambda d: (
+            lambda records=d.normalized, codes=set(industries): [p.matches_industry(r, codes) for r in records]),
+        "filter_by_location": lambda d: (lambda records=d.normalized: p.filter_by_location(records, ["東京都"], ["大阪市北区"])),
+        "preprocess_csv_data": lambda d: (lambda text=d.csv_text: p.preprocess_csv_data(text)),
+        "standardize_columns": lambda d: (
+            lambda df=pd.read_csv(d.csv_path, dtype=str, keep_default_na=False): p.standardize_columns(df)),
+        "process_csv_file": lambda d: (lambda path=d.csv_path: p.process_csv_file(path)),
+        "iter_csv_file": lambda d: (lambda path=d.csv_path: _consume(p.iter_csv_file(path))),
+        "stream_csv_file": lambda d: (lambda path=d.csv_path: p.stream_csv_file(path, d.output_path(".csv"))),
+        "suppress_frame": lambda d: (
+            lambda df=d.normalized_frame, suppression=d.suppression: p.suppress_frame(df, suppression)),
+        "export_to_csv": lambda d: (lambda records=d.normalized: p.export_to_csv(records, d.output_path("-export.csv"))),
+    }
+
+
+def public_methods(processor: DataProcessor) -> List[str]:
+    return [name for name in dir(processor) if not name.startswith("_") and callable(getattr(processor, name))]
+
+
+def measure(func: Callable[[], Any], processor: DataProcessor, iterations: int,
+            max_seconds: float = MAX_SAMPLE_SECONDS, memory: bool = True) -> Tuple[float, Optional[int]]:
+    """
+    処理時間とピークメモリ（バイト）を測る
+
+    処理時間は iterations 回（合計が MIN_SAMPLE_SECONDS に満たない場合はそれを超えるまで、
+    max_seconds を超えた場合はそこまで）繰り返したうちの最短。
+    正規化のメモが前回の実行の結果を覚えていないよう、毎回 clear_memos してから実行する。
+    timeit と同じく、計測中はガベージコレクションを止める（それまでに確保されたオブジェクトの数の影響を受けないように）。
+    """
+    best = math.inf
+    total = 0.0
+    runs = 0
+    while (runs < iterations or total < MIN_SAMPLE_SECONDS) and total < max_seconds:
+        processor.clear_memos()
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        finally:
+            gc.enable()
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+
+    peak = None
+    if memory:
+        processor.clear_memos()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+class DataProcessorBenchmark:
+    """
+    件数ごとに DataProcessor の公開メソッドを計測する
+    """
+    def __init__(self, sizes: Optional[List[int]] = None, iterations: int = 3, methods: Optional[List[str]] = None,
+                 memory: bool = True, processor: Optional[DataProcessor] = None, seed: int = 0):
+        self.sizes = sorted(sizes or DEFAULT_SIZES)
+        self.iterations = iterations
+        self.memory = memory
+        self.processor = processor or DataProcessor()
+        self.seed = seed
+        self.cases = benchmark_cases(self.processor)
+        if methods:
+            unknown = [name for name in methods if name not in self.cases]
+            if unknown:
+                raise ValueError(f"Unknown benchmark cases: {unknown}")
+            self.cases = {name: self.cases[name] for name in methods}
+
+    def uncovered_methods(self) -> List[str]:
+        """
+        計測項目にも NOT_MEASURED にもない公開メソッド（メソッドを追加したら計測項目も追加する）
+        """
+        covered = {name.split("[")[0] for name in benchmark_cases(self.processor)}
+        return [name for name in public_methods(self.processor) if name not in covered and name not in NOT_MEASURED]
+
+    def run(self, progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        metrics: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in self.cases}
+        directory = tempfile.mkdtemp(prefix="risma-benchmark-")
+        try:
+            for rows in self.sizes:
+                data = BenchmarkData(self.processor, rows, directory, self.seed)
+                for name, make in self.cases.items():
+                    func = make(data)
+                    seconds, peak = measure(func, self.processor, self.iterations, memory=self.memory)
+                    metrics[name][str(rows)] = {
+                        "seconds": seconds,
+                        "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0,
+                        "peak_bytes": peak,
+                    }
+                    del func
+                    data.release()
+                    if progress:
+                        progress(f"{name:<36} {rows:>9} rows  {rows / seconds:12.0f} rows/s")
+                # 次の件数の入力を作る前に、この件数の入力を解放する
+                del data
+                gc.collect()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        return {
+            "generator_version": GENERATOR_VERSION,
+            "sizes": self.sizes,
+            "iterations": self.iterations,
+            "calibration_seconds": calibrate(),
+            "metrics": metrics,
+        }
+
+
+def scaling(metric: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """
+    隣り合う件数の間の処理時間の伸び（log(時間の比) / log(件数の比)。線形なら1、二乗なら2）
+    """
+    sizes = sorted(int(rows) for rows in metric)
+    curve = {}
+    for small, large in zip(sizes, sizes[1:]):
+        ratio = metric[str(large)]["seconds"] / metric[str(small)]["seconds"]
+        curve[f"{small}-{large}"] = round(math.log(ratio) / math.log(large / small), 3)
+    return curve
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE,
+            scaling_tolerance: float = SCALING_TOLERANCE) -> List[str]:
+    """
+    基準値と同じ件数で、tolerance を超えて遅くなった・メモリが増えた項目と、スケーリングの指数が悪化した項目を返す
+    """
+    if baseline.get("generator_version") != report["generator_version"]:
+        raise ValueError(f"Baseline is for generator v{baseline.get('generator_version')}, "
+                         f"but the report is for v{report['generator_version']}")
+    calibration = report["calibration_seconds"]
+    base_calibration = baseline["calibration_seconds"]
+    regressions = []
+    for name, base_metric in baseline["metrics"].items():
+        metric = report["metrics"].get(name)
+        if not metric:
+            continue
+        for rows, base in base_metric.items():
+            current = metric.get(rows)
+            if not current:
+                continue
+            ratio = (current["seconds"] / calibration) / (base["seconds"] / base_calibration)
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name}@{rows}: {ratio:.2f}x slower than baseline")
+            if current["peak_bytes"] and base["peak_bytes"] and current["peak_bytes"] > base["peak_bytes"] * (1 + tolerance):
+                regressions.append(f"{name}@{rows}: peak memory {current['peak_bytes'] / base['peak_bytes']:.2f}x baseline")
+        base_curve = scaling(base_metric)
+        for span, exponent in scaling(metric).items():
+            if span in base_curve and exponent > base_curve[span] + scaling_tolerance:
+                regressions.append(f"{name}@{span}: scaling exponent {exponent:.2f} (baseline {base_curve[span]:.2f})")
+    return regressions
+
+
+def baseline_path(version: int = GENERATOR_VERSION) -> str:
+    return os.path.join(BASELINE_DIR, f"data_processor_v{version}.json")
+
+
+def format_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    lines = [f"calibration {report['calibration_seconds'] * 1000:.2f} ms"]
+    for name, metric in report["metrics"].items():
+        base_metric = (baseline or {}).get("metrics", {}).get(name, {})
+        for rows, values in metric.items():
+            base = base_metric.get(rows)
+            ratio = "-"
+            if base:
+                ratio = (f"{(values['seconds'] / report['calibration_seconds']) / (base['seconds'] / baseline['calibration_seconds']):.2f}x")
+            peak = f"{values['peak_bytes'] / (1024 * 1024):9.1f} MB" if values["peak_bytes"] is not None else "        - MB"
+            lines.append(f"  {name:<36} {int(rows):>9}  {values['rows_per_sec']:12.0f} rows/s  {peak}  {ratio:>6}")
+        curve = scaling(metric)
+        if curve:
+            lines.append(f"  {'':<36} scaling " + "  ".join(f"{span}: {exponent:.2f}" for span, exponent in curve.items()))
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="DataProcessor のスループット・メモリのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--methods", nargs="+")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--no-memory", action="store_true", help="ピークメモリを計測しない（tracemalloc での再実行を省く）")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    benchmark = DataProcessorBenchmark(sizes=args.sizes, iterations=args.iterations, methods=args.methods,
+                                       memory=not args.no_memory)
+    uncovered = benchmark.uncovered_methods()
+    report = benchmark.run(progress=lambda line: print(line, file=sys.stderr))
+    path = baseline_path()
+
+    if args.update_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(format_report(report))
+        print(f"Baseline written to {path}")
+        return
+
+    baseline = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    regressions = compare(report, baseline, args.tolerance) if baseline else []
+    for name in uncovered:
+        print(f"UNCOVERED {name}")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if uncovered or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
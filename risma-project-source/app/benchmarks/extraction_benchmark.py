@@ -0,0 +1,248 @@
+"""
+WebScraper の抽出処理（extract_company_urls・extract_company_data・各 extract_* 関数）の計測
+
+    python -m app.benchmarks.extraction_benchmark                    # 基準値と比較（劣化していれば終了コード1）
+    python -m app.benchmarks.extraction_benchmark --update-baseline  # 基準値を更新
+
+計測値はマシンの速度の影響を除くため、固定の計算処理（キャリブレーション）にかかった時間との比で比較する。
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+from bs4 import BeautifulSoup
+
+from app.services.scraper import WebScraper
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, "corpus")
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, "baselines")
+CORPUS_VERSION = 1
+
+# 基準値からの劣化の許容幅（比率）
+DEFAULT_TOLERANCE = 0.25
+
+
+def load_corpus(version: int = CORPUS_VERSION) -> List[Dict[str, Any]]:
+    """
+    マニフェストに従ってコーパスのページを読み込む
+    """
+    corpus_dir = os.path.join(CORPUS_DIR, f"v{version}")
+    with open(os.path.join(corpus_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    pages = []
+    for page in manifest["pages"]:
+        with open(os.path.join(corpus_dir, page["file"]), "rb") as f:
+            html = f.read().decode(page["encoding"])
+        pages.append({**page, "html": html})
+    return pages
+
+
+def best_time(func: Callable[[], Any], iterations: int, min_sample_seconds: float = 0.02) -> float:
+    """
+    1回あたりの処理時間（秒）を、iterations 回の計測のうち最短のものから求める
+
+    短い処理は1回の計測が min_sample_seconds 以上になるまで繰り返してから割る（timeit の autorange と同様）。
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_sample_seconds:
+            break
+        loops *= 2
+
+    best = elapsed / loops
+    for _ in range(iterations - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best
+
+
+def calibrate(iterations: int = 5) -> float:
+    """
+    マシン速度の目安として、固定の文字列処理・正規表現処理にかかる時間を測る
+    """
+    text = "株式会社テスト 東京都千代田区1-2-3 TEL:03-1234-5678 " * 200
+    pattern = re.compile(r"\d{2,4}-\d{2,4}-\d{4}")
+
+    def work():
+        total = 0
+        for i in range(200):
+            total += len(pattern.findall(text)) + text.count(str(i % 10))
+        return total
+
+    return best_time(work, iterations)
+
+
+class ExtractionBenchmark:
+    """
+    コーパスの各ページに対して抽出処理の時間を計測する
+    """
+    def __init__(self, scraper: Optional[WebScraper] = None, iterations: int = 5, version: int = CORPUS_VERSION):
+        # 学習済みテンプレートの有無で結果が変わらないよう、ヒューリスティック抽出のみを計測する
+        self.scraper = scraper or WebScraper(use_templates=False)
+        self.iterations = iterations
+        self.version = version
+        self.pages = load_corpus(version)
+
+    def field_functions(self) -> Dict[str, Callable[[str], Any]]:
+        scraper = self.scraper
+        return {
+            "clean_company_name": scraper.clean_company_name,
+            "extract_phone_number": scraper.extract_phone_number,
+            "extract_address": scraper.extract_address,
+            "extract_prefecture_city": scraper.extract_prefecture_city,
+            "extract_representative": scraper.extract_representative,
+            "extract_year": scraper.extract_year,
+            "extract_capital": scraper.extract_capital,
+            "extract_employees": scraper.extract_employees,
+            "extract_industry": scraper.extract_industry,
+        }
+
+    def field_inputs(self) -> List[str]:
+        """
+        各ページのタイトルと、ラベル（「電話番号」「所在地」など）を含むテキストの親要素のテキスト
+        """
+        labels = [label for patterns in self.scraper.labeled_field_patterns.values() for label in patterns]
+        texts = []
+        for page in self.pages:
+            if page["kind"] != "company":
+                continue
+            soup = BeautifulSoup(page["html"], "html.parser")
+            if soup.title:
+                texts.append(soup.title.text)
+            for element in soup.find_all(string=lambda text: text and any(label in text for label in labels)):
+                if element.parent is not None:
+                    texts.append(element.parent.get_text())
+        return texts
+
+    def check_expected(self) -> List[str]:
+        """
+        マニフェストの期待値と抽出結果が一致しない項目を返す
+        """
+        mismatches = []
+        for page in self.pages:
+            expected = page.get("expected", {})
+            if page["kind"] == "serp":
+                actual = {"urls": len(self.scraper.extract_company_urls(page["html"]))}
+            else:
+                actual = self.scraper.extract_company_data(page["html"], page["url"])
+            for field, value in expected.items():
+                if actual.get(field) != value:
+                    mismatches.append(f"{page['name']}.{field}: expected {value!r}, got {actual.get(field)!r}")
+        return mismatches
+
+    def run(self) -> Dict[str, Any]:
+        """
+        ページごと・項目ごとの処理時間（秒/回）を計測する
+        """
+        scraper = self.scraper
+        metrics: Dict[str, float] = {}
+        company_seconds = 0.0
+        company_pages = 0
+
+        for page in self.pages:
+            html = page["html"]
+            if page["kind"] == "serp":
+                metrics[f"urls/{page['name']}"] = best_time(lambda: scraper.extract_company_urls(html), self.iterations)
+                continue
+            seconds = best_time(lambda: scraper.extract_company_data(html, page["url"]), self.iterations)
+            metrics[f"page/{page['name']}"] = seconds
+            company_seconds += seconds
+            company_pages += 1
+
+        # 各抽出関数を、extract_company_data が渡すのと同じテキストに適用した時間（全ページの合計）
+        texts = self.field_inputs()
+        for name, func in self.field_functions().items():
+            metrics[f"field/{name}"] = best_time(lambda: [func(text) for text in texts], self.iterations)
+
+        return {
+            "corpus_version": self.version,
+            "iterations": self.iterations,
+            "calibration_seconds": calibrate(),
+            "pages_per_sec": round(company_pages / company_seconds, 2) if company_seconds else 0.0,
+            "metrics": metrics,
+        }
+
+
+def normalized(report: Dict[str, Any]) -> Dict[str, float]:
+    calibration = report["calibration_seconds"]
+    return {name: seconds / calibration for name, seconds in report["metrics"].items()}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    基準値より tolerance を超えて遅くなった計測項目を返す
+    """
+    if baseline.get("corpus_version") != report["corpus_version"]:
+        raise ValueError(f"Baseline is for corpus v{baseline.get('corpus_version')}, "
+                         f"but the report is for v{report['corpus_version']}")
+    current = normalized(report)
+    regressions = []
+    for name, base in normalized(baseline).items():
+        if name in current and current[name] > base * (1 + tolerance):
+            regressions.append(f"{name}: {current[name] / base:.2f}x slower than baseline")
+    return regressions
+
+
+def baseline_path(version: int = CORPUS_VERSION) -> str:
+    return os.path.join(BASELINE_DIR, f"extraction_v{version}.json")
+
+
+def format_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    base = normalized(baseline) if baseline else {}
+    current = normalized(report)
+    lines = [f"pages/sec: {report['pages_per_sec']}  (calibration {report['calibration_seconds'] * 1000:.2f} ms)"]
+    for name, seconds in report["metrics"].items():
+        ratio = f"{current[name] / base[name]:.2f}x" if name in base else "-"
+        lines.append(f"  {name:<36} {seconds * 1000:10.3f} ms  {ratio:>6}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="抽出処理のマイクロベンチマーク")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    benchmark = ExtractionBenchmark(iterations=args.iterations)
+    mismatches = benchmark.check_expected()
+    report = benchmark.run()
+    path = baseline_path(benchmark.version)
+
+    if args.update_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(format_report(report))
+        print(f"Baseline written to {path}")
+        return
+
+    baseline = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    regressions = compare(report, baseline, args.tolerance) if baseline else []
+    for line in mismatches:
+        print(f"MISMATCH {line}")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if mismatches or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
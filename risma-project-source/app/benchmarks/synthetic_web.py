@@ -0,0 +1,284 @@
+"""
+クロールの負荷試験用に、検索結果・電話帳・企業ページを生成して返すローカルWebサーバー
+
+    python -m app.benchmarks.synthetic_web --port 8765 --companies 10000
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import multiprocessing
+import random
+from typing import List, Dict, Any, Optional
+
+from aiohttp import web
+
+# 生成に使う語彙
+NAME_PARTS = ["サン", "テック", "ミライ", "アオバ", "ヒカリ", "ニッポン", "グローバル", "ソリューションズ",
+              "フロンティア", "さくら", "みどり", "大和", "東邦", "中央", "富士", "ユニオン"]
+LEGAL_FORMS = ["株式会社{}", "{}株式会社", "有限会社{}", "{}(株)", "合同会社{}"]
+LOCATIONS = [
+    ("東京都", "千代田区", "100"), ("東京都", "新宿区", "160"), ("大阪府", "大阪市北区", "530"),
+    ("神奈川県", "横浜市中区", "231"), ("愛知県", "名古屋市中区", "460"), ("福岡県", "福岡市博多区", "812"),
+    ("北海道", "札幌市中央区", "060"), ("宮城県", "仙台市青葉区", "980"), ("京都府", "京都市下京区", "600"),
+    ("北海道", "虻田郡倶知安町", "044"),
+]
+INDUSTRIES = ["IT・情報通信", "メーカー", "商社", "小売", "不動産", "建設", "運輸・物流", "コンサルティング",
+              "人材・教育", "医療・福祉", "飲食・宿泊", "サービス"]
+LAYOUTS = ["list", "table", "dl"]
+
+
+class SyntheticWebConfig:
+    """
+    生成するWebの規模と性質
+    """
+    def __init__(self, companies: int = 10000, results_per_page: int = 20, latency_ms: float = 50.0,
+                 latency_sigma: float = 0.5, error_rate: float = 0.02,
+                 charsets: Optional[Dict[str, float]] = None, page_size: int = 20000, seed: int = 0):
+        self.companies = companies
+        self.results_per_page = results_per_page
+        # 応答時間は中央値 latency_ms の対数正規分布に従う
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        # 企業ページの文字コードの出現比率
+        self.charsets = charsets or {"utf-8": 0.7, "shift_jis": 0.2, "euc-jp": 0.1}
+        # 企業ページのおおよそのサイズ（バイト）
+        self.page_size = page_size
+        self.seed = seed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def _stable_int(*parts: Any) -> int:
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def generate_company(company_id: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    企業IDから決定的に企業情報を生成する
+    """
+    rng = random.Random(_stable_int(seed, "company", company_id))
+    base = rng.choice(NAME_PARTS) + rng.choice(NAME_PARTS)
+    prefecture, city, zip_prefix = rng.choice(LOCATIONS)
+    return {
+        "id": company_id,
+        "name": rng.choice(LEGAL_FORMS).format(base),
+        "prefecture": prefecture,
+        "city": city,
+        "address": f"{prefecture}{city}{rng.randint(1, 9)}-{rng.randint(1, 30)}-{rng.randint(1, 20)}",
+        "zip": f"{zip_prefix}-{rng.randint(0, 9999):04d}",
+        "phone": f"0{rng.randint(3, 9)}-{rng.randint(1000, 9999)}-{rng.randint(0, 9999):04d}",
+        "industry": rng.choice(INDUSTRIES),
+        "representative": "代表取締役 " + rng.choice(["山田太郎", "佐藤花子", "鈴木一郎", "高橋次郎"]),
+        "established_year": rng.randint(1950, 2020),
+        "capital": rng.choice([300, 1000, 5000, 10000]),
+        "employees": rng.randint(3, 3000),
+        "layout": rng.choice(LAYOUTS),
+    }
+
+
+def render_company_page(company: Dict[str, Any], charset: str, page_size: int) -> str:
+    """
+    企業ページのHTMLを生成する
+    """
+    fields = [
+        ("所在地", f"〒{company['zip']} {company['address']}"),
+        ("電話番号", company["phone"]),
+        ("代表者", company["representative"]),
+        ("設立", f"{company['established_year']}年"),
+        ("資本金", f"{company['capital']}万円"),
+        ("従業員数", f"{company['employees']}名"),
+        ("業種", company["industry"]),
+    ]
+    if company["layout"] == "table":
+        body = "<table class=\"company\">" + "".join(
+            f"<tr><th>{label}</th><td>{label}：{value}</td></tr>" for label, value in fields
+        ) + "</table>"
+    elif company["layout"] == "dl":
+        body = "<dl class=\"company\">" + "".join(
+            f"<dt>{label}</dt><dd>{value}</dd>" for label, value in fields
+        ) + "</dl>"
+    else:
+        body = "<ul class=\"company\">" + "".join(
+            f"<li>{label}：{value}</li>" for label, value in fields
+        ) + "</ul>"
+
+    html = (
+        f"<html><head><meta charset=\"{charset}\"><title>{company['name']} | 公式サイト</title>"
+        f"<meta name=\"description\" content=\"{company['name']}の公式サイトです。\"></head>"
+        f"<body><div class=\"header\"><h1>{company['name']}</h1></div>"
+        f"<div class=\"main\"><h2>会社概要</h2>{body}</div>"
+        f"<div class=\"footer\"><a href=\"/contact\">お問い合わせ</a></div>"
+    )
+    # 指定サイズまでニュース記事風の本文で埋める
+    filler = "<p>お知らせ：新しいサービスを開始しました。今後ともよろしくお願いいたします。</p>"
+    repeat = max(0, (page_size - len(html.encode("utf-8"))) // len(filler.encode("utf-8")))
+    return html + filler * repeat + "</body></html>"
+
+
+class SyntheticWeb:
+    """
+    検索結果・電話帳・企業ページを返す aiohttp アプリケーション
+    """
+    def __init__(self, config: SyntheticWebConfig):
+        self.config = config
+        self.stats = {"requests": 0, "bytes": 0, "errors": 0}
+        self._charsets = list(config.charsets)
+        self._charset_weights = [config.charsets[c] for c in self._charsets]
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/search", self.search_page)
+        app.router.add_get("/directory", self.directory_page)
+        app.router.add_get("/site/{company_id}/", self.company_page)
+        app.router.add_get("/__stats", self.stats_page)
+        app.router.add_post("/__reset", self.reset_stats)
+        return app
+
+    async def _simulate(self, request: web.Request) -> Optional[web.Response]:
+        """
+        応答遅延とエラーを発生させる
+        """
+        rng = random.Random(_stable_int(self.config.seed, request.path_qs, self.stats["requests"]))
+        self.stats["requests"] += 1
+        median = self.config.latency_ms / 1000.0
+        if median > 0:
+            await asyncio.sleep(rng.lognormvariate(math.log(median), self.config.latency_sigma))
+        if rng.random() < self.config.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=rng.choice([500, 503, 429]))
+        return None
+
+    def _respond(self, html: str, charset: str = "utf-8") -> web.Response:
+        body = html.encode(charset, errors="replace")
+        self.stats["bytes"] += len(body)
+        return web.Response(body=body, content_type="text/html", charset=charset)
+
+    def _result_ids(self, kind: str, query: str) -> List[int]:
+        start = _stable_int(self.config.seed, kind, query) % self.config.companies
+        return [(start + i) % self.config.companies for i in range(self.config.results_per_page)]
+
+    def _links(self, request: web.Request, ids: List[int]) -> str:
+        base = f"{request.scheme}://{request.host}"
+        return "".join(
+            f"<div class=\"result\"><a href=\"{base}/site/{company_id}/\">企業{company_id}</a></div>" for company_id in ids
+        )
+
+    async def search_page(self, request: web.Request) -> web.Response:
+        error = await self._simulate(request)
+        if error is not None:
+            return error
+        query = request.query.get("q", "")
+        html = f"<html><head><title>{query} - 検索</title></head><body>{self._links(request, self._result_ids('search', query))}</body></html>"
+        return self._respond(html)
+
+    async def directory_page(self, request: web.Request) -> web.Response:
+        error = await self._simulate(request)
+        if error is not None:
+            return error
+        keyword = request.query.get("keyword", "")
+        html = f"<html><head><title>{keyword}の企業一覧</title></head><body>{self._links(request, self._result_ids('directory', keyword))}</body></html>"
+        return self._respond(html)
+
+    async def company_page(self, request: web.Request) -> web.Response:
+        error = await self._simulate(request)
+        if error is not None:
+            return error
+        company_id = int(request.match_info["company_id"])
+        company = generate_company(company_id, self.config.seed)
+        rng = random.Random(_stable_int(self.config.seed, "charset", company_id))
+        charset = rng.choices(self._charsets, weights=self._charset_weights)[0]
+        return self._respond(render_company_page(company, charset, self.config.page_size), charset)
+
+    async def stats_page(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.stats = {"requests": 0, "bytes": 0, "errors": 0}
+        return web.json_response(self.stats)
+
+
+def configure_scraper(scraper, base_url: str) -> None:
+    """
+    WebScraper の検索先を合成Webに向ける
+    """
+    scraper.search_engines = {"synthetic": base_url + "/search?q={query}"}
+    scraper.directory_sites = {"synthetic_directory": base_url + "/directory?keyword={query}"}
+
+
+class SyntheticWebServer:
+    """
+    合成Webサーバーを別プロセスで起動する（クローラーと CPU を取り合わないようにする）
+    """
+    def __init__(self, config: SyntheticWebConfig, host: str = "127.0.0.1", port: int = 8765):
+        self.config = config
+        self.host = host
+        self.port = port
+        self._process: Optional[multiprocessing.Process] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "SyntheticWebServer":
+        ready = multiprocessing.Event()
+        self._process = multiprocessing.Process(
+            target=_serve_forever, args=(self.config, self.host, self.port, ready), daemon=True
+        )
+        self._process.start()
+        if not ready.wait(timeout=10):
+            self.stop()
+            raise RuntimeError("合成Webサーバーが起動しませんでした")
+        return self
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(timeout=5)
+            self._process = None
+
+    def __enter__(self) -> "SyntheticWebServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _serve_forever(config: SyntheticWebConfig, host: str, port: int, ready=None) -> None:
+    async def main():
+        runner = web.AppRunner(SyntheticWeb(config).make_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        if ready is not None:
+            ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成Webサーバーを起動する")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--companies", type=int, default=10000)
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--page-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = SyntheticWebConfig(
+        companies=args.companies, results_per_page=args.results_per_page, latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma, error_rate=args.error_rate, page_size=args.page_size, seed=args.seed,
+    )
+    print(f"Serving synthetic web on http://{args.host}:{args.port} (search: /search?q=..., directory: /directory?keyword=...)")
+    _serve_forever(config, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
+import asyncio
+
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, users, lists, search
+from app.api import auth, users, lists, search, suppression
 from app.db.database import Base, engine
 
 # データベーステーブルの作成
@@ -27,9 +29,15 @@ api_router.include_router(auth.router, prefix="/auth", tags=["認証"])
 api_router.include_router(users.router, prefix="/users", tags=["ユーザー"])
 api_router.include_router(lists.router, prefix="/lists", tags=["リスト"])
 api_router.include_router(search.router, prefix="/search", tags=["検索"])
+api_router.include_router(suppression.router, prefix="/suppression", tags=["除外リスト"])
 
 app.include_router(api_router, prefix="/api")
 
+@app.on_event("startup")
+async def resume_search_jobs():
+    # 再起動などで中断された検索ジョブを検出し、チェックポイントから再開する
+    app.state.orphan_watcher = asyncio.create_task(search.watch_orphaned_jobs())
+
 @app.get("/")
 async def root():
     return {
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, JSON
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime, Text, JSON
 from sqlalchemy.orm import relationship
 import datetime
 
@@ -65,6 +65,17 @@ class Company(Base):
     list = relationship("List", back_populates="companies")
 
 
+class CompanyKey(Base):
+    __tablename__ = "company_keys"
+    __table_args__ = (Index("ix_company_keys_list_kind_value", "list_id", "kind", "value"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    list_id = Column(Integer, ForeignKey("lists.id"))
+    company_id = Column(Integer, ForeignKey("companies.id"), index=True)
+    kind = Column(String)  # 重複判定のキーの種類（exact, phone, domain など）
+    value = Column(String)  # 正規化したキーの値
+
+
 class SearchJob(Base):
     __tablename__ = "search_jobs"
 
@@ -79,6 +90,20 @@ class SearchJob(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
+    checkpoint = Column(JSON, nullable=True)  # 処理済みSERP・フロンティアなどクロールの進捗（再開用）
+    heartbeat_at = Column(DateTime, nullable=True)  # 進捗を最後に保存した日時
+    budget_exhausted = Column(String, nullable=True)  # 上限に達したクロール予算（max_requests, max_bytes, max_seconds）
+    stats = Column(JSON, nullable=True)  # クロールの計測値（ホスト別のリクエスト数・待ち時間・解析時間など）
+
+
+class SearchJobRecord(Base):
+    __tablename__ = "search_job_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("search_jobs.id"), index=True)
+    url = Column(String)
+    data = Column(JSON)  # 企業ページから抽出したレコード（ジョブ完了まで保持）
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
 
 class AuditLog(Base):
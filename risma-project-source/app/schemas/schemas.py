@@ -160,6 +160,8 @@ class SearchJobInDBBase(SearchJobBase):
     status: str
     result_count: int
     error_message: Optional[str] = None
+    budget_exhausted: Optional[str] = None
+    stats: Optional[Dict[str, Any]] = None
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
@@ -189,10 +191,21 @@ class AuditLog(AuditLogCreate):
         orm_mode = True
 
 
+class CrawlBudgetParams(BaseModel):
+    max_requests: Optional[int] = Field(None, ge=1)  # 総リクエスト数
+    max_bytes: Optional[int] = Field(None, ge=1)  # 総ダウンロード量（バイト）
+    max_seconds: Optional[float] = Field(None, gt=0)  # ジョブ全体の実行時間（秒）
+    max_pages_per_domain: Optional[int] = Field(None, ge=1)  # ドメインごとのページ数
+
+
 class KeywordSearchParams(BaseModel):
     keywords: List[str] = Field(..., min_items=1)
     exclude_keywords: Optional[List[str]] = None
     max_results: Optional[int] = 1000
+    budget: Optional[CrawlBudgetParams] = None
+    suppression_lists: Optional[List[str]] = None  # 適用する除外リストの名前
+    profile: bool = False  # 正規化・重複削除・保存の処理時間を段階・関数ごとに計測する（ジョブの stats に保存）
+    fuzzy_dedup: Optional[bool] = None  # 会社名の表記ゆれ・複数キーによる名寄せも行う（None の場合は RISMA_FUZZY_DEDUP に従う）
 
 
 class IndustryLocationSearchParams(BaseModel):
@@ -200,6 +213,16 @@ class IndustryLocationSearchParams(BaseModel):
     prefectures: Optional[List[str]] = None
     cities: Optional[List[str]] = None
     max_results: Optional[int] = 1000
+    budget: Optional[CrawlBudgetParams] = None
+    suppression_lists: Optional[List[str]] = None  # 適用する除外リストの名前
+    profile: bool = False  # 正規化・重複削除・保存の処理時間を段階・関数ごとに計測する（ジョブの stats に保存）
+    fuzzy_dedup: Optional[bool] = None  # 会社名の表記ゆれ・複数キーによる名寄せも行う（None の場合は RISMA_FUZZY_DEDUP に従う）
+
+
+class SuppressionList(BaseModel):
+    name: str
+    entries: int
+    counts: Dict[str, int]
 
 
 class ExportFormat(BaseModel):
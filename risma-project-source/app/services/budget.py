@@ -0,0 +1,137 @@
+import time
+from collections import defaultdict
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+class CrawlBudget:
+    """
+    1ジョブあたりのクロール上限（リクエスト数・ダウンロード量・実行時間・ドメインごとのページ数）を管理するクラス
+
+    上限が None の項目は無制限として扱う。
+    """
+    # 上限に達した理由として記録する名前
+    MAX_REQUESTS = "max_requests"
+    MAX_BYTES = "max_bytes"
+    MAX_SECONDS = "max_seconds"
+
+    def __init__(self, max_requests: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_seconds: Optional[float] = None, max_pages_per_domain: Optional[int] = None,
+                 usage: Optional[Dict[str, Any]] = None):
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.max_pages_per_domain = max_pages_per_domain
+
+        # 再開時は前回までの使用量を引き継ぐ
+        usage = usage or {}
+        self.requests = usage.get("requests", 0)
+        self.bytes = usage.get("bytes", 0)
+        self.domain_pages = defaultdict(int, usage.get("domain_pages", {}))
+        self.skipped_by_domain_cap = usage.get("skipped_by_domain_cap", 0)
+        self.exhausted: Optional[str] = usage.get("exhausted")
+        self._elapsed_before = usage.get("elapsed_seconds", 0.0)
+        self._started_at: Optional[float] = None
+
+    @classmethod
+    def from_params(cls, params: Optional[Dict[str, Any]], usage: Optional[Dict[str, Any]] = None) -> "CrawlBudget":
+        """
+        検索パラメータ（CrawlBudgetParams の辞書）から生成する
+        """
+        params = params or {}
+        return cls(
+            max_requests=params.get("max_requests"),
+            max_bytes=params.get("max_bytes"),
+            max_seconds=params.get("max_seconds"),
+            max_pages_per_domain=params.get("max_pages_per_domain"),
+            usage=usage,
+        )
+
+    def limits(self) -> Dict[str, Any]:
+        """
+        上限の設定を CrawlBudgetParams と同じ形式で返す
+        """
+        return {
+            "max_requests": self.max_requests,
+            "max_bytes": self.max_bytes,
+            "max_seconds": self.max_seconds,
+            "max_pages_per_domain": self.max_pages_per_domain,
+        }
+
+    def fresh(self) -> "CrawlBudget":
+        """
+        同じ上限を持つ未使用の予算を返す
+        """
+        return CrawlBudget.from_params(self.limits())
+
+    def start(self) -> None:
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self._started_at is None:
+            return self._elapsed_before
+        return self._elapsed_before + time.monotonic() - self._started_at
+
+    def remaining_seconds(self) -> Optional[float]:
+        """
+        実行時間の残り（上限がない場合は None）
+        """
+        if self.max_seconds is None:
+            return None
+        return max(0.0, self.max_seconds - self.elapsed_seconds)
+
+    def is_exhausted(self) -> bool:
+        """
+        ジョブ全体の上限に達したかどうか
+        """
+        if self.exhausted:
+            return True
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            self.exhausted = self.MAX_REQUESTS
+        elif self.max_bytes is not None and self.bytes >= self.max_bytes:
+            self.exhausted = self.MAX_BYTES
+        elif self.max_seconds is not None and self.elapsed_seconds >= self.max_seconds:
+            self.exhausted = self.MAX_SECONDS
+        return bool(self.exhausted)
+
+    def acquire(self, url: str) -> bool:
+        """
+        リクエスト1件分の予算を確保する（確保できない場合は False）
+        """
+        self.start()
+        if self.is_exhausted():
+            return False
+
+        domain = urlparse(url).netloc.lower()
+        if self.max_pages_per_domain is not None and self.domain_pages[domain] >= self.max_pages_per_domain:
+            self.skipped_by_domain_cap += 1
+            return False
+
+        self.requests += 1
+        self.domain_pages[domain] += 1
+        return True
+
+    def remaining_bytes(self) -> Optional[int]:
+        """
+        ダウンロード量の残り（上限がない場合は None）
+        """
+        if self.max_bytes is None:
+            return None
+        return max(0, self.max_bytes - self.bytes)
+
+    def record_bytes(self, size: int) -> None:
+        self.bytes += size
+
+    def usage(self) -> Dict[str, Any]:
+        """
+        JSONとして保存可能な使用量を返す
+        """
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "domain_pages": dict(self.domain_pages),
+            "skipped_by_domain_cap": self.skipped_by_domain_cap,
+            "exhausted": self.exhausted,
+        }
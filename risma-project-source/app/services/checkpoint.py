@@ -0,0 +1,103 @@
+import logging
+import time
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+class CrawlCheckpoint:
+    """
+    クロールの進捗（処理済みSERP・フロンティア・抽出済みレコード）を保持するクラス
+
+    一定件数の更新ごと、または一定時間ごとに on_flush を呼び出し、呼び出し側で永続化できるようにする。
+    """
+    def __init__(self, state: Optional[Dict[str, Any]] = None, records: Optional[Dict[str, Dict[str, Any]]] = None,
+                 on_flush: Optional[Callable[["CrawlCheckpoint"], None]] = None, flush_every: int = 20,
+                 flush_interval: float = 30.0):
+        state = state or {}
+        # 処理済みの検索結果ページURL
+        self.serp_done = set(state.get("serp_done", []))
+        # 抽出済みの企業URL（発見順）
+        self.frontier: List[str] = list(state.get("frontier", []))
+        self._frontier_set = set(self.frontier)
+        # 取得済みの企業URL（成功・失敗を問わない）
+        self.visited = set(state.get("visited", []))
+        # 企業URLごとの抽出済みレコード
+        self.records: Dict[str, Dict[str, Any]] = dict(records or {})
+        self.on_flush = on_flush
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._new_records: List[Tuple[str, Dict[str, Any]]] = []
+        self._changes = 0
+
+    @property
+    def is_resumed(self) -> bool:
+        """
+        以前の進捗から再開したかどうか
+        """
+        return bool(self.serp_done or self.visited)
+
+    def is_serp_done(self, url: str) -> bool:
+        return url in self.serp_done
+
+    def is_visited(self, url: str) -> bool:
+        return url in self.visited
+
+    def add_serp_result(self, url: str, company_urls: Iterable[str]) -> None:
+        """
+        検索結果ページの処理完了を記録し、抽出したURLをフロンティアに追加する
+        """
+        for company_url in company_urls:
+            if company_url not in self._frontier_set:
+                self._frontier_set.add(company_url)
+                self.frontier.append(company_url)
+        self.serp_done.add(url)
+        self._touch()
+
+    def add_company_result(self, url: str, record: Optional[Dict[str, Any]]) -> None:
+        """
+        企業ページの取得完了を記録する（有効なレコードのみ保持）
+        """
+        self.visited.add(url)
+        if record and record.get("name"):
+            self.records[url] = record
+            self._new_records.append((url, record))
+        self._touch()
+
+    def new_records(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        前回の永続化以降に追加されたレコード（on_flush が成功した時点で取り除く）
+        """
+        return list(self._new_records)
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        JSONとして保存可能な進捗状態を返す（レコード本体は含まない）
+        """
+        return {
+            "serp_done": sorted(self.serp_done),
+            "frontier": list(self.frontier),
+            "visited": sorted(self.visited),
+        }
+
+    def flush(self) -> None:
+        """
+        進捗を永続化する
+        """
+        self._changes = 0
+        self._last_flush = time.monotonic()
+        if self.on_flush is None:
+            return
+        saved = len(self._new_records)
+        try:
+            self.on_flush(self)
+        except Exception as e:
+            # 永続化の失敗でクロール自体は止めない（レコードは次回の永続化で保存する）
+            logger.error(f"Error saving crawl checkpoint: {str(e)}")
+            return
+        del self._new_records[:saved]
+
+    def _touch(self) -> None:
+        self._changes += 1
+        if self._changes >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
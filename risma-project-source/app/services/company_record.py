@@ -0,0 +1,170 @@
+"""
+企業データのレコード（項目の並びを固定した __slots__ のオブジェクト）
+
+抽出・正規化・重複削除の間は大量のレコードを保持するため、項目ごとに辞書を持たず、
+決まった項目をスロットに格納して1件あたりのメモリを抑える。
+辞書と同じように読み書きでき（MutableMapping）、決まった項目以外は extra に格納する。
+JSON・DataFrame・データベースとの境界では to_dict・column_values で変換する。
+"""
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, List, Iterable, Optional, Tuple
+
+# レコードの項目（WebScraper.extract_company_data の順序。正規化・名寄せで付く項目は末尾）
+FIELDS: Tuple[str, ...] = (
+    "name", "address", "phone", "email", "website", "industry", "prefecture", "city",
+    "representative", "established_year", "capital", "employees", "annual_revenue",
+    "has_fax", "has_contact_form", "source_url", "description",
+    "industry_code", "cluster_id", "cluster_size",
+)
+_FIELD_SET = frozenset(FIELDS)
+
+# Company テーブルに保存する項目と、項目がない場合の値
+COLUMN_DEFAULTS: Dict[str, Any] = {
+    "name": "",
+    "address": "",
+    "phone": "",
+    "email": "",
+    "website": "",
+    "industry": "",
+    "industry_code": "",
+    "prefecture": "",
+    "city": "",
+    "representative": "",
+    "has_fax": False,
+    "has_contact_form": False,
+    "source_url": "",
+}
+
+
+class CompanyRecord(MutableMapping):
+    """
+    企業データの1件
+
+    値を設定していない項目はスロットが空のままで、辞書で項目がない場合と同じく扱う
+    （in・get・keys などの結果は同じ内容の辞書と一致し、辞書とも == で比較できる）。
+    項目の順序は FIELDS の順、続いて extra に追加した順になる。
+    """
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, data: Optional[Any] = None, **fields: Any):
+        self._extra: Optional[Dict[str, Any]] = None
+        if data is not None:
+            items = data.items() if isinstance(data, Mapping) else data
+            for key, value in items:
+                self[key] = value
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompanyRecord":
+        return cls(data)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELD_SET:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for name in FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        size = sum(1 for name in FIELDS if hasattr(self, name))
+        return size + len(self._extra) if self._extra else size
+
+    def __repr__(self) -> str:
+        return f"CompanyRecord({self.to_dict()!r})"
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self.to_dict()
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._extra = None
+        for key, value in state.items():
+            self[key] = value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        """
+        FIELDS 以外の項目
+        """
+        return dict(self._extra) if self._extra else {}
+
+    def copy(self) -> "CompanyRecord":
+        copied = CompanyRecord()
+        for name in FIELDS:
+            try:
+                setattr(copied, name, getattr(self, name))
+            except AttributeError:
+                pass
+        if self._extra:
+            copied._extra = dict(self._extra)
+        return copied
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        同じ項目を持つ辞書（JSON に保存する場合など）
+        """
+        data = {name: getattr(self, name) for name in FIELDS if hasattr(self, name)}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def column_values(self) -> Dict[str, Any]:
+        """
+        Company テーブルに保存する項目の値（項目がない場合は COLUMN_DEFAULTS の値）
+        """
+        return {name: getattr(self, name, default) for name, default in COLUMN_DEFAULTS.items()}
+
+
+def as_record(data: Any) -> CompanyRecord:
+    """
+    辞書などを CompanyRecord にする（CompanyRecord はそのまま返す）
+    """
+    return data if isinstance(data, CompanyRecord) else CompanyRecord(data)
+
+
+def as_dicts(records: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    CompanyRecord を辞書にしたリスト（辞書はそのまま）
+    """
+    return [record.to_dict() if isinstance(record, CompanyRecord) else record for record in records]
@@ -0,0 +1,83 @@
+"""
+企業データのリストへの一括保存（ORM のオブジェクトを作らない Core の INSERT）
+
+batch_size 件ずつ1回の INSERT（executemany）で保存し、保存した件数だけ List.total_records を増やす。
+ORM の unit of work（オブジェクトの生成・変更の追跡・flush）を通らないため、件数の多いジョブでも
+1件あたりの保存の負荷が小さい。returning を指定した場合は保存した企業データのIDを RETURNING で受け取る。
+"""
+import os
+from typing import List, Dict, Any, Iterable, Optional
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.services.company_record import as_record
+from app.services.pipeline import batched
+
+# 1回の INSERT で保存する件数
+COMPANY_INSERT_BATCH_SIZE = int(os.getenv("RISMA_COMPANY_INSERT_BATCH_SIZE", "1000"))
+
+
+def company_row(list_id: int, record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    companies テーブルの1行の値（Company に保存する項目のみ、項目がない場合は既定値）
+    """
+    return {"list_id": list_id, **as_record(record).column_values()}
+
+
+class CompanyWriter:
+    """
+    企業データを batch_size 件ずつリストに保存するクラス
+
+    commit が True の場合は batch_size 件ごとにコミットする（途中で失敗しても、それまでのデータと
+    total_records は保存される）。False の場合のコミットは呼び出し側で行う。
+    returning が True の場合は保存した企業データのIDを保存した順に ids に追加する。
+    """
+    def __init__(self, db: Session, list_id: int, batch_size: int = COMPANY_INSERT_BATCH_SIZE,
+                 returning: bool = False, commit: bool = True):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.db = db
+        self.list_id = list_id
+        self.batch_size = batch_size
+        self.returning = returning
+        self.commit = commit
+        self.inserted = 0
+        self.ids: List[int] = []
+
+    def insert_rows(self, rows: List[Dict[str, Any]]) -> Optional[List[int]]:
+        """
+        company_row の形の行をまとめて保存し、List.total_records に件数を加える（コミットしない）
+
+        returning が True の場合は保存した行のID（rows の順）を返す。
+        """
+        if not rows:
+            return [] if self.returning else None
+        table = models.Company.__table__
+        ids = None
+        if self.returning:
+            # 複数行の INSERT の RETURNING は行の順を保証しないため、rows の順に並べて受け取る
+            ids = list(self.db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows).scalars())
+            self.ids.extend(ids)
+        else:
+            self.db.execute(insert(table), rows)
+        self.db.execute(
+            update(models.List.__table__)
+            .where(models.List.__table__.c.id == self.list_id)
+            .values(total_records=func.coalesce(models.List.__table__.c.total_records, 0) + len(rows))
+        )
+        self.inserted += len(rows)
+        return ids
+
+    def write(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        企業データを batch_size 件ずつ保存し、保存した件数を返す（records はジェネレーターでもよい）
+        """
+        inserted = 0
+        for batch in batched(records, self.batch_size):
+            self.insert_rows([company_row(self.list_id, record) for record in batch])
+            if self.commit:
+                self.db.commit()
+            inserted += len(batch)
+        return inserted
@@ -0,0 +1,223 @@
+from bisect import bisect_left
+from typing import Dict, Any, Optional
+
+# レイテンシのヒストグラムの区切り（ミリ秒、最後の区間は上限なし）
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+class Histogram:
+    """
+    処理時間の分布（固定区間の度数・合計・最大値）
+    """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000.0)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        q パーセンタイルが含まれる区間の上端（ミリ秒、最後の区間の場合は最大値）
+        """
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else round(self.max * 1000.0, 1)
+        return round(self.max * 1000.0, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 4),
+            "max_ms": round(self.max * 1000.0, 1),
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "buckets": {
+                (f"le_{LATENCY_BUCKETS_MS[i]}ms" if i < len(LATENCY_BUCKETS_MS) else "inf"): count
+                for i, count in enumerate(self.counts) if count
+            },
+        }
+
+
+class RequestStats:
+    """
+    ホストまたは取得元ごとのリクエストの集計
+    """
+    __slots__ = ("requests", "bytes", "statuses", "latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.statuses: Dict[str, int] = {}
+        self.latency = Histogram()
+
+    def record(self, status: str, seconds: float, size: int) -> None:
+        self.requests += 1
+        self.bytes += size
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency.observe(seconds)
+
+    def merge(self, other: "RequestStats") -> None:
+        self.requests += other.requests
+        self.bytes += other.bytes
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.latency.merge(other.latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "statuses": dict(self.statuses),
+            "latency": self.latency.to_dict(),
+        }
+
+
+class CrawlStats:
+    """
+    クロール1回分（またはプロセス全体）の計測値
+
+    リクエスト（ホスト別・取得元別）、待ち時間（セマフォ・共有枠・リクエスト間の遅延）、
+    ページの解析時間、有効な企業データの件数を記録する。
+    時間はタスクごとの合計（秒）で、並行して待ったタスクの分はそれぞれ加算される。
+    """
+    # 待ち時間の種類
+    SEMAPHORE = "semaphore"
+    BROKER = "broker"
+
+    def __init__(self):
+        self.hosts: Dict[str, RequestStats] = {}
+        self.sources: Dict[str, RequestStats] = {}
+        self.waits = {self.SEMAPHORE: Histogram(), self.BROKER: Histogram()}
+        self.delay_seconds = 0.0
+        self.parse: Dict[str, Histogram] = {}
+        self.skipped = 0
+        self.company_pages = 0
+        self.valid_records = 0
+        self.accepted = 0
+        self.crawls = 0
+
+    def record_request(self, host: str, source: str, status: str, seconds: float, size: int) -> None:
+        host_stats = self.hosts.get(host)
+        if host_stats is None:
+            host_stats = self.hosts[host] = RequestStats()
+        host_stats.record(status, seconds, size)
+
+        source_stats = self.sources.get(source)
+        if source_stats is None:
+            source_stats = self.sources[source] = RequestStats()
+        source_stats.record(status, seconds, size)
+
+    def record_skip(self) -> None:
+        """
+        予算不足で取得しなかったリクエスト
+        """
+        self.skipped += 1
+
+    def record_wait(self, kind: str, seconds: float) -> None:
+        self.waits[kind].observe(seconds)
+
+    def record_delay(self, seconds: float) -> None:
+        self.delay_seconds += seconds
+
+    def record_parse(self, kind: str, seconds: float) -> None:
+        histogram = self.parse.get(kind)
+        if histogram is None:
+            histogram = self.parse[kind] = Histogram()
+        histogram.observe(seconds)
+
+    def record_company(self, valid: bool) -> None:
+        self.company_pages += 1
+        if valid:
+            self.valid_records += 1
+
+    def merge(self, other: "CrawlStats") -> None:
+        """
+        他の計測値を加算する（プロセス全体の集計用）
+        """
+        for mine, theirs in ((self.hosts, other.hosts), (self.sources, other.sources)):
+            for key, stats in theirs.items():
+                if key not in mine:
+                    mine[key] = RequestStats()
+                mine[key].merge(stats)
+        for kind, histogram in other.waits.items():
+            self.waits[kind].merge(histogram)
+        for kind, histogram in other.parse.items():
+            if kind not in self.parse:
+                self.parse[kind] = Histogram()
+            self.parse[kind].merge(histogram)
+        self.delay_seconds += other.delay_seconds
+        self.skipped += other.skipped
+        self.company_pages += other.company_pages
+        self.valid_records += other.valid_records
+        self.accepted += other.accepted
+        self.crawls += other.crawls
+
+    def time_breakdown(self) -> Dict[str, float]:
+        """
+        ネットワーク待ち・解析（CPU）・流量制限による待ちのそれぞれにかかった時間（秒）
+        """
+        return {
+            "network": round(sum(stats.latency.total for stats in self.sources.values()), 4),
+            "cpu": round(sum(histogram.total for histogram in self.parse.values()), 4),
+            "rate_limit": round(sum(histogram.total for histogram in self.waits.values()) + self.delay_seconds, 4),
+        }
+
+    def bottleneck(self) -> Optional[str]:
+        """
+        最も時間を使った要因（network / cpu / rate_limit）
+        """
+        breakdown = self.time_breakdown()
+        if not any(breakdown.values()):
+            return None
+        return max(breakdown, key=breakdown.get)
+
+    def to_dict(self, top_hosts: Optional[int] = 50) -> Dict[str, Any]:
+        """
+        JSONとして保存可能な形式で返す（ホスト別の集計はリクエスト数の多い順に top_hosts 件まで）
+        """
+        hosts = sorted(self.hosts.items(), key=lambda item: item[1].requests, reverse=True)
+        if top_hosts is not None:
+            hosts = hosts[:top_hosts]
+        requests = sum(stats.requests for stats in self.sources.values())
+        errors = sum(
+            count for stats in self.sources.values() for status, count in stats.statuses.items() if status != "200"
+        )
+        return {
+            "requests": requests,
+            "errors": errors,
+            "bytes": sum(stats.bytes for stats in self.sources.values()),
+            "skipped": self.skipped,
+            "company_pages": self.company_pages,
+            "valid_records": self.valid_records,
+            "accepted": self.accepted,
+            "yield": round(self.valid_records / self.company_pages, 4) if self.company_pages else None,
+            "time_breakdown": self.time_breakdown(),
+            "bottleneck": self.bottleneck(),
+            "waits": {kind: histogram.to_dict() for kind, histogram in self.waits.items()},
+            "delay_seconds": round(self.delay_seconds, 4),
+            "parse": {kind: histogram.to_dict() for kind, histogram in self.parse.items()},
+            "sources": {source: stats.to_dict() for source, stats in self.sources.items()},
+            "hosts": {host: stats.to_dict() for host, stats in hosts},
+            "host_count": len(self.hosts),
+            "crawls": self.crawls,
+        }
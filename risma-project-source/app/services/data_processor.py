@@ -1,70 +1,198 @@
 import pandas as pd
 import numpy as np
 import re
-from typing import List, Dict, Any, Optional, Set
+import os
+import codecs
+from typing import List, Dict, Any, Optional, Set, Callable, Iterable, Iterator
 import logging
 from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from app.services import text_normalizer
+from app.services.gazetteer import default_gazetteer
+from app.services.industry_index import default_industry_index
+from app.services.memo import Memo, MEMO_SIZE
+from app.services.company_record import CompanyRecord, as_dicts
+from app.services.fuzzy_dedup import FuzzyDeduplicator
+from app.services.entity_resolution import EntityResolver
+from app.services.processing_profile import ProcessingProfile
 
 logger = logging.getLogger(__name__)
 
+# 列ごとの一括処理で、レコードにその項目がないことを表す値
+_MISSING = object()
+
+# CSVファイルを分割して読み込む際の1回あたりの行数
+CSV_CHUNK_SIZE = int(os.getenv("RISMA_CSV_CHUNK_SIZE", "50000"))
+
+# deduplicate で完全一致に加えて会社名の表記ゆれ・複数キーによる名寄せも行う（既定は完全一致のみ）
+FUZZY_DEDUP = os.getenv("RISMA_FUZZY_DEDUP", "").lower() in ("1", "true", "yes")
+
+# 文字コードの判定に使う先頭のバイト数
+ENCODING_SAMPLE_SIZE = 1024 * 1024
+# 判定した文字コードで読めなかった場合に順に試す文字コード（latin1 はすべてのバイト列を読める）
+ENCODING_FALLBACKS = ('utf-8', 'cp932', 'latin1')
+
+# profiling で段階として計測するメソッド（レコードのリスト・DataFrame・CSVファイル単位の処理）
+PROFILED_STAGES = (
+    "normalize_company_data", "normalize_company_data_batch", "remove_duplicates", "remove_duplicates_external",
+    "remove_fuzzy_duplicates", "resolve_entities", "deduplicate", "filter_by_industry", "filter_by_location",
+    "process_csv_file", "iter_csv_file", "stream_csv_file", "suppress_frame", "export_to_csv",
+)
+# profiling で関数として計測するメソッド（1件ごとの処理）
+PROFILED_FUNCTIONS = (
+    "normalize_company_name", "normalize_phone_number", "normalize_address", "extract_prefecture_city",
+    "normalize_industry", "get_industry_code", "clean_whitespace", "duplicate_key", "merge_company_data",
+    "matches_industry",
+)
+
+# 計測していない間の段階（何もしない）
+_NOT_PROFILED = nullcontext()
+
+
+def detect_encoding(file_path: str, sample_size: int = ENCODING_SAMPLE_SIZE) -> str:
+    """
+    ファイルの先頭（BOM または sample_size バイト）から文字コードを判定する
+
+    UTF-8 として読めれば UTF-8、次に Shift_JIS（CP932）、どちらでもなければ latin1 とする。
+    先頭だけでは判定を誤ることがある（非ASCIIの文字が先頭より後にしかないなど）ため、
+    読み込みは encoding_candidates の順に試す。
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+        truncated = bool(f.read(1))
+    
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    
+    if truncated:
+        # 途中で切れた末尾の行（複数バイトの文字が切れていることがある）は判定に使わない
+        end = sample.rfind(b'\n')
+        if end > 0:
+            sample = sample[:end + 1]
+    for encoding in ('utf-8', 'cp932'):
+        # 行で切れない場合も、途中で切れた末尾の文字は続きがあるものとして扱う
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=not truncated)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    return 'latin1'
+
+def encoding_candidates(file_path: str, encoding: Optional[str] = None) -> List[str]:
+    """
+    読み込みに試す文字コード（指定された文字コードのみ、または判定した文字コードと ENCODING_FALLBACKS の残り）
+    """
+    if encoding:
+        return [encoding]
+    detected = detect_encoding(file_path)
+    return [detected] + [candidate for candidate in ENCODING_FALLBACKS if candidate != detected]
+
+def read_csv_chunks(file_path: str, chunksize: int, encoding: Optional[str] = None, **kwargs) -> Iterator[pd.DataFrame]:
+    """
+    CSVファイルを chunksize 行ずつ読み込む（文字コードを指定しない場合は encoding_candidates の順に試す）
+
+    途中で読めない文字があった場合は次の文字コードで読み直し、返し済みの行を読み飛ばして続きを返す。
+    """
+    candidates = encoding_candidates(file_path, encoding)
+    returned = 0
+    for index, candidate in enumerate(candidates):
+        skip = returned
+        try:
+            with pd.read_csv(file_path, encoding=candidate, chunksize=chunksize, **kwargs) as reader:
+                for chunk in reader:
+                    if skip:
+                        dropped = min(skip, len(chunk))
+                        skip -= dropped
+                        chunk = chunk.iloc[dropped:]
+                        if chunk.empty:
+                            continue
+                    returned += len(chunk)
+                    yield chunk
+            return
+        except UnicodeDecodeError:
+            if index == len(candidates) - 1:
+                raise
+            logger.warning(f"Could not decode {file_path} as {candidate}, retrying as {candidates[index + 1]}")
+
+def read_csv(file_path: str, **kwargs) -> pd.DataFrame:
+    """
+    CSVファイル全体を読み込む（encoding_candidates の順に試す）
+    """
+    candidates = encoding_candidates(file_path)
+    for candidate in candidates[:-1]:
+        try:
+            return pd.read_csv(file_path, encoding=candidate, **kwargs)
+        except UnicodeDecodeError:
+            logger.warning(f"Could not decode {file_path} as {candidate}, retrying with the next encoding")
+    return pd.read_csv(file_path, encoding=candidates[-1], **kwargs)
+
 class DataProcessor:
     """
     企業データの処理・クレンジングを行うクラス
     """
-    def __init__(self):
+    def __init__(self, memo_size: int = MEMO_SIZE):
         # 法人格の正規化パターン
-        self.company_suffixes = {
-            r'株式会社': '(株)',
-            r'有限会社': '(有)',
-            r'合同会社': '(同)',
-            r'一般社団法人': '(一社)',
-            r'公益社団法人': '(公社)',
-            r'一般財団法人': '(一財)',
-            r'公益財団法人': '(公財)',
-            r'社会福祉法人': '(福)',
-            r'医療法人': '(医)',
-            r'学校法人': '(学)',
-            r'宗教法人': '(宗)',
-            r'特定非営利活動法人': 'NPO法人',
-        }
+        self.company_suffixes = dict(text_normalizer.LEGAL_FORMS)
         
         # 都道府県の正規化
-        self.prefecture_mapping = {
-            '北海道': '北海道', '青森': '青森県', '岩手': '岩手県', '宮城': '宮城県',
-            '秋田': '秋田県', '山形': '山形県', '福島': '福島県', '茨城': '茨城県',
-            '栃木': '栃木県', '群馬': '群馬県', '埼玉': '埼玉県', '千葉': '千葉県',
-            '東京': '東京都', '神奈川': '神奈川県', '新潟': '新潟県', '富山': '富山県',
-            '石川': '石川県', '福井': '福井県', '山梨': '山梨県', '長野': '長野県',
-            '岐阜': '岐阜県', '静岡': '静岡県', '愛知': '愛知県', '三重': '三重県',
-            '滋賀': '滋賀県', '京都': '京都府', '大阪': '大阪府', '兵庫': '兵庫県',
-            '奈良': '奈良県', '和歌山': '和歌山県', '鳥取': '鳥取県', '島根': '島根県',
-            '岡山': '岡山県', '広島': '広島県', '山口': '山口県', '徳島': '徳島県',
-            '香川': '香川県', '愛媛': '愛媛県', '高知': '高知県', '福岡': '福岡県',
-            '佐賀': '佐賀県', '長崎': '長崎県', '熊本': '熊本県', '大分': '大分県',
-            '宮崎': '宮崎県', '鹿児島': '鹿児島県', '沖縄': '沖縄県'
+        self.prefecture_mapping = dict(text_normalizer.PREFECTURES)
+        
+        # 住所から都道府県・市区町村を求める地名辞書
+        self.gazetteer = default_gazetteer()
+        
+        # 業種名と業種コードの索引（WebScraper と共有する。マッピングを変更した場合は industry_index.rebuild を呼ぶ）
+        self.industry_index = default_industry_index()
+        self.industry_code_mapping = self.industry_index.mapping
+        
+        # 繰り返し現れる値の正規化結果を記憶する（memo_size 件まで。表を変更した場合は clear_memos を呼ぶ）
+        self.memos: Dict[str, Memo] = {
+            "normalize_company_name": Memo(text_normalizer.normalize_name, memo_size),
+            "normalize_address": Memo(text_normalizer.normalize_address, memo_size),
+            "normalize_industry": Memo(text_normalizer.normalize_industry, memo_size),
+            "extract_prefecture_city": Memo(self._resolve_prefecture_city, memo_size),
+            "get_industry_code": self.industry_index.classify,
         }
         
-        # 業種コードマッピング
-        self.industry_code_mapping = {
-            'IT・情報通信': '233',
-            'メーカー': '210',
-            '商社': '220',
-            '小売': '221',
-            '金融': '240',
-            '保険': '241',
-            '不動産': '250',
-            '建設': '251',
-            '運輸・物流': '260',
-            'マスコミ': '270',
-            '広告・マーケティング': '271',
-            'コンサルティング': '280',
-            '人材・教育': '290',
-            '医療・福祉': '300',
-            '飲食・宿泊': '310',
-            'サービス': '320',
-            '公的機関': '330',
-            'その他': '999'
-        }
+        # profiling の間の計測値（計測していない間は None）
+        self.profile: Optional[ProcessingProfile] = None
+    
+    @contextmanager
+    def profiling(self, profile: Optional[ProcessingProfile] = None):
+        """
+        with の間、段階（PROFILED_STAGES）・関数（PROFILED_FUNCTIONS）・一括処理の列ごとの処理時間を profile に記録する
+        
+        profile が None の場合は計測しない。このインスタンスのメソッドを置き換えるため、
+        with の間に同じインスタンスで行った処理はすべて記録される（ワーカープロセスでの処理は含まない）。
+        """
+        if profile is None:
+            yield None
+            return
+        if self.profile is not None:
+            raise RuntimeError("Profiling is already enabled for this processor")
+        
+        self.profile = profile
+        for name in PROFILED_STAGES:
+            setattr(self, name, profile.wrap_stage(name, getattr(self, name)))
+        for name in PROFILED_FUNCTIONS:
+            setattr(self, name, profile.wrap_function(name, getattr(self, name)))
+        try:
+            yield profile
+        finally:
+            for name in PROFILED_STAGES + PROFILED_FUNCTIONS:
+                del self.__dict__[name]
+            self.profile = None
+    
+    def _profile_stage(self, name: str, rows: int = 0):
+        """
+        一括処理の中の段階（計測していない間は何もしない）
+        """
+        if self.profile is None:
+            return _NOT_PROFILED
+        return self.profile.stage(name, rows)
     
     def normalize_company_data(self, company_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -113,176 +241,267 @@ class DataProcessor:
         
         return normalized_data
     
-    def normalize_company_name(self, name: str) -> str:
+    def normalize_company_data_batch(self, data):
         """
-        会社名を正規化する
+        normalize_company_data と同じ正規化を列ごとに一括で行う（列の中で異なる値ごとに1回だけ正規化する）
+
+        レコードのリストを渡した場合は normalize_company_data と同じ結果のリストを返す。
+        DataFrame を渡した場合は、欠損値（NaN・None）の項目を持たないレコードとして処理した結果を DataFrame で返す。
         """
-        if not name:
-            return ""
-        
-        # 前後の空白を削除
-        name = name.strip()
+        if isinstance(data, pd.DataFrame):
+            return self._normalize_frame_batch(data)
         
-        # 法人格の正規化
-        for pattern, replacement in self.company_suffixes.items():
-            name = re.sub(f'{pattern}', replacement, name)
-        
-        # カッコの正規化
-        name = re.sub(r'（', '(', name)
-        name = re.sub(r'）', ')', name)
-        
-        # 全角英数字を半角に変換
-        name = self.convert_fullwidth_to_halfwidth(name)
+        rows = [row for row in data if row and row.get("name")]
+        if not rows:
+            return []
+        columns = self._records_to_columns(rows)
+        if not self._batch_supported(columns):
+            return self.normalize_company_data(rows)
         
-        return name
+        columns, added = self._normalize_columns(columns)
+        return self._columns_to_records(rows, {key: column.tolist() for key, column in columns.items()}, added)
+    
+    @staticmethod
+    def _records_to_columns(rows: List[Dict[str, Any]]) -> Dict[str, pd.Series]:
+        """
+        レコードのリストを列ごとの値に変換する（項目がない要素は _MISSING）
+        """
+        keys = list(dict.fromkeys(key for row in rows for key in row))
+        return {key: pd.Series([row.get(key, _MISSING) for row in rows], dtype=object) for key in keys}
+    
+    @staticmethod
+    def _columns_to_records(rows: List[Dict[str, Any]], values: Dict[str, list], added: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        正規化した列の値を、元のレコードと同じ項目の順序のレコードに戻す（CompanyRecord は CompanyRecord に戻す）
+        """
+        normalized_data = []
+        for i, row in enumerate(rows):
+            normalized = {key: values[key][i] for key in row}
+            # 正規化で新たに設定された項目（都道府県・市区町村・業種コード）は末尾に追加される
+            for key, mask in added.items():
+                if mask[i]:
+                    normalized[key] = values[key][i]
+            normalized_data.append(CompanyRecord(normalized) if isinstance(row, CompanyRecord) else normalized)
+        return normalized_data
+    
+    def _normalize_frame_batch(self, df: pd.DataFrame) -> pd.DataFrame:
+        columns = {}
+        for key in df.columns:
+            column = df[key].to_numpy(dtype=object, copy=True)
+            column[pd.isna(column)] = _MISSING
+            columns[key] = pd.Series(column, dtype=object)
+        
+        if "name" not in columns:
+            return pd.DataFrame()
+        keep = np.fromiter((value is not _MISSING and bool(value) for value in columns["name"]), bool, len(df))
+        columns = {key: column[keep].reset_index(drop=True) for key, column in columns.items()}
+        if not keep.any():
+            return pd.DataFrame()
+        
+        if not self._batch_supported(columns):
+            keys = list(columns)
+            rows = [
+                {key: value for key, value in zip(keys, values) if value is not _MISSING}
+                for values in zip(*(column.tolist() for column in columns.values()))
+            ]
+            return pd.DataFrame(self.normalize_company_data(rows))
+        
+        columns, _ = self._normalize_columns(columns)
+        frame = {}
+        for key, column in columns.items():
+            column = column.to_numpy(dtype=object, copy=True)
+            column[~self._present(column)] = np.nan
+            frame[key] = column
+        return pd.DataFrame(frame).infer_objects()
+    
+    @staticmethod
+    def _present(column) -> np.ndarray:
+        return np.fromiter((value is not _MISSING for value in column), bool, len(column))
+    
+    @staticmethod
+    def _strings(column) -> np.ndarray:
+        return np.fromiter((isinstance(value, str) for value in column), bool, len(column))
+    
+    def _batch_supported(self, columns: Dict[str, pd.Series]) -> bool:
+        """
+        正規化対象の項目がすべて文字列（または空の値）かどうか
+
+        文字列以外の値がある場合は、例外も含めて同じ結果になるようレコードごとの処理に任せる。
+        """
+        for key in ("name", "phone", "address", "industry"):
+            column = columns.get(key)
+            if column is None:
+                continue
+            for value in column:
+                if value is not _MISSING and value and not isinstance(value, str):
+                    return False
+        return True
+    
+    def _normalize_columns(self, columns: Dict[str, pd.Series]):
+        """
+        列ごとに正規化する（値がない要素は _MISSING）
+
+        正規化後の列と、新たに項目が設定された行のマスク（項目名ごと）を返す。
+        """
+        size = len(columns["name"])
+        empty = pd.Series([_MISSING] * size, dtype=object)
+        added: Dict[str, np.ndarray] = {}
+        
+        def truthy(key: str) -> np.ndarray:
+            column = columns.get(key)
+            if column is None:
+                return np.zeros(size, bool)
+            return np.fromiter((value is not _MISSING and bool(value) for value in column), bool, size)
+        
+        def assign(key: str, mask: np.ndarray, values: pd.Series) -> None:
+            column = columns.get(key, empty).copy()
+            added[key] = added.get(key, np.zeros(size, bool)) | (mask & ~self._present(column))
+            column[mask] = values[mask]
+            columns[key] = column
+        
+        # 会社名の正規化
+        with self._profile_stage("normalize_columns.name", size):
+            columns["name"] = self._map_unique(columns["name"], text_normalizer.normalize_name)
+        
+        # 電話番号の正規化
+        if "phone" in columns:
+            with self._profile_stage("normalize_columns.phone", size):
+                phone = columns["phone"].copy()
+                present = self._present(phone)
+                strings = self._strings(phone)
+                phone[present & ~strings] = ""
+                phone[strings] = self._map_unique(phone[strings], text_normalizer.normalize_phone)
+                columns["phone"] = phone
+        
+        # 住所の正規化と都道府県・市区町村の抽出
+        if "address" in columns:
+            with self._profile_stage("normalize_columns.address", size):
+                address = columns["address"].copy()
+                present = self._present(address)
+                strings = self._strings(address)
+                address[present & ~strings] = ""
+                address[strings] = self._map_unique(address[strings], text_normalizer.normalize_address)
+                columns["address"] = address
+            
+            with self._profile_stage("normalize_columns.prefecture_city", size):
+                prefecture = pd.Series("", index=address.index, dtype=object)
+                city = pd.Series("", index=address.index, dtype=object)
+                codes, uniques = pd.factorize(address[strings].to_numpy(dtype=object))
+                locations = [self.extract_prefecture_city(value) for value in uniques]
+                prefecture[strings] = np.array([location[0] for location in locations], dtype=object)[codes]
+                city[strings] = np.array([location[1] for location in locations], dtype=object)[codes]
+                has_prefecture = truthy("prefecture")
+                has_city = truthy("city")
+                assign("prefecture", present & (prefecture != "").to_numpy() & ~has_prefecture, prefecture)
+                assign("city", present & (city != "").to_numpy() & ~has_city, city)
+        
+        # 業種の正規化と業種コードの設定
+        if "industry" in columns:
+            with self._profile_stage("normalize_columns.industry", size):
+                has_industry = truthy("industry")
+                industry = columns["industry"].copy()
+                industry[has_industry] = self._map_unique(industry[has_industry], text_normalizer.normalize_industry)
+                columns["industry"] = industry
+                
+                needs_code = has_industry & ~truthy("industry_code")
+                if needs_code.any():
+                    # 業種名は重複が多いため、異なる値ごとに1回だけコードを求める
+                    codes = pd.Series("", index=industry.index, dtype=object)
+                    codes[needs_code] = self.classify_industries(industry[needs_code])
+                    assign("industry_code", needs_code, codes)
+        
+        # 空白・タブ・改行の削除
+        with self._profile_stage("normalize_columns.whitespace", size):
+            for key, column in columns.items():
+                strings = self._strings(column)
+                if strings.any():
+                    column = column.copy()
+                    column[strings] = self._map_unique(column[strings], text_normalizer.clean_whitespace)
+                    columns[key] = column
+        
+        return columns, added
+    
+    @staticmethod
+    def _map_unique(values: pd.Series, func: Callable[[str], str]) -> pd.Series:
+        """
+        文字列の列の異なる値ごとに1回だけ func を適用し、元の行に展開する
+        """
+        codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+        result = np.empty(len(uniques), dtype=object)
+        result[:] = [func(value) for value in uniques]
+        return pd.Series(result[codes], index=values.index, dtype=object)
+    
+    def normalize_company_name(self, name: str) -> str:
+        """
+        会社名を正規化する
+        """
+        return self.memos["normalize_company_name"](name)
     
     def normalize_phone_number(self, phone: str) -> str:
         """
         電話番号を正規化する
         """
-        if not phone:
-            return ""
-        
-        # 空白、ハイフン、カッコを削除
-        phone = re.sub(r'[\s\-（）\(\)]', '', phone)
-        
-        # 全角数字を半角に変換
-        phone = self.convert_fullwidth_to_halfwidth(phone)
-        
-        # 市外局番、市内局番、番号の区切りを追加
-        if len(phone) == 10:  # 固定電話（市外局番2桁）
-            phone = f"{phone[:2]}-{phone[2:6]}-{phone[6:]}"
-        elif len(phone) == 11:  # 携帯電話または固定電話（市外局番3桁）
-            if phone.startswith("0"):
-                if phone.startswith("090") or phone.startswith("080") or phone.startswith("070"):  # 携帯電話
-                    phone = f"{phone[:3]}-{phone[3:7]}-{phone[7:]}"
-                else:  # 固定電話
-                    phone = f"{phone[:3]}-{phone[3:7]}-{phone[7:]}"
-        elif len(phone) == 9:  # 固定電話（市外局番なし）
-            phone = f"{phone[:3]}-{phone[3:7]}-{phone[7:]}"
-        
-        return phone
+        return text_normalizer.normalize_phone(phone)
     
     def normalize_address(self, address: str) -> str:
         """
         住所を正規化する
         """
-        if not address:
-            return ""
-        
-        # 前後の空白を削除
-        address = address.strip()
-        
-        # 全角英数字を半角に変換
-        address = self.convert_fullwidth_to_halfwidth(address)
-        
-        # 都道府県の正規化
-        for short_name, full_name in self.prefecture_mapping.items():
-            if address.startswith(short_name) and not address.startswith(full_name):
-                address = address.replace(short_name, full_name, 1)
-                break
-        
-        # 番地表記の正規化
-        address = re.sub(r'([0-9]+)－([0-9]+)', r'\1-\2', address)  # 全角ハイフンを半角に
-        address = re.sub(r'([0-9]+)番地?([0-9]+)', r'\1-\2', address)  # 「番地」を「-」に
-        
-        # 建物名の前にスペースを追加
-        address = re.sub(r'([0-9]+階)([^\s])', r'\1 \2', address)
-        address = re.sub(r'([0-9]+F)([^\s])', r'\1 \2', address)
-        
-        return address
+        return self.memos["normalize_address"](address)
     
     def extract_prefecture_city(self, address: str) -> tuple:
         """
         住所から都道府県と市区町村を抽出する
         """
-        if not address:
-            return "", ""
-        
-        prefecture = ""
-        city = ""
-        
-        # 都道府県を抽出
-        for full_name in self.prefecture_mapping.values():
-            if full_name in address:
-                prefecture = full_name
-                # 都道府県の後の文字列を取得
-                after_pref = address[address.index(full_name) + len(full_name):]
-                
-                # 市区町村を抽出
-                city_match = re.search(r'([^\s]{2,6}[市区町村])', after_pref)
-                if city_match:
-                    city = city_match.group(1)
-                
-                break
-        
-        return prefecture, city
+        return self.memos["extract_prefecture_city"](address)
+    
+    def _resolve_prefecture_city(self, address: str) -> tuple:
+        location = self.gazetteer.resolve(address)
+        return location.prefecture, location.city
     
     def normalize_industry(self, industry: str) -> str:
         """
         業種を正規化する
         """
-        if not industry:
-            return ""
-        
-        # 前後の空白を削除
-        industry = industry.strip()
-        
-        # 全角英数字を半角に変換
-        industry = self.convert_fullwidth_to_halfwidth(industry)
-        
-        return industry
+        return self.memos["normalize_industry"](industry)
     
     def get_industry_code(self, industry: str) -> str:
         """
         業種からコードを取得する
         """
-        if not industry:
-            return ""
-        
-        # 業種名から最も近いコードを探す
-        for name, code in self.industry_code_mapping.items():
-            if name in industry or industry in name:
-                return code
-        
-        # 部分一致で探す
-        for name, code in self.industry_code_mapping.items():
-            for word in name.split('・'):
-                if word in industry:
-                    return code
-        
-        return "999"  # その他
+        return self.memos["get_industry_code"](industry)
+    
+    def classify_industries(self, industries) -> np.ndarray:
+        """
+        業種の列をまとめて業種コードにする（異なる値ごとに1回だけ求める）
+        """
+        return self.industry_index.classify_industries(industries)
+    
+    def memo_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        正規化の結果のキャッシュの統計（関数ごとのヒット数・ミス数・件数・ヒット率）
+        """
+        return {name: memo.stats() for name, memo in self.memos.items()}
+    
+    def clear_memos(self) -> None:
+        """
+        正規化の結果のキャッシュを消去する（業種コードのマッピングを変更した場合は業種の索引も作り直す）
+        """
+        self.industry_index.rebuild()
+        for memo in self.memos.values():
+            memo.clear()
     
     def clean_whitespace(self, text: str) -> str:
         """
         空白、タブ、改行を整理する
         """
-        if not text:
-            return ""
-        
-        # 連続する空白、タブ、改行を1つの空白に置換
-        text = re.sub(r'\s+', ' ', text)
-        # 前後の空白を削除
-        text = text.strip()
-        
-        return text
+        return text_normalizer.clean_whitespace(text)
     
     def convert_fullwidth_to_halfwidth(self, text: str) -> str:
         """
-        全角英数字を半角に変換する
+        全角英数字・記号を半角に変換する（半角カタカナは全角に変換する）
         """
-        if not text:
-            return ""
-        
-        # 全角英数字の変換テーブル
-        fullwidth_chars = "０１２３４５６７８９ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ"
-        halfwidth_chars = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
-        
-        # 変換テーブルを作成
-        table = str.maketrans(fullwidth_chars, halfwidth_chars)
-        
-        # 変換を適用
-        return text.translate(table)
+        return text_normalizer.normalize_width(text)
     
     def remove_duplicates(self, company_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -295,26 +514,12 @@ class DataProcessor:
         unique_companies = {}
         
         for company in company_data_list:
-            # 会社名と電話番号をキーとして使用
-            name = company.get("name", "")
-            phone = company.get("phone", "")
-            
-            # 会社名のみ、または電話番号のみでも重複チェック
-            name_key = name.lower() if name else ""
-            phone_key = re.sub(r'[^\d]', '', phone) if phone else ""
+            key = self.duplicate_key(company)
             
             # 両方空の場合はスキップ
-            if not name_key and not phone_key:
+            if not key:
                 continue
             
-            # キーの生成
-            if name_key and phone_key:
-                key = f"{name_key}_{phone_key}"
-            elif name_key:
-                key = f"name_{name_key}"
-            else:
-                key = f"phone_{phone_key}"
-            
             # 重複チェック
             if key not in unique_companies:
                 unique_companies[key] = company
@@ -326,14 +531,83 @@ class DataProcessor:
         
         return list(unique_companies.values())
     
+    @staticmethod
+    def duplicate_key(company: Dict[str, Any]) -> str:
+        """
+        remove_duplicates で重複とみなすキー（会社名と電話番号。両方空の場合は空文字列）
+        """
+        # 会社名と電話番号をキーとして使用
+        name = company.get("name", "")
+        phone = company.get("phone", "")
+        
+        # 会社名のみ、または電話番号のみでも重複チェック
+        name_key = name.lower() if name else ""
+        phone_key = re.sub(r'[^\d]', '', phone) if phone else ""
+        
+        if name_key and phone_key:
+            return f"{name_key}_{phone_key}"
+        elif name_key:
+            return f"name_{name_key}"
+        elif phone_key:
+            return f"phone_{phone_key}"
+        return ""
+    
+    def remove_duplicates_external(self, company_data: Iterable[Dict[str, Any]], partitions: Optional[int] = None,
+                                   workers: int = 1, tmp_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        remove_duplicates と同じ重複削除を、重複キーで分けたディスク上のパーティションごとに行う
+        
+        メモリに載らない件数のデータ用で、入力は1回だけ読み、結果を remove_duplicates と同じ順序で1件ずつ返す。
+        workers が2以上の場合はパーティションをプロセスプールで並列に処理する。
+        """
+        from app.services.external_dedup import ExternalDeduplicator, EXTERNAL_DEDUP_PARTITIONS, EXTERNAL_DEDUP_DIR
+        deduplicator = ExternalDeduplicator(self, partitions=partitions or EXTERNAL_DEDUP_PARTITIONS,
+                                            workers=workers, tmp_dir=tmp_dir or EXTERNAL_DEDUP_DIR)
+        return deduplicator.deduplicate(company_data)
+    
+    def remove_fuzzy_duplicates(self, company_data_list: List[Dict[str, Any]], threshold: float = 0.8) -> List[Dict[str, Any]]:
+        """
+        会社名の表記ゆれ（法人格の位置や略称、記号の違いなど）を吸収して重複する企業データをまとめる
+        """
+        if not company_data_list:
+            return []
+        return FuzzyDeduplicator(threshold=threshold).deduplicate(company_data_list, self.merge_company_data)
+    
+    def resolve_entities(self, company_data_list: List[Dict[str, Any]], keys: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        電話番号・メールアドレスなどのいずれかが一致する企業データを推移的にまとめる
+        
+        keys を指定しない場合は DEFAULT_ENTITY_KEYS（公式サイトのドメインは keys で指定した場合だけ使う）。
+        まとめたデータには cluster_id（入力での先頭のデータの位置）と cluster_size が付く。
+        """
+        if not company_data_list:
+            return []
+        return EntityResolver(keys).resolve(company_data_list, self.merge_company_data)
+    
+    def deduplicate(self, company_data_list: List[Dict[str, Any]],
+                    fuzzy: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        完全一致の重複をまとめる
+
+        fuzzy が True の場合は続けて会社名の表記ゆれ・複数キーによる名寄せの順にまとめる
+        （None の場合は RISMA_FUZZY_DEDUP に従う）。
+        """
+        unique = self.remove_duplicates(company_data_list)
+        if not (FUZZY_DEDUP if fuzzy is None else fuzzy):
+            return unique
+        unique = self.remove_fuzzy_duplicates(unique)
+        return self.resolve_entities(unique)
+    
     def merge_company_data(self, company1: Dict[str, Any], company2: Dict[str, Any]) -> Dict[str, Any]:
         """
         2つの企業データをマージする（より多くの情報を持つ方を優先）
+        
+        company1 が CompanyRecord の場合は CompanyRecord を返す。
         """
-        merged = {}
+        merged = CompanyRecord() if isinstance(company1, CompanyRecord) else {}
         
-        # すべてのキーを取得
-        all_keys = set(company1.keys()) | set(company2.keys())
+        # すべてのキーを取得（company1 の順、続いて company2 にだけある項目の順。プロセスによらず同じ順序にする）
+        all_keys = dict.fromkeys([*company1.keys(), *company2.keys()])
         
         for key in all_keys:
             value1 = company1.get(key, "")
@@ -380,29 +654,19 @@ class DataProcessor:
         if not industry_codes:
             return company_data_list
         
-        filtered_data = []
-        
-        for company in company_data_list:
-            industry_code = company.get("industry_code", "")
-            industry = company.get("industry", "")
-            
-            # 業種コードが一致
-            if industry_code and industry_code in industry_codes:
-                filtered_data.append(company)
-                continue
-            
-            # 業種名から判断
-            if industry:
-                for code in industry_codes:
-                    for name, mapping_code in self.industry_code_mapping.items():
-                        if mapping_code == code and (name in industry or industry in name):
-                            filtered_data.append(company)
-                            break
-                    else:
-                        continue
-                    break
+        codes = set(industry_codes)
+        return [company for company in company_data_list if self.matches_industry(company, codes)]
+    
+    def matches_industry(self, company: Dict[str, Any], codes: Set[str]) -> bool:
+        """
+        企業データが業種コードのいずれかに当たるか
+        """
+        industry_code = company.get("industry_code", "")
+        industry = company.get("industry", "")
         
-        return filtered_data
+        # 業種コードが一致、または業種名から判断
+        return bool((industry_code and industry_code in codes) or
+                    (industry and not codes.isdisjoint(self.industry_index.matching_codes(industry))))
     
     def filter_by_location(self, company_data_list: List[Dict[str, Any]], prefectures: Optional[List[str]] = None, cities: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
@@ -411,48 +675,8 @@ class DataProcessor:
         if not prefectures and not cities:
             return company_data_list
         
-        filtered_data = []
-        
-        for company in company_data_list:
-            prefecture = company.get("prefecture", "")
-            city = company.get("city", "")
-            address = company.get("address", "")
-            
-            # 都道府県のフィルタリング
-            prefecture_match = False
-            if prefectures:
-                if prefecture and prefecture in prefectures:
-                    prefecture_match = True
-                elif not prefecture and address:
-                    for pref in prefectures:
-                        if pref in address:
-                            prefecture_match = True
-                            break
-            else:
-                prefecture_match = True
-            
-            # 都道府県が一致しない場合はスキップ
-            if not prefecture_match:
-                continue
-            
-            # 市区町村のフィルタリング
-            city_match = False
-            if cities:
-                if city and city in cities:
-                    city_match = True
-                elif not city and address:
-                    for c in cities:
-                        if c in address:
-                            city_match = True
-                            break
-            else:
-                city_match = True
-            
-            # 市区町村も一致する場合のみ追加
-            if city_match:
-                filtered_data.append(company)
-        
-        return filtered_data
+        # 都道府県・市区町村が設定されていない企業は住所から求める
+        return [company for company in company_data_list if self.gazetteer.matches(company, prefectures, cities)]
     
     def preprocess_csv_data(self, csv_content: str) -> str:
         """
@@ -481,6 +705,17 @@ class DataProcessor:
         if df.empty:
             return df
         
+        # 列名を変更
+        renamed_columns = self.standardize_column_names(df.columns)
+        if renamed_columns:
+            df = df.rename(columns=renamed_columns)
+        
+        return df
+    
+    def standardize_column_names(self, columns) -> Dict[str, str]:
+        """
+        元の列名から標準の列名への対応（変更する列のみ）
+        """
         # 列名のマッピング
         column_mapping = {
             '会社名': 'name',
@@ -521,70 +756,173 @@ class DataProcessor:
         
         # 列名を標準化
         renamed_columns = {}
-        for col in df.columns:
+        for col in columns:
             col_lower = col.lower()
             for jp_name, en_name in column_mapping.items():
                 if jp_name.lower() in col_lower or col_lower in jp_name.lower():
                     renamed_columns[col] = en_name
                     break
         
-        # 列名を変更
-        if renamed_columns:
-            df = df.rename(columns=renamed_columns)
-        
-        return df
+        return renamed_columns
     
-    def process_csv_file(self, file_path: str) -> pd.DataFrame:
+    def process_csv_file(self, file_path: str, workers: int = 1, suppression=None) -> pd.DataFrame:
         """
-        CSVファイルを処理する
+        CSVファイルを処理する（workers が2以上の場合は ParallelNormalizer で並列に正規化する）
+        
+        suppression（SuppressionList・SuppressionSet）を渡した場合は、除外リストにある企業の行を除く。
         """
-        try:
-            # CSVファイルを読み込む
-            df = pd.read_csv(file_path, encoding='utf-8')
-        except UnicodeDecodeError:
-            try:
-                # Shift-JISで試す
-                df = pd.read_csv(file_path, encoding='shift_jis')
-            except:
-                try:
-                    # CP932で試す
-                    df = pd.read_csv(file_path, encoding='cp932')
-                except:
-                    # その他のエンコーディングで試す
-                    df = pd.read_csv(file_path, encoding='latin1')
+        # CSVファイルを読み込む（文字コードは先頭から判定し、読めない文字があれば次の候補で読み直す）
+        df = read_csv(file_path)
         
         # 列名を標準化
         df = self.standardize_columns(df)
         
+        if workers > 1:
+            from app.services.parallel_normalizer import ParallelNormalizer
+            with ParallelNormalizer(self, workers=workers) as normalizer:
+                df = normalizer.normalize_csv_frame(df)
+        else:
+            df = self._normalize_csv_frame(df)
+        if suppression:
+            df = self.suppress_frame(df, suppression).reset_index(drop=True)
+        return df
+    
+    def iter_csv_file(self, file_path: str, chunksize: int = CSV_CHUNK_SIZE, encoding: Optional[str] = None,
+                      workers: int = 1, suppression=None) -> Iterator[pd.DataFrame]:
+        """
+        CSVファイルを chunksize 行ずつ読み込み、正規化したデータフレームを順に返す
+        
+        ファイル全体を読み込まないため、ファイルの大きさによらずメモリ使用量は一定になる。
+        分割ごとに型が変わらないよう、すべての列を文字列として読み込む。
+        workers が2以上の場合は、読み込んだ分割をプロセスプールで並列に正規化する。
+        suppression を渡した場合は、除外リストにある企業の行を除く。
+        """
+        chunks = self._read_csv_chunks(file_path, chunksize, encoding)
+        if workers > 1:
+            from app.services.parallel_normalizer import ParallelNormalizer
+            with ParallelNormalizer(self, workers=workers) as normalizer:
+                for chunk in normalizer.map_csv_frames(chunks):
+                    yield self.suppress_frame(chunk, suppression)
+        else:
+            for chunk in chunks:
+                yield self.suppress_frame(self._normalize_csv_frame(chunk), suppression)
+    
+    def suppress_frame(self, df: pd.DataFrame, suppression) -> pd.DataFrame:
+        """
+        電話番号・Webサイト・メールアドレスが除外リストにある行を除く
+        """
+        columns = [column for column in ("phone", "website", "email") if column in df.columns]
+        if not suppression or not columns or df.empty:
+            return df
+        values = df[columns].fillna("").astype(str)
+        keep = np.fromiter(
+            (not suppression.is_suppressed(dict(zip(columns, row))) for row in values.itertuples(index=False, name=None)),
+            dtype=bool, count=len(values),
+        )
+        return df if keep.all() else df[keep]
+    
+    def _read_csv_chunks(self, file_path: str, chunksize: int, encoding: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        columns = None
+        for chunk in read_csv_chunks(file_path, chunksize, encoding, dtype=str, keep_default_na=False):
+            # 列名はヘッダーから1回だけ標準化する
+            if columns is None:
+                renamed_columns = self.standardize_column_names(chunk.columns)
+                columns = [renamed_columns.get(col, col) for col in chunk.columns]
+            chunk.columns = columns
+            yield chunk
+    
+    def stream_csv_file(self, file_path: str, output_path: str, chunksize: int = CSV_CHUNK_SIZE,
+                        encoding: Optional[str] = None, output_encoding: str = 'utf-8', workers: int = 1,
+                        dedup: bool = False, suppression=None) -> int:
+        """
+        CSVファイルを分割して正規化し、output_path に順に書き出す（書き出した行数を返す）
+        
+        dedup が True の場合は remove_duplicates_external で重複を削除してから書き出す。
+        suppression を渡した場合は、除外リストにある企業の行を除く。
+        """
+        chunks = self.iter_csv_file(file_path, chunksize=chunksize, encoding=encoding, workers=workers,
+                                    suppression=suppression)
+        if dedup:
+            chunks = self._dedup_csv_chunks(chunks, chunksize, workers)
+        rows = 0
+        with open(output_path, 'w', encoding=output_encoding, newline='') as f:
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=rows == 0)
+                rows += len(chunk)
+        return rows
+    
+    def _dedup_csv_chunks(self, chunks: Iterator[pd.DataFrame], chunksize: int, workers: int) -> Iterator[pd.DataFrame]:
+        columns = []
+        
+        def records():
+            for chunk in chunks:
+                if not columns:
+                    columns.extend(chunk.columns)
+                yield from chunk.to_dict('records')
+        
+        batch = []
+        for company in self.remove_duplicates_external(records(), workers=workers):
+            batch.append(company)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    
+    @staticmethod
+    def _csv_text_columns(df: pd.DataFrame) -> List[str]:
+        """
+        _normalize_csv_frame で文字列として正規化する列（欠損値を空文字列にした後の文字列型の列）
+        """
+        return list(df.fillna("").select_dtypes(include=['object']).columns)
+    
+    def _normalize_csv_frame(self, df: pd.DataFrame, text_columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        CSVから読み込んだデータフレームを正規化する（列の中で異なる値ごとに1回だけ正規化する）
+        
+        一部の行ずつ正規化する場合は、全体から求めた text_columns を渡す（欠損値の有無で列の型が
+        変わるため、行ごとに求めると正規化する列が全体を正規化した場合と異なることがある）。
+        """
         # 欠損値を空文字列に置換
         df = df.fillna("")
+        rows = len(df)
+        if text_columns is None:
+            text_columns = list(df.select_dtypes(include=['object']).columns)
         
         # 文字列型の列のみ処理
-        for col in df.select_dtypes(include=['object']).columns:
+        for col in text_columns:
             # 空白、タブ、改行を整理
-            df[col] = df[col].apply(lambda x: self.clean_whitespace(str(x)) if pd.notna(x) else "")
+            with self._profile_stage("normalize_csv_frame.whitespace", rows):
+                df[col] = self._map_unique(df[col].astype(str), self.clean_whitespace)
             
             # 列に応じた正規化
             if col == 'name':
-                df[col] = df[col].apply(self.normalize_company_name)
+                with self._profile_stage("normalize_csv_frame.name", rows):
+                    df[col] = self._map_unique(df[col], self.normalize_company_name)
             elif col == 'phone':
-                df[col] = df[col].apply(self.normalize_phone_number)
+                with self._profile_stage("normalize_csv_frame.phone", rows):
+                    df[col] = self._map_unique(df[col], self.normalize_phone_number)
             elif col == 'address':
-                df[col] = df[col].apply(self.normalize_address)
+                with self._profile_stage("normalize_csv_frame.address", rows):
+                    df[col] = self._map_unique(df[col], self.normalize_address)
             elif col == 'industry':
-                df[col] = df[col].apply(self.normalize_industry)
+                with self._profile_stage("normalize_csv_frame.industry", rows):
+                    df[col] = self._map_unique(df[col], self.normalize_industry)
         
         # 都道府県と市区町村を抽出
         if 'address' in df.columns and ('prefecture' not in df.columns or 'city' not in df.columns):
-            prefecture_city = df['address'].apply(self.extract_prefecture_city)
-            if 'prefecture' not in df.columns:
-                df['prefecture'] = prefecture_city.apply(lambda x: x[0])
-            if 'city' not in df.columns:
-                df['city'] = prefecture_city.apply(lambda x: x[1])
+            with self._profile_stage("normalize_csv_frame.prefecture_city", rows):
+                codes, uniques = pd.factorize(df['address'].to_numpy(dtype=object))
+                locations = [self.extract_prefecture_city(value) for value in uniques]
+                if 'prefecture' not in df.columns:
+                    df['prefecture'] = np.array([location[0] for location in locations], dtype=object)[codes]
+                if 'city' not in df.columns:
+                    df['city'] = np.array([location[1] for location in locations], dtype=object)[codes]
         
         # 業種コードを設定
         if 'industry' in df.columns and 'industry_code' not in df.columns:
-            df['industry_code'] = df['industry'].apply(self.get_industry_code)
+            with self._profile_stage("normalize_csv_frame.industry_code", rows):
+                df['industry_code'] = self.classify_industries(df['industry'])
         
         return df
     
@@ -597,7 +935,7 @@ class DataProcessor:
         
         try:
             # DataFrameに変換
-            df = pd.DataFrame(company_data_list)
+            df = pd.DataFrame(as_dicts(company_data_list))
             
             # 列の順序を指定
             columns_order = [
@@ -0,0 +1,60 @@
+"""
+素集合データ構造（union-find）
+"""
+from typing import Dict, List
+
+
+class DisjointSet:
+    """
+    0 から size - 1 までの要素を互いに素な集合に分けて管理するクラス
+
+    サイズによる結合と経路の短縮により、1回の操作はほぼ定数時間で済む。
+    """
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def find(self, item: int) -> int:
+        """
+        要素が属する集合の代表
+        """
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> int:
+        """
+        2つの要素の集合を結合し、結合後の代表を返す
+        """
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+    def connected(self, a: int, b: int) -> bool:
+        return self.find(a) == self.find(b)
+
+    def labels(self) -> List[int]:
+        """
+        各要素の集合の番号（集合の中で最も小さい要素）
+        """
+        first: Dict[int, int] = {}
+        return [first.setdefault(self.find(item), item) for item in range(len(self.parent))]
+
+    def groups(self) -> Dict[int, List[int]]:
+        """
+        集合の番号ごとの要素の一覧
+        """
+        groups: Dict[int, List[int]] = {}
+        for item, label in enumerate(self.labels()):
+            groups.setdefault(label, []).append(item)
+        return groups
@@ -0,0 +1,163 @@
+"""
+複数のキーによる企業データの名寄せ
+
+電話番号・Webサイトのドメイン・メールアドレスなど、いずれかのキーが一致するレコードを同じ企業とみなし、
+キーをたどって推移的につながるレコードを1つのクラスタにまとめる。
+"""
+import re
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+
+from app.services import text_normalizer
+from app.services.disjoint_set import DisjointSet
+from app.services.fuzzy_dedup import name_key, phone_digits, website_domain
+
+# 2階層のドメイン（co.jp など）の下で登録されるドメイン
+_SECOND_LEVEL_DOMAINS = {
+    "co.jp", "or.jp", "ne.jp", "ac.jp", "ad.jp", "ed.jp", "go.jp", "gr.jp", "lg.jp",
+    "co.uk", "org.uk", "com.au", "com.cn", "com.tw", "co.kr",
+}
+# 複数の企業が同じドメインを使うサービス（ドメインをキーにしない）
+SHARED_DOMAINS = {
+    "gmail.com", "yahoo.co.jp", "ybb.ne.jp", "hotmail.com", "outlook.com", "outlook.jp", "icloud.com",
+    "nifty.com", "biglobe.ne.jp", "ocn.ne.jp", "so-net.ne.jp",
+    "wixsite.com", "jimdofree.com", "jimdo.com", "fc2.com", "ameblo.jp", "hatenablog.com",
+    "blogspot.com", "wordpress.com", "studio.site", "base.shop", "facebook.com", "instagram.com",
+}
+
+_ADDRESS_NUMBER_RE = re.compile(r'(\d+)(?:丁目|番地|番|号)')
+_ADDRESS_SEPARATOR_RE = re.compile(r'[\s\-‐‑‒–—―−－]+')
+
+
+def registrable_domain(host: str) -> str:
+    """
+    ホスト名のうち登録されたドメインの部分（例: www.shop.example.co.jp → example.co.jp）
+    """
+    labels = host.lower().strip('.').split('.')
+    # IPアドレスはドメインとして扱わない
+    if len(labels) < 2 or labels[-1].isdigit():
+        return ""
+    size = 3 if '.'.join(labels[-2:]) in _SECOND_LEVEL_DOMAINS else 2
+    return '.'.join(labels[-size:]) if len(labels) >= size else ""
+
+
+def canonical_address(address: str) -> str:
+    """
+    比較用の住所（「1丁目2番3号」を「1-2-3」にし、空白と区切り記号の違いをなくしたもの）
+    """
+    if not address:
+        return ""
+    address = text_normalizer.normalize_address(address)
+    address = _ADDRESS_NUMBER_RE.sub(r'\1-', address)
+    return _ADDRESS_SEPARATOR_RE.sub('-', address).strip('-')
+
+
+def phone_key(record: Dict[str, Any]) -> str:
+    return phone_digits(record.get("phone") or "")
+
+
+def domain_key(record: Dict[str, Any]) -> str:
+    """
+    公式サイトのドメイン（website が取得元のページと同じドメインの場合は、クローラーが取得元のURLを入れたもので
+    ディレクトリ・検索結果のサイトであり得るため、キーにしない）
+    """
+    domain = registrable_domain(website_domain(record.get("website") or ""))
+    if not domain or domain in SHARED_DOMAINS:
+        return ""
+    source = record.get("source_url") or ""
+    if source and registrable_domain(website_domain(source)) == domain:
+        return ""
+    return domain
+
+
+def email_key(record: Dict[str, Any]) -> str:
+    email = (record.get("email") or "").strip().lower()
+    return email if '@' in email else ""
+
+
+def email_domain_address_key(record: Dict[str, Any]) -> str:
+    email = email_key(record)
+    address = canonical_address(record.get("address") or "")
+    if not email or not address:
+        return ""
+    domain = registrable_domain(email.rsplit('@', 1)[1])
+    return f"{domain}|{address}" if domain and domain not in SHARED_DOMAINS else ""
+
+
+def name_address_key(record: Dict[str, Any]) -> str:
+    name = name_key(record.get("name") or "")
+    address = canonical_address(record.get("address") or "")
+    return f"{name}|{address}" if name and address else ""
+
+
+def name_prefecture_key(record: Dict[str, Any]) -> str:
+    name = name_key(record.get("name") or "")
+    prefecture = record.get("prefecture") or ""
+    return f"{name}|{prefecture}" if name and prefecture else ""
+
+
+# 名寄せに使うキー（空文字列のレコードはそのキーでは結合しない）
+# 同じビルに複数の企業が入居するため、住所だけ・会社名だけではキーにしない
+ENTITY_KEYS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "phone": phone_key,
+    "domain": domain_key,
+    "email": email_key,
+    "email_domain_address": email_domain_address_key,
+    "name_address": name_address_key,
+    "name_prefecture": name_prefecture_key,
+}
+
+
+# 既定で使うキー（domain は公式サイトの項目が確かな場合だけ keys で指定する。クロールした企業データの
+# website は取得元のページのため、同じディレクトリのサイトから取得した別の企業が1つにまとまってしまう）
+DEFAULT_ENTITY_KEYS = [key for key in ENTITY_KEYS if key != "domain"]
+
+
+class EntityResolver:
+    """
+    いずれかのキーが一致するレコードを同じ企業としてまとめるクラス
+
+    キーごとに値から最初のレコードへの索引を作り、一致したレコードを DisjointSet で結合するため、
+    レコード数とキーの数に比例する時間で済む。
+    クラスタ番号はクラスタの先頭のレコードの位置で、どのキーで結合したかは links に残る。
+    """
+    def __init__(self, keys: Optional[Sequence[str]] = None):
+        self.keys = list(keys) if keys is not None else list(DEFAULT_ENTITY_KEYS)
+        unknown = [key for key in self.keys if key not in ENTITY_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown entity keys: {unknown}")
+        # (レコードの位置, 結合先のレコードの位置, キーの名前)
+        self.links: List[Tuple[int, int, str]] = []
+
+    def cluster(self, records: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        各レコードのクラスタ番号
+        """
+        clusters = DisjointSet(len(records))
+        self.links = []
+        for key in self.keys:
+            key_function = ENTITY_KEYS[key]
+            first: Dict[str, int] = {}
+            for i, record in enumerate(records):
+                value = key_function(record)
+                if not value:
+                    continue
+                j = first.setdefault(value, i)
+                if j != i and not clusters.connected(i, j):
+                    clusters.union(i, j)
+                    self.links.append((i, j, key))
+        return clusters.labels()
+
+    def resolve(self, records: Sequence[Dict[str, Any]],
+                merge: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        クラスタごとにレコードを merge でまとめ、cluster_id（クラスタ番号）と cluster_size を付ける
+        """
+        merged: Dict[int, Dict[str, Any]] = {}
+        sizes: Dict[int, int] = {}
+        for record, label in zip(records, self.cluster(records)):
+            merged[label] = merge(merged[label], record) if label in merged else record.copy()
+            sizes[label] = sizes.get(label, 0) + 1
+        for label, record in merged.items():
+            record["cluster_id"] = label
+            record["cluster_size"] = sizes[label]
+        return list(merged.values())
@@ -0,0 +1,148 @@
+"""
+メモリに載らない件数の企業データの重複削除（ディスク上のパーティションによる外部メモリ処理）
+
+重複キー（DataProcessor.duplicate_key）のハッシュでレコードを partitions 個のファイルに振り分け、
+同じキーのレコードは必ず同じパーティションに入るため、パーティションごとに独立して重複を削除できる。
+メモリに保持するのは1つのパーティション（ワーカーごと）と書き込み待ちのバッファだけで、
+パーティションはプロセスプールで並列に処理できる。結果は remove_duplicates と同じ内容・順序になる。
+"""
+import heapq
+import multiprocessing
+import os
+import pickle
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from app.services.data_processor import DataProcessor
+
+# パーティションの数（1つのパーティションの件数 ≒ 全体の件数 / partitions）
+EXTERNAL_DEDUP_PARTITIONS = int(os.getenv("RISMA_EXTERNAL_DEDUP_PARTITIONS", "64"))
+# パーティションを並列に処理するプロセス数
+EXTERNAL_DEDUP_WORKERS = int(os.getenv("RISMA_EXTERNAL_DEDUP_WORKERS", "1"))
+# パーティションのファイルを置くディレクトリ（未設定の場合はシステムの一時ディレクトリ）
+EXTERNAL_DEDUP_DIR = os.getenv("RISMA_EXTERNAL_DEDUP_DIR") or None
+
+# パーティションごとにまとめて書き込む件数
+_RUN_BATCH = 1024
+
+_processor: Optional[DataProcessor] = None
+
+
+def _init_worker() -> None:
+    global _processor
+    _processor = DataProcessor()
+
+
+def _write_batch(file, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+    pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_batches(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    パーティションのファイルから (入力での位置, レコード) を書き込んだ順に読み出す
+    """
+    with open(path, "rb") as file:
+        while True:
+            try:
+                batch = pickle.load(file)
+            except EOFError:
+                return
+            yield from batch
+
+
+def _dedup_partition(processor: DataProcessor, path: str) -> str:
+    """
+    1つのパーティションの重複を削除し、結果を最初に現れた位置の順に書き出したファイルのパスを返す
+    """
+    unique: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    for position, company in _read_batches(path):
+        key = processor.duplicate_key(company)
+        if key not in unique:
+            unique[key] = (position, company)
+        else:
+            first, existing = unique[key]
+            unique[key] = (first, processor.merge_company_data(existing, company))
+    os.remove(path)
+
+    output_path = path + ".unique"
+    with open(output_path, "wb") as file:
+        # キーは最初に現れた順に並んでいるため、位置の順になっている
+        items = list(unique.values())
+        for start in range(0, len(items), _RUN_BATCH):
+            _write_batch(file, items[start:start + _RUN_BATCH])
+    return output_path
+
+
+def _dedup_partition_worker(path: str) -> str:
+    return _dedup_partition(_processor, path)
+
+
+class ExternalDeduplicator:
+    """
+    重複キーのハッシュでパーティションに分けて重複を削除するクラス
+
+    deduplicate は入力を1回だけ読み、結果を remove_duplicates と同じ順序で1件ずつ返す。
+    パーティションのファイルは最後の結果を返した時点（または途中で閉じた時点）で削除する。
+    """
+    def __init__(self, processor: Optional[DataProcessor] = None, partitions: int = EXTERNAL_DEDUP_PARTITIONS,
+                 workers: int = EXTERNAL_DEDUP_WORKERS, tmp_dir: Optional[str] = EXTERNAL_DEDUP_DIR):
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+        self.processor = processor or DataProcessor()
+        self.partitions = partitions
+        self.workers = workers
+        self.tmp_dir = tmp_dir
+
+    def partition_of(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.partitions
+
+    def partition(self, records: Iterable[Dict[str, Any]], directory: str) -> List[str]:
+        """
+        レコードをパーティションのファイルに振り分け、レコードのあるパーティションのパスを返す
+        """
+        paths = [os.path.join(directory, f"partition-{i:04d}") for i in range(self.partitions)]
+        files = {}
+        buffers: List[List[Tuple[int, Dict[str, Any]]]] = [[] for _ in range(self.partitions)]
+        try:
+            for position, company in enumerate(records):
+                key = self.processor.duplicate_key(company)
+                # 会社名も電話番号もないレコードは remove_duplicates と同じく除く
+                if not key:
+                    continue
+                index = self.partition_of(key)
+                buffer = buffers[index]
+                buffer.append((position, company))
+                if len(buffer) >= _RUN_BATCH:
+                    if index not in files:
+                        files[index] = open(paths[index], "wb")
+                    _write_batch(files[index], buffer)
+                    buffers[index] = []
+            for index, buffer in enumerate(buffers):
+                if buffer:
+                    if index not in files:
+                        files[index] = open(paths[index], "wb")
+                    _write_batch(files[index], buffer)
+        finally:
+            for file in files.values():
+                file.close()
+        return [paths[index] for index in sorted(files)]
+
+    def _dedup_partitions(self, paths: List[str]) -> List[str]:
+        if self.workers <= 1 or len(paths) <= 1:
+            return [_dedup_partition(self.processor, path) for path in paths]
+        # fork はスレッドやイベントループを持つ親プロセスの状態を引き継ぐため spawn で起動する
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker) as executor:
+            return list(executor.map(_dedup_partition_worker, paths))
+
+    def deduplicate(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        重複を削除したレコードを、キーが最初に現れた順に返す
+        """
+        with tempfile.TemporaryDirectory(prefix="risma-dedup-", dir=self.tmp_dir) as directory:
+            paths = self._dedup_partitions(self.partition(records, directory))
+            # パーティションごとの結果は位置の順に並んでいるため、併合して入力の順に戻す
+            for _, company in heapq.merge(*(_read_batches(path) for path in paths), key=lambda item: item[0]):
+                yield company
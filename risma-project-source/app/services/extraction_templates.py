@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup, Tag
+
+logger = logging.getLogger(__name__)
+
+# レイアウトの指紋に使うDOMの深さ（body直下からの段数）
+FINGERPRINT_DEPTH = 3
+# 学習元のページで見つからなかった項目を探し直す間隔（テンプレートでの抽出の回数）
+ABSENT_RECHECK_INTERVAL = 20
+# 値を隣の要素（td, dd）に持つラベルのタグ
+LABEL_CELL_TAGS = frozenset({"th", "td", "dt"})
+
+def labeled_text(element: Tag) -> str:
+    """
+    ラベルを含む要素の値を探すテキスト（表・定義リストのラベルは隣のセルのテキストを続ける）
+    """
+    text = element.get_text()
+    if element.name in LABEL_CELL_TAGS:
+        cell = element.find_next_sibling()
+        if cell is not None:
+            text += " " + cell.get_text()
+    return text
+
+class ExtractionTemplate:
+    """
+    同じレイアウトのページで各項目が見つかる要素の位置を保持するクラス
+
+    位置はルートからのパス（タグ名と同名兄弟内の順番の組）で表す。
+    """
+    def __init__(self, key: Tuple[str, str], paths: Dict[str, List[Tuple[str, int]]], absent: List[str]):
+        self.key = key
+        self.paths = paths
+        # 学習元のページで見つからなかった項目（同じレイアウトの別のページにはあり得るため、時々探し直す）
+        self.absent = set(absent)
+        self.hits = 0
+
+    def selector(self, field: str) -> str:
+        """
+        項目の位置をCSSセレクタとして返す（ログ・デバッグ用）
+        """
+        return " > ".join(f"{name}:nth-of-type({index + 1})" for name, index in self.paths[field])
+
+    def locate(self, soup: BeautifulSoup, field: str) -> Optional[Tag]:
+        """
+        パスをたどって項目の要素を取得する
+        """
+        node = soup
+        for name, index in self.paths[field]:
+            children = node.find_all(name, recursive=False)
+            if index >= len(children):
+                return None
+            node = children[index]
+        return node
+
+
+class ExtractionTemplateCache:
+    """
+    ドメインとレイアウトの指紋ごとに抽出テンプレートを保持するLRUキャッシュ
+
+    同じCMSを使う別ドメインのページにも使えるよう、指紋のみのキーでも登録する
+    （見つからなかった項目はページごとに異なるため、指紋のみのキーには位置だけを共有する）。
+    """
+    def __init__(self, max_templates: int = 10000, absent_recheck_interval: int = ABSENT_RECHECK_INTERVAL):
+        self.max_templates = max_templates
+        self.absent_recheck_interval = absent_recheck_interval
+        self._templates: "OrderedDict[Tuple[str, str], ExtractionTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def fingerprint(soup: BeautifulSoup) -> str:
+        """
+        body以下の浅い階層のタグ名とクラス名からレイアウトの指紋を作る
+        """
+        parts = []
+
+        def walk(node: Tag, depth: int) -> None:
+            for child in node.find_all(True, recursive=False):
+                classes = child.get("class") or []
+                parts.append(f"{depth}:{child.name}.{classes[0] if classes else ''}")
+                if depth < FINGERPRINT_DEPTH:
+                    walk(child, depth + 1)
+
+        walk(soup.body or soup, 1)
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def path_to(element: Tag) -> List[Tuple[str, int]]:
+        """
+        ルートから要素までのパスを求める
+        """
+        path = []
+        node = element
+        while node is not None and node.parent is not None:
+            index = len(node.find_previous_siblings(node.name))
+            path.append((node.name, index))
+            node = node.parent
+        path.reverse()
+        return path
+
+    def lookup(self, url: str, fingerprint: str) -> Optional[ExtractionTemplate]:
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            for key in ((domain, fingerprint), ("*", fingerprint)):
+                template = self._templates.get(key)
+                if template is not None:
+                    self._templates.move_to_end(key)
+                    self.hits += 1
+                    return template
+            self.misses += 1
+        return None
+
+    def learn(self, url: str, fingerprint: str, located: Dict[str, Tuple[Any, Tag]], fields: List[str]) -> None:
+        """
+        ヒューリスティック抽出の結果から、各項目の位置をテンプレートとして記録する
+        """
+        paths = {field: self.path_to(element) for field, (_, element) in located.items()}
+        absent = [field for field in fields if field not in located]
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            for key in ((domain, fingerprint), ("*", fingerprint)):
+                self._templates[key] = ExtractionTemplate(key, paths, absent if key[0] != "*" else [])
+                self._templates.move_to_end(key)
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+
+    def invalidate(self, template: ExtractionTemplate, url: Optional[str] = None) -> None:
+        """
+        検証に失敗したテンプレートを、ドメインのキーと指紋のみのキーの両方から破棄する
+
+        指紋のみのキーのテンプレートが失敗した場合は、url のドメインのキーも破棄する。
+        """
+        fingerprint = template.key[1]
+        keys = {template.key, ("*", fingerprint)}
+        if url is not None:
+            keys.add((urlparse(url).netloc.lower(), fingerprint))
+        with self._lock:
+            self.fallbacks += 1
+            for key in keys:
+                self._templates.pop(key, None)
+
+    def apply(self, soup: BeautifulSoup, template: ExtractionTemplate,
+              extractors: Dict[str, Callable[[str], Any]]) -> Optional[Dict[str, Tuple[Any, Tag]]]:
+        """
+        テンプレートの位置から値を抽出する（位置を学習した項目のいずれかで値が得られなければ None）
+
+        位置を学習していない項目（学習元のページになかった項目・学習後に追加された項目）は結果に含めないため、
+        呼び出し側がヒューリスティックで探す。
+        """
+        located = {}
+        for field, extractor in extractors.items():
+            if field not in template.paths:
+                continue
+            element = template.locate(soup, field)
+            if element is None:
+                return None
+            value = extractor(labeled_text(element))
+            if not value:
+                return None
+            located[field] = (value, element)
+        template.hits += 1
+        return located
+
+    def fields_to_search(self, template: ExtractionTemplate, fields: List[str]) -> List[str]:
+        """
+        テンプレートで位置を学習していない項目のうち、このページでヒューリスティックで探す項目
+
+        学習元のページで見つからなかった項目は、テンプレートでの抽出 absent_recheck_interval 回ごとにだけ探す。
+        """
+        recheck = template.hits % self.absent_recheck_interval == 0
+        return [field for field in fields
+                if field not in template.paths and (recheck or field not in template.absent)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "templates": len(self._templates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+        }
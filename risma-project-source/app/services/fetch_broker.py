@@ -0,0 +1,149 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# プロセス全体の同時リクエスト数の上限
+GLOBAL_MAX_CONCURRENT_REQUESTS = int(os.getenv("RISMA_GLOBAL_MAX_CONCURRENT_REQUESTS", "20"))
+
+class BrokerJob:
+    """
+    FetchBroker に登録された1ジョブ分のリクエストの流れ
+    """
+    def __init__(self, broker: "FetchBroker", key: str, user_key: str, weight: float):
+        self.broker = broker
+        self.key = key
+        self.user_key = user_key
+        self.weight = weight
+        # 仮想時間上で、このジョブの直前のリクエストが終わる時刻
+        self.last_finish = 0.0
+        self.in_flight = 0
+        self.completed = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        リクエスト1件分の枠を確保する
+        """
+        await self.broker.acquire(self)
+        try:
+            yield
+        finally:
+            self.broker.release(self)
+
+    def close(self) -> None:
+        self.broker.unregister(self)
+
+
+class FetchBroker:
+    """
+    全ジョブのリクエストを受け付け、プロセス全体の同時実行数を制限するクラス
+
+    開始時刻タグによる重み付き公平キューイング（SFQ）で順番を決める。
+    同じユーザーのジョブは重みを分け合うため、ジョブ数の多いユーザーが枠を独占しない。
+    リクエスト数の少ないジョブには重みを上乗せし、大量ジョブの待ち行列を追い越せるようにする。
+    """
+    def __init__(self, max_concurrent_requests: int = GLOBAL_MAX_CONCURRENT_REQUESTS,
+                 small_job_requests: int = 50, small_job_boost: float = 4.0):
+        self.max_concurrent_requests = max_concurrent_requests
+        self.small_job_requests = small_job_requests
+        self.small_job_boost = small_job_boost
+        self._queue = []  # (開始タグ, 受付順, Future, ジョブ) のヒープ
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._active = 0
+        self._jobs_by_user = defaultdict(set)
+
+    def register(self, key: str, user_key: Optional[str] = None, weight: float = 1.0,
+                 expected_requests: Optional[int] = None) -> BrokerJob:
+        """
+        ジョブを登録する
+        """
+        if expected_requests is not None and expected_requests <= self.small_job_requests:
+            weight *= self.small_job_boost
+        job = BrokerJob(self, key, user_key or key, weight)
+        job.last_finish = self._virtual_time
+        self._jobs_by_user[job.user_key].add(job)
+        return job
+
+    def unregister(self, job: BrokerJob) -> None:
+        jobs = self._jobs_by_user.get(job.user_key)
+        if jobs is not None:
+            jobs.discard(job)
+            if not jobs:
+                del self._jobs_by_user[job.user_key]
+
+    def _share(self, job: BrokerJob) -> float:
+        # ユーザー内のジョブで重みを分け合う
+        return job.weight / max(1, len(self._jobs_by_user.get(job.user_key, ())))
+
+    async def acquire(self, job: BrokerJob) -> None:
+        start = max(self._virtual_time, job.last_finish)
+        job.last_finish = start + 1.0 / self._share(job)
+
+        if self._active < self.max_concurrent_requests and not self._queue:
+            self._grant(job, start)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (start, next(self._sequence), future, job))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 枠を割り当てられた直後にキャンセルされた場合は枠を返す
+                self.release(job)
+            raise
+
+    def release(self, job: BrokerJob) -> None:
+        self._active -= 1
+        job.in_flight -= 1
+        job.completed += 1
+        self._dispatch()
+
+    def _grant(self, job: BrokerJob, start: float) -> None:
+        self._virtual_time = max(self._virtual_time, start)
+        self._active += 1
+        job.in_flight += 1
+
+    def _dispatch(self) -> None:
+        while self._queue and self._active < self.max_concurrent_requests:
+            start, _, future, job = heapq.heappop(self._queue)
+            if future.done():
+                # 待機中にキャンセルされたリクエスト
+                continue
+            self._grant(job, start)
+            future.set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        現在の実行数と待ち行列の状況を返す
+        """
+        queued = defaultdict(int)
+        for _, _, future, job in self._queue:
+            if not future.done():
+                queued[job.key] += 1
+        return {
+            "max_concurrent_requests": self.max_concurrent_requests,
+            "active": self._active,
+            "queued": dict(queued),
+            "jobs": sum(len(jobs) for jobs in self._jobs_by_user.values()),
+        }
+
+
+_fetch_broker: Optional[FetchBroker] = None
+
+def get_fetch_broker() -> FetchBroker:
+    """
+    プロセス共通の FetchBroker を返す
+    """
+    global _fetch_broker
+    if _fetch_broker is None:
+        _fetch_broker = FetchBroker()
+    return _fetch_broker
@@ -0,0 +1,245 @@
+"""
+会社名の表記ゆれを吸収する重複削除（MinHash/LSH による候補の絞り込み）
+
+全件の組み合わせを比較すると O(n²) になるため、会社名の文字 n-gram から MinHash の署名を作り、
+署名のバンドが一致した組み合わせだけを候補として類似度を確かめる。
+都道府県・市外局番・電話番号・ドメインが両方にあって食い違う組み合わせは別の会社として扱う（ブロッキング）。
+"""
+import re
+import zlib
+from typing import List, Dict, Any, Callable, Sequence
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from app.services import text_normalizer
+from app.services.disjoint_set import DisjointSet
+
+# MinHash のハッシュ関数 (a * x + b) mod p に使う素数（2^31 - 1）
+_PRIME = (1 << 31) - 1
+# バンド内の署名を1つの値にまとめる際の乗数
+_BAND_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# 署名をまとめて計算する会社名の件数（メモリ使用量の上限）
+_CHUNK_SIZE = 65536
+
+# 法人格（正式名称・略称・囲み文字）は会社名の比較から除く
+_LEGAL_FORM_TOKEN_RE = re.compile('|'.join(re.escape(token) for token in sorted(
+    set(text_normalizer.LEGAL_FORMS) | set(text_normalizer.LEGAL_FORMS.values()) | {'㈱', '㈲', '(名)', '(資)'},
+    key=len, reverse=True
+)))
+_NON_WORD_RE = re.compile(r'[\W_]+')
+_DIGITS_RE = re.compile(r'\d+')
+# 両方にあって食い違う場合に別の会社とするブロッキングのキー
+_CONFLICT_KEYS = ("prefecture", "area_code", "phone", "domain")
+
+
+def name_key(name: str) -> str:
+    """
+    比較用の会社名（法人格・記号・空白を除き、小文字にしたもの）
+    """
+    if not name:
+        return ""
+    name = text_normalizer.normalize_name(name)
+    name = _LEGAL_FORM_TOKEN_RE.sub('', name)
+    return _NON_WORD_RE.sub('', name).lower()
+
+
+def phone_area_code(phone: str) -> str:
+    """
+    電話番号の市外局番（ハイフンがなければ先頭3桁）
+    """
+    if not phone:
+        return ""
+    if '-' in phone:
+        return phone.split('-', 1)[0]
+    return re.sub(r'[^\d]', '', phone)[:3]
+
+
+def phone_digits(phone: str) -> str:
+    """
+    比較用の電話番号（数字のみ。9桁未満は番号の一部とみなして空文字列）
+    """
+    digits = re.sub(r'[^\d]', '', text_normalizer.normalize_width(phone or ""))
+    return digits if len(digits) >= 9 else ""
+
+
+def website_domain(url: str) -> str:
+    """
+    WebサイトのURLのホスト名（先頭の www. を除く）
+    """
+    if not url:
+        return ""
+    if '//' not in url:
+        url = '//' + url
+    try:
+        host = urlsplit(url).hostname or ""
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith('www.') else host
+
+
+class FuzzyDeduplicator:
+    """
+    会社名の表記ゆれを吸収して重複する企業データをまとめるクラス
+
+    num_perm 個のハッシュ関数で MinHash の署名を作り、rows = num_perm / bands 個ずつのバンドに分ける。
+    いずれかのバンドが一致した組み合わせのうち、署名の一致率（Jaccard 係数の推定値）が threshold 以上で、
+    ブロッキングのキーが食い違わないものを同じ会社とみなす。
+    同じバンドの値を持つレコードが多い場合は、並べ替えた順で前後 window 件とだけ比較する。
+    """
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, ngram: int = 2,
+                 window: int = 20, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.window = window
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    def shingles(self, key: str) -> List[str]:
+        """
+        会社名の文字 n-gram
+        """
+        if len(key) <= self.ngram:
+            return [key]
+        return [key[i:i + self.ngram] for i in range(len(key) - self.ngram + 1)]
+
+    def signatures(self, keys: Sequence[str]) -> np.ndarray:
+        """
+        会社名ごとの MinHash の署名（空でない会社名のみ）
+        """
+        signatures = np.empty((len(keys), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(keys), _CHUNK_SIZE):
+            chunk = keys[start:start + _CHUNK_SIZE]
+            hashes: List[int] = []
+            lengths: List[int] = []
+            for key in chunk:
+                shingles = self.shingles(key)
+                hashes.extend(zlib.crc32(shingle.encode('utf-8')) for shingle in shingles)
+                lengths.append(len(shingles))
+            values = np.array(hashes, dtype=np.uint64)
+            offsets = np.zeros(len(chunk), dtype=np.int64)
+            np.cumsum(lengths[:-1], out=offsets[1:])
+            for i in range(self.num_perm):
+                permuted = (values * self._a[i] + self._b[i]) % _PRIME
+                signatures[start:start + len(chunk), i] = np.minimum.reduceat(permuted, offsets)
+        return signatures
+
+    def band_hashes(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        署名をバンドごとに1つの値にまとめる
+        """
+        hashes = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for band in range(self.bands):
+            for column in range(band * self.rows, (band + 1) * self.rows):
+                hashes[:, band] = hashes[:, band] * _BAND_MULTIPLIER + signatures[:, column]
+        return hashes
+
+    @staticmethod
+    def _codes(values: List[str]) -> np.ndarray:
+        """
+        文字列を整数に置き換える（空文字列は -1）
+        """
+        codes, _ = pd.factorize(np.array([value or None for value in values], dtype=object))
+        return codes
+
+    def blocking_codes(self, records: Sequence[Dict[str, Any]], keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        ブロッキングに使うキー（都道府県・市外局番・電話番号・ドメイン）と会社名に含まれる数字
+
+        会社名が似ていても電話番号が両方にあって異なるものは別の会社とする（市外局番だけでは、
+        同じ地域の似た名前の別の会社をまとめてしまう）。
+        """
+        return {
+            "prefecture": self._codes([record.get("prefecture") or "" for record in records]),
+            "area_code": self._codes([phone_area_code(record.get("phone") or "") for record in records]),
+            "phone": self._codes([phone_digits(record.get("phone") or "") for record in records]),
+            "domain": self._codes([website_domain(record.get("website") or "") for record in records]),
+            # 「第一」「2号店」のように数字だけが違う会社名は別の会社とする（空の場合も区別する）
+            "digits": pd.factorize(np.array([' '.join(_DIGITS_RE.findall(key)) for key in keys], dtype=object))[0],
+        }
+
+    def candidate_pairs(self, bands: np.ndarray, records: np.ndarray, order_key: np.ndarray):
+        """
+        いずれかのバンドの値が一致するレコードの組み合わせを、バンドと距離ごとに (左, 右) の配列で返す
+
+        同じ値のレコードは order_key で並べ、前後 window 件までの組み合わせを作る。
+        """
+        for band in range(self.bands):
+            values = bands[:, band]
+            order = np.lexsort((order_key, values))
+            ordered = values[order]
+            for distance in range(1, self.window + 1):
+                same = ordered[distance:] == ordered[:-distance]
+                if not same.any():
+                    break
+                left = records[order[:-distance][same]]
+                right = records[order[distance:][same]]
+                yield np.minimum(left, right), np.maximum(left, right)
+
+    def cluster(self, records: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        各レコードが属するクラスタ（まとめ先となる先頭のレコードの位置）
+        """
+        n = len(records)
+        if n == 0:
+            return []
+        keys = [name_key(record.get("name") or "") for record in records]
+        key_codes, unique_keys = pd.factorize(np.array(keys, dtype=object))
+        indexed = np.flatnonzero(np.array([bool(key) for key in keys], dtype=bool))
+
+        signatures = self.signatures(list(unique_keys))
+        bands = self.band_hashes(signatures)
+        blocking = self.blocking_codes(records, keys)
+
+        # 候補はバンドごとに絞り込み、条件を満たした組み合わせだけを残す
+        matches = []
+        for left, right in self.candidate_pairs(bands[key_codes[indexed]], indexed, blocking["prefecture"][indexed]):
+            accepted = blocking["digits"][left] == blocking["digits"][right]
+            for name in _CONFLICT_KEYS:
+                codes = blocking[name]
+                accepted &= (codes[left] < 0) | (codes[right] < 0) | (codes[left] == codes[right])
+            left, right = left[accepted], right[accepted]
+            for start in range(0, len(left), _CHUNK_SIZE):
+                chunk_left, chunk_right = left[start:start + _CHUNK_SIZE], right[start:start + _CHUNK_SIZE]
+                similarity = np.mean(signatures[key_codes[chunk_left]] == signatures[key_codes[chunk_right]], axis=1)
+                similar = similarity >= self.threshold
+                matches.append(np.stack([chunk_left[similar], chunk_right[similar],
+                                         np.round(similarity[similar] * self.num_perm).astype(np.int64)], axis=1))
+        if matches:
+            pairs = np.unique(np.concatenate(matches), axis=0)
+        else:
+            pairs = np.empty((0, 3), dtype=np.int64)
+        left, right, similarity = pairs[:, 0], pairs[:, 1], pairs[:, 2]
+        matched = np.argsort(-similarity, kind='stable')
+
+        # 類似度の高い組み合わせから結合する
+        clusters = DisjointSet(n)
+        # クラスタごとに判明しているブロッキングのキー（中継するレコードを介して食い違うものを結合しない）
+        known = [blocking[name].tolist() for name in _CONFLICT_KEYS]
+        for i, j in zip(left[matched].tolist(), right[matched].tolist()):
+            root_i, root_j = clusters.find(i), clusters.find(j)
+            if root_i == root_j:
+                continue
+            if any(codes[root_i] >= 0 and codes[root_j] >= 0 and codes[root_i] != codes[root_j] for codes in known):
+                continue
+            root = clusters.union(root_i, root_j)
+            for codes in known:
+                codes[root] = max(codes[root_i], codes[root_j])
+        return clusters.labels()
+
+    def deduplicate(self, records: Sequence[Dict[str, Any]],
+                    merge: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        同じクラスタのレコードを merge でまとめる（先に現れたレコードの順序を保つ）
+        """
+        merged: Dict[int, Dict[str, Any]] = {}
+        for record, label in zip(records, self.cluster(records)):
+            merged[label] = merge(merged[label], record) if label in merged else record
+        return list(merged.values())
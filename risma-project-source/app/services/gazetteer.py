@@ -0,0 +1,467 @@
+"""
+住所から都道府県・市区町村を求めるための地名辞書（ガゼッティア）
+
+都道府県・市区町村・政令指定都市の区の名前をトライに登録し、住所を先頭から1回走査して最長一致で解決する。
+郵便番号だけの住所は郵便番号から都道府県（全国版の辞書を読み込んだ場合は市区町村も）を求める。
+
+同梱の辞書は都道府県・政令指定都市と区・東京都の市区・県庁所在地のみを含む。
+日本郵便の郵便番号データ（KEN_ALL.CSV）から全国版の辞書を作成し、RISMA_GAZETTEER_PATH で指定すると
+起動時にメモリマップで読み込む。
+
+    python -m app.services.gazetteer KEN_ALL.CSV gazetteer.bin
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Iterable, NamedTuple
+
+from app.services import text_normalizer
+
+PREFECTURES = list(text_normalizer.PREFECTURES.values())
+
+# 政令指定都市と区
+DESIGNATED_CITIES = {
+    "札幌市": ("北海道", ["中央区", "北区", "東区", "白石区", "豊平区", "南区", "西区", "厚別区", "手稲区", "清田区"]),
+    "仙台市": ("宮城県", ["青葉区", "宮城野区", "若林区", "太白区", "泉区"]),
+    "さいたま市": ("埼玉県", ["西区", "北区", "大宮区", "見沼区", "中央区", "桜区", "浦和区", "南区", "緑区", "岩槻区"]),
+    "千葉市": ("千葉県", ["中央区", "花見川区", "稲毛区", "若葉区", "緑区", "美浜区"]),
+    "横浜市": ("神奈川県", ["鶴見区", "神奈川区", "西区", "中区", "南区", "保土ケ谷区", "磯子区", "金沢区", "港北区",
+                          "戸塚区", "港南区", "旭区", "緑区", "瀬谷区", "栄区", "泉区", "青葉区", "都筑区"]),
+    "川崎市": ("神奈川県", ["川崎区", "幸区", "中原区", "高津区", "多摩区", "宮前区", "麻生区"]),
+    "相模原市": ("神奈川県", ["緑区", "中央区", "南区"]),
+    "新潟市": ("新潟県", ["北区", "東区", "中央区", "江南区", "秋葉区", "南区", "西区", "西蒲区"]),
+    "静岡市": ("静岡県", ["葵区", "駿河区", "清水区"]),
+    "浜松市": ("静岡県", ["中央区", "浜名区", "天竜区"]),
+    "名古屋市": ("愛知県", ["千種区", "東区", "北区", "西区", "中村区", "中区", "昭和区", "瑞穂区", "熱田区", "中川区",
+                          "港区", "南区", "守山区", "緑区", "名東区", "天白区"]),
+    "京都市": ("京都府", ["北区", "上京区", "左京区", "中京区", "東山区", "下京区", "南区", "右京区", "伏見区", "山科区",
+                        "西京区"]),
+    "大阪市": ("大阪府", ["都島区", "福島区", "此花区", "西区", "港区", "大正区", "天王寺区", "浪速区", "西淀川区",
+                        "東淀川区", "東成区", "生野区", "旭区", "城東区", "阿倍野区", "住吉区", "東住吉区", "西成区",
+                        "淀川区", "鶴見区", "住之江区", "平野区", "北区", "中央区"]),
+    "堺市": ("大阪府", ["堺区", "中区", "東区", "西区", "南区", "北区", "美原区"]),
+    "神戸市": ("兵庫県", ["東灘区", "灘区", "兵庫区", "長田区", "須磨区", "垂水区", "北区", "中央区", "西区"]),
+    "岡山市": ("岡山県", ["北区", "中区", "東区", "南区"]),
+    "広島市": ("広島県", ["中区", "東区", "南区", "西区", "安佐南区", "安佐北区", "安芸区", "佐伯区"]),
+    "北九州市": ("福岡県", ["門司区", "若松区", "戸畑区", "小倉北区", "小倉南区", "八幡東区", "八幡西区"]),
+    "福岡市": ("福岡県", ["東区", "博多区", "中央区", "南区", "西区", "城南区", "早良区"]),
+    "熊本市": ("熊本県", ["中央区", "東区", "西区", "南区", "北区"]),
+}
+
+# 同梱の辞書に含める市区町村（政令指定都市以外）
+MUNICIPALITIES = {
+    "北海道": ["函館市", "旭川市", "伊達市", "虻田郡倶知安町"],
+    "青森県": ["青森市"], "岩手県": ["盛岡市"], "宮城県": ["石巻市"], "秋田県": ["秋田市"], "山形県": ["山形市"],
+    "福島県": ["福島市", "郡山市", "いわき市", "伊達市"], "茨城県": ["水戸市", "つくば市"], "栃木県": ["宇都宮市"],
+    "群馬県": ["前橋市", "高崎市"], "埼玉県": ["川口市", "川越市", "所沢市"], "千葉県": ["船橋市", "柏市", "市川市"],
+    "東京都": [
+        "千代田区", "中央区", "港区", "新宿区", "文京区", "台東区", "墨田区", "江東区", "品川区", "目黒区", "大田区",
+        "世田谷区", "渋谷区", "中野区", "杉並区", "豊島区", "北区", "荒川区", "板橋区", "練馬区", "足立区", "葛飾区",
+        "江戸川区", "八王子市", "立川市", "武蔵野市", "三鷹市", "青梅市", "府中市", "昭島市", "調布市", "町田市",
+        "小金井市", "小平市", "日野市", "東村山市", "国分寺市", "国立市", "福生市", "狛江市", "東大和市", "清瀬市",
+        "東久留米市", "武蔵村山市", "多摩市", "稲城市", "羽村市", "あきる野市", "西東京市",
+    ],
+    "神奈川県": ["横須賀市", "藤沢市"], "新潟県": ["長岡市"], "富山県": ["富山市"], "石川県": ["金沢市"],
+    "福井県": ["福井市"], "山梨県": ["甲府市"], "長野県": ["長野市", "松本市"], "岐阜県": ["岐阜市"],
+    "静岡県": ["沼津市"], "愛知県": ["豊田市", "岡崎市", "一宮市", "豊橋市"], "三重県": ["津市", "四日市市"],
+    "滋賀県": ["大津市"], "京都府": ["宇治市"], "大阪府": ["豊中市", "吹田市", "東大阪市", "枚方市"],
+    "兵庫県": ["姫路市", "西宮市", "尼崎市"], "奈良県": ["奈良市"], "和歌山県": ["和歌山市"], "鳥取県": ["鳥取市"],
+    "島根県": ["松江市"], "岡山県": ["倉敷市"], "広島県": ["福山市", "府中市"], "山口県": ["山口市", "下関市"],
+    "徳島県": ["徳島市"], "香川県": ["高松市"], "愛媛県": ["松山市"], "高知県": ["高知市"], "福岡県": ["久留米市"],
+    "佐賀県": ["佐賀市"], "長崎県": ["長崎市", "佐世保市"], "大分県": ["大分市"], "宮崎県": ["宮崎市"],
+    "鹿児島県": ["鹿児島市"], "沖縄県": ["那覇市"],
+}
+
+# 郵便番号の上3桁の範囲と都道府県（全国版の辞書がない場合の目安）
+POSTAL_PREFIX_RANGES = [
+    (1, "北海道"), (10, "秋田県"), (20, "岩手県"), (30, "青森県"), (40, "北海道"), (100, "東京都"), (210, "神奈川県"),
+    (260, "千葉県"), (300, "茨城県"), (320, "栃木県"), (330, "埼玉県"), (370, "群馬県"), (380, "長野県"),
+    (400, "山梨県"), (410, "静岡県"), (440, "愛知県"), (500, "岐阜県"), (510, "三重県"), (520, "滋賀県"),
+    (530, "大阪府"), (600, "京都府"), (630, "奈良県"), (640, "和歌山県"), (650, "兵庫県"), (680, "鳥取県"),
+    (690, "島根県"), (700, "岡山県"), (720, "広島県"), (740, "山口県"), (760, "香川県"), (770, "徳島県"),
+    (780, "高知県"), (790, "愛媛県"), (800, "福岡県"), (840, "佐賀県"), (850, "長崎県"), (860, "熊本県"),
+    (870, "大分県"), (880, "宮崎県"), (890, "鹿児島県"), (900, "沖縄県"), (910, "福井県"), (920, "石川県"),
+    (930, "富山県"), (940, "新潟県"), (960, "福島県"), (980, "宮城県"), (990, "山形県"),
+]
+_POSTAL_PREFIX_STARTS = [start for start, _ in POSTAL_PREFIX_RANGES]
+
+# 「〒」付きの郵便番号、または住所の先頭の郵便番号
+_POSTAL_RE = re.compile(r'〒\s*(\d{3})-?(\d{4})|^\s*(\d{3})-(\d{4})(?![\d-])')
+_DESIGNATED_WARD_RE = re.compile(r'^(.+?市)(.+区)$')
+
+# 辞書にない市区町村の推定（郡の町村、またはそれ以外の市区町村名を含む番地の前までの最長の範囲）
+_FALLBACK_COUNTY_RE = re.compile(r'[^\s市]{1,5}郡[^\s市]{1,8}?[町村]')
+_FALLBACK_CITY_RE = re.compile(r'[^\s\d０-９\-－ー‐−]{1,9}[市区町村]')
+_MUNICIPALITY_SUFFIXES = ("市", "区", "町", "村")
+
+_MAGIC = b"RGZ1"
+_HEADER = struct.Struct("<4s6I")
+
+
+class Location(NamedTuple):
+    prefecture: str
+    city: str
+    postal_code: str
+
+
+class LocationTrie:
+    """
+    地名の最長一致検索用のトライ
+
+    ノードごとの子の範囲（node_start）、子の文字（edge_char、ノード内で昇順）、子のノード番号（edge_node）、
+    ノードに登録された値（node_value、なければ -1）の4つの整数配列で表すため、ファイルからそのままメモリマップできる。
+    """
+    def __init__(self, node_start, node_value, edge_char, edge_node):
+        self.node_start = node_start
+        self.node_value = node_value
+        self.edge_char = edge_char
+        self.edge_node = edge_node
+
+    @classmethod
+    def build(cls, keys: Dict[str, int]) -> "LocationTrie":
+        children: List[Dict[str, int]] = [{}]
+        values = [-1]
+        for key, value in keys.items():
+            node = 0
+            for char in key:
+                child = children[node].get(char)
+                if child is None:
+                    child = children[node][char] = len(children)
+                    children.append({})
+                    values.append(-1)
+                node = child
+            values[node] = value
+
+        node_start, edge_char, edge_node = array("i"), array("i"), array("i")
+        for node_children in children:
+            node_start.append(len(edge_char))
+            for char in sorted(node_children):
+                edge_char.append(ord(char))
+                edge_node.append(node_children[char])
+        node_start.append(len(edge_char))
+        return cls(node_start, array("i", values), edge_char, edge_node)
+
+    def items(self, node: int = 0, prefix: str = ""):
+        """
+        登録されたキーと値（キーの文字順）
+        """
+        if self.node_value[node] >= 0:
+            yield prefix, self.node_value[node]
+        for i in range(self.node_start[node], self.node_start[node + 1]):
+            yield from self.items(self.edge_node[i], prefix + chr(self.edge_char[i]))
+
+    def first_chars(self) -> Dict[str, int]:
+        """
+        キーの先頭の文字と、その文字に対応するノード
+        """
+        return {chr(self.edge_char[i]): self.edge_node[i] for i in range(self.node_start[0], self.node_start[1])}
+
+    def pattern(self, node: int = 0) -> str:
+        """
+        node 以下の部分木と同じ構造の正規表現（長いキーを先に試すため、match で最長一致が得られる）
+        """
+        branches = [
+            re.escape(chr(self.edge_char[i])) + self.pattern(self.edge_node[i])
+            for i in range(self.node_start[node], self.node_start[node + 1])
+        ]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if node and self.node_value[node] >= 0:
+            # キーの途中で終わる場合は、続きを省略可能にする
+            return (group if len(branches) == 1 and len(group) == 1 else f"(?:{group})") + "?"
+        return group
+
+
+class Gazetteer:
+    """
+    都道府県・市区町村・郵便番号の辞書
+    """
+    PREFECTURE = "prefecture"
+    MUNICIPALITY = "municipality"
+
+    def __init__(self, trie: LocationTrie, places: List[Tuple[str, str]], entries: List[Tuple[str, List[int]]],
+                 postal_codes=None, postal_values=None, buffer: Optional[mmap.mmap] = None):
+        self.trie = trie
+        # 地名（都道府県, 市区町村）の一覧
+        self.places = places
+        # トライの値ごとの種類と候補の地名の番号（同名の市区町村は候補が複数になる）
+        self.entries = entries
+        self.postal_codes = postal_codes if postal_codes is not None else array("i")
+        self.postal_values = postal_values if postal_values is not None else array("i")
+        self._buffer = buffer
+        # トライを正規表現（全体と先頭の文字ごと）にコンパイルし、住所の走査は正規表現エンジンで行う
+        # 地名ごとの、都道府県名（都道府県の場合）または都道府県ごとの市区町村
+        self._prefectures: Dict[str, str] = {}
+        self._municipalities: Dict[str, Dict[str, str]] = {}
+        for name, value in trie.items():
+            kind, place_ids = entries[value]
+            if kind == self.PREFECTURE:
+                self._prefectures[name] = places[place_ids[0]][0]
+            else:
+                self._municipalities[name] = {places[i][0]: places[i][1] for i in place_ids}
+        self._regex = re.compile(trie.pattern())
+        self._branches = {char: re.compile(re.escape(char) + trie.pattern(node))
+                          for char, node in trie.first_chars().items()}
+
+    @classmethod
+    def build(cls, municipalities: Iterable[Tuple[str, str]],
+              postal_codes: Optional[Dict[str, Tuple[str, str]]] = None) -> "Gazetteer":
+        """
+        （都道府県, 市区町村）の一覧と郵便番号（7桁）から辞書を作る
+
+        政令指定都市の区は「横浜市中区」のように市名を含めて渡す。
+        """
+        places: List[Tuple[str, str]] = []
+        place_ids: Dict[Tuple[str, str], int] = {}
+        entries: List[Tuple[str, List[int]]] = []
+        keys: Dict[str, int] = {}
+
+        def add(key: str, kind: str, place: Tuple[str, str]) -> int:
+            place_id = place_ids.get(place)
+            if place_id is None:
+                place_id = place_ids[place] = len(places)
+                places.append(place)
+            value = keys.get(key)
+            if value is None:
+                value = keys[key] = len(entries)
+                entries.append((kind, []))
+            if place_id not in entries[value][1]:
+                entries[value][1].append(place_id)
+            return place_id
+
+        for prefecture in PREFECTURES:
+            add(prefecture, cls.PREFECTURE, (prefecture, ""))
+
+        for prefecture, city in municipalities:
+            add(city, cls.MUNICIPALITY, (prefecture, city))
+            # 政令指定都市の区の場合は市も登録する
+            match = _DESIGNATED_WARD_RE.match(city)
+            if match and prefecture != "東京都":
+                add(match.group(1), cls.MUNICIPALITY, (prefecture, match.group(1)))
+            # 郡は省略して書かれることが多い
+            if "郡" in city[:-1]:
+                add(city[city.index("郡") + 1:], cls.MUNICIPALITY, (prefecture, city))
+
+        codes, postal_values = array("i"), array("i")
+        for code, (prefecture, city) in sorted((postal_codes or {}).items()):
+            codes.append(int(code))
+            postal_values.append(add(city, cls.MUNICIPALITY, (prefecture, city)) if city
+                                 else place_ids[(prefecture, "")])
+        return cls(LocationTrie.build(keys), places, entries, codes, postal_values)
+
+    @classmethod
+    def bundled(cls) -> "Gazetteer":
+        """
+        同梱の辞書（都道府県・政令指定都市と区・主要な市区町村）
+        """
+        municipalities = []
+        for city, (prefecture, wards) in DESIGNATED_CITIES.items():
+            municipalities.extend((prefecture, city + ward) for ward in wards)
+        for prefecture, cities in MUNICIPALITIES.items():
+            municipalities.extend((prefecture, city) for city in cities)
+        return cls.build(municipalities)
+
+    @classmethod
+    def from_ken_all(cls, path: str, encoding: str = "cp932") -> "Gazetteer":
+        """
+        日本郵便の郵便番号データ（KEN_ALL.CSV 形式）から全国版の辞書を作る
+        """
+        municipalities = {}
+        postal_codes: Dict[str, Tuple[str, str]] = {}
+        with open(path, encoding=encoding, newline="") as f:
+            for row in csv.reader(f):
+                code, prefecture, city = row[2], row[6], row[7]
+                municipalities[(prefecture, city)] = True
+                postal_codes.setdefault(code, (prefecture, city))
+        return cls.build(municipalities, postal_codes)
+
+    def save(self, path: str) -> None:
+        """
+        メモリマップで読み込める形式で保存する
+        """
+        arrays = [self.trie.node_start, self.trie.node_value, self.trie.edge_char, self.trie.edge_node,
+                  self.postal_codes, self.postal_values]
+        payload = json.dumps({"places": self.places, "entries": self.entries}, ensure_ascii=False).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, *(len(values) for values in arrays[:-1]), len(payload)))
+            for values in arrays:
+                f.write(array("i", values).tobytes())
+            f.write(payload)
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        """
+        save で保存した辞書をメモリマップで読み込む（配列はコピーせずにファイルを直接参照する）
+        """
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *counts, payload_size = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a gazetteer file")
+        counts.append(counts[-1])  # postal_values は postal_codes と同じ長さ
+        view = memoryview(buffer)
+        offset = _HEADER.size
+        arrays = []
+        for count in counts:
+            arrays.append(view[offset:offset + count * 4].cast("i"))
+            offset += count * 4
+        payload = json.loads(bytes(view[offset:offset + payload_size]).decode("utf-8"))
+        places = [tuple(place) for place in payload["places"]]
+        entries = [(kind, place_ids) for kind, place_ids in payload["entries"]]
+        return cls(LocationTrie(*arrays[:4]), places, entries, arrays[4], arrays[5], buffer=buffer)
+
+    def resolve(self, address: str) -> Location:
+        """
+        住所から都道府県・市区町村・郵便番号を求める
+        """
+        if not address:
+            return Location("", "", "")
+        postal_code = ""
+        if "〒" in address or address.lstrip()[:1].isdigit():
+            match = _POSTAL_RE.search(address)
+            if match:
+                postal_code = "".join(group for group in match.groups() if group)
+
+        prefecture = city = ""
+        match = self._search(address)
+        if match:
+            name = match.group()
+            prefecture = self._prefectures.get(name, "")
+            if prefecture:
+                city = self._municipality_at(address, match.end(), prefecture)
+            else:
+                candidates = self._municipalities[name]
+                city = next(iter(candidates.values()))
+                # 同名の市区町村が複数の都道府県にある場合は都道府県を決めない
+                if len(candidates) == 1:
+                    prefecture = next(iter(candidates))
+
+        if postal_code and not prefecture:
+            prefecture, postal_city = self.lookup_postal_code(postal_code)
+            city = city or postal_city
+        return Location(prefecture, city, postal_code)
+
+    def lookup_postal_code(self, postal_code: str) -> Tuple[str, str]:
+        """
+        7桁の郵便番号から（都道府県, 市区町村）を求める（辞書にない場合は上3桁から都道府県のみ）
+        """
+        digits = re.sub(r"\D", "", postal_code)
+        if len(digits) != 7:
+            return "", ""
+        code = int(digits)
+        index = bisect_left(self.postal_codes, code)
+        if index < len(self.postal_codes) and self.postal_codes[index] == code:
+            return self.places[self.postal_values[index]]
+        prefix = int(digits[:3])
+        if prefix < _POSTAL_PREFIX_STARTS[0]:
+            return "", ""
+        return POSTAL_PREFIX_RANGES[bisect_left(_POSTAL_PREFIX_STARTS, prefix + 1) - 1][1], ""
+
+    def _match(self, text: str, start: int) -> Optional["re.Match"]:
+        """
+        start から始まる最長の地名
+        """
+        branch = self._branches.get(text[start]) if start < len(text) else None
+        return branch.match(text, start) if branch is not None else None
+
+    def _search(self, text: str) -> Optional["re.Match"]:
+        """
+        最も左の位置から始まる最長の地名
+        """
+        # 多くの住所は地名で始まるため、先頭は先頭の文字に対応する正規表現だけで試す
+        return self._match(text, 0) or self._regex.search(text, 1)
+
+    def _municipality_at(self, text: str, start: int, prefecture: str) -> str:
+        if text[start:start + 1].isspace():
+            start = len(text) - len(text[start:].lstrip())
+        branch = self._branches.get(text[start:start + 1])
+        match = branch.match(text, start) if branch is not None else None
+        if match:
+            city = self._municipalities.get(match.group(), {}).get(prefecture)
+            if city:
+                return city
+        # 辞書にない市区町村
+        return self._fallback_municipality(text, start)
+
+    def _fallback_municipality(self, text: str, start: int) -> str:
+        """
+        辞書にない市区町村名を推定する
+
+        番地の前までの最長の範囲から、「市区町村」で区切った候補（2文字以上。直後も「市区町村」の場合は
+        名前の一部とみなして区切らない: 四日市市・余市町・十日町市）を作り、他の都道府県の辞書にある最長の名前、
+        市で終わる最初の名前（市の中の町名は町で終わる: 町田市原町田）、最初の名前の順に選ぶ。
+        """
+        match = _FALLBACK_COUNTY_RE.match(text, start)
+        if match:
+            return match.group()
+        match = _FALLBACK_CITY_RE.match(text, start)
+        if not match:
+            return ""
+        span = match.group()
+        candidates = [
+            span[:i + 1] for i in range(1, len(span))
+            if span[i] in _MUNICIPALITY_SUFFIXES and span[i + 1:i + 2] not in _MUNICIPALITY_SUFFIXES
+        ]
+        if not candidates:
+            return span
+        known = [name for name in candidates if name in self._municipalities]
+        if known:
+            return known[-1]
+        return next((name for name in candidates if name.endswith("市")), candidates[0])
+
+    def matches(self, record: Dict[str, Any], prefectures: Optional[List[str]] = None,
+                cities: Optional[List[str]] = None) -> bool:
+        """
+        企業データが都道府県・市区町村の条件に一致するか
+
+        都道府県・市区町村が設定されていない場合は住所から求める。
+        政令指定都市を指定した場合は、その区（例: 「横浜市」に対して「横浜市中区」）も一致とする。
+        """
+        if not prefectures and not cities:
+            return True
+        prefecture = record.get("prefecture") or ""
+        city = record.get("city") or ""
+        if (prefectures and not prefecture) or (cities and not city):
+            location = self.resolve(record.get("address") or "")
+            prefecture = prefecture or location.prefecture
+            city = city or location.city
+        if prefectures and prefecture not in prefectures:
+            return False
+        if cities and not any(city == c or (c.endswith("市") and city.startswith(c)) for c in cities):
+            return False
+        return True
+
+
+@lru_cache(maxsize=None)
+def default_gazetteer() -> Gazetteer:
+    """
+    RISMA_GAZETTEER_PATH で指定された辞書（なければ同梱の辞書）
+    """
+    path = os.getenv("RISMA_GAZETTEER_PATH")
+    if path:
+        return Gazetteer.load(path)
+    return Gazetteer.bundled()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="郵便番号データ（KEN_ALL.CSV）から地名辞書を作成する")
+    parser.add_argument("source", help="KEN_ALL.CSV のパス")
+    parser.add_argument("output", help="作成する辞書のパス")
+    parser.add_argument("--encoding", default="cp932")
+    args = parser.parse_args()
+
+    gazetteer = Gazetteer.from_ken_all(args.source, args.encoding)
+    gazetteer.save(args.output)
+    print(f"{len(gazetteer.places)} places, {len(gazetteer.postal_codes)} postal codes written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+業種名から業種コードを求める索引（DataProcessor と WebScraper で共通）
+
+業種名とその「・」区切りの語をすべてキーワードオートマトン（Aho-Corasick）に登録し、
+1回の走査で文字列に含まれる業種名を見つける。同じ業種の文字列は繰り返し現れるため、結果は Memo（LRU）でキャッシュする。
+"""
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Iterable, FrozenSet, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from app.services.memo import Memo
+
+# 業種名と業種コード（先に書かれたものほど優先する）
+INDUSTRY_CODES = {
+    'IT・情報通信': '233',
+    'メーカー': '210',
+    '商社': '220',
+    '小売': '221',
+    '金融': '240',
+    '保険': '241',
+    '不動産': '250',
+    '建設': '251',
+    '運輸・物流': '260',
+    'マスコミ': '270',
+    '広告・マーケティング': '271',
+    'コンサルティング': '280',
+    '人材・教育': '290',
+    '医療・福祉': '300',
+    '飲食・宿泊': '310',
+    'サービス': '320',
+    '公的機関': '330',
+    'その他': '999'
+}
+
+# どの業種名にも当たらない場合のコード
+OTHER_CODE = "999"
+
+# 業種ごとのキャッシュの件数
+INDUSTRY_MEMO_SIZE = 4096
+
+
+class KeywordAutomaton:
+    """
+    複数のキーワードを1回の走査で探すオートマトン（Aho-Corasick）
+    """
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for keyword in keywords:
+            self._add(keyword)
+        self._link()
+
+    def _add(self, keyword: str) -> None:
+        node = 0
+        for char in keyword:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append(len(self.keywords))
+        self.keywords.append(keyword)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text: str) -> Set[int]:
+        """
+        text に含まれるキーワードの番号
+        """
+        found: Set[int] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class IndustryIndex:
+    """
+    業種名と業種コードの索引
+
+    classify は従来の DataProcessor.get_industry_code と同じ規則で業種コードを求める。
+    1. 業種名を含む、または業種名に含まれる最初の業種のコード
+    2. 業種名の「・」区切りの語を含む最初の業種のコード
+    3. どちらもなければ「その他」
+    mapping を変更した場合は rebuild を呼ぶ。
+    """
+    def __init__(self, mapping: Optional[Dict[str, str]] = None, memo_size: int = INDUSTRY_MEMO_SIZE):
+        self.mapping = mapping if mapping is not None else dict(INDUSTRY_CODES)
+        self.memo_size = memo_size
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        mapping から索引を作り直し、キャッシュを消去する
+        """
+        self.names: List[str] = list(self.mapping)
+        self.codes: List[str] = [self.mapping[name] for name in self.names]
+        self.code_names: Dict[str, List[str]] = {}
+        for name, code in self.mapping.items():
+            self.code_names.setdefault(code, []).append(name)
+
+        # キーワードは業種名そのものと「・」区切りの語
+        keywords: Dict[str, List[int]] = {}
+        for i, name in enumerate(self.names):
+            keywords.setdefault(name, [])
+            for word in name.split('・'):
+                keywords.setdefault(word, []).append(i)
+        self._automaton = KeywordAutomaton(keywords)
+        # キーワードの番号から、その語を含む業種の番号・その語が業種名そのものである業種の番号
+        self._word_owners = [keywords[keyword] for keyword in self._automaton.keywords]
+        self._keyword_names = {self._automaton.keywords.index(name): i for i, name in enumerate(self.names)}
+
+        # 索引を作り直しても同じキャッシュのオブジェクトを使い続ける（DataProcessor.memos から参照される）
+        if hasattr(self, "classify"):
+            self.classify.clear()
+            self.matching_codes.clear()
+        else:
+            self.classify = Memo(self._classify, self.memo_size)
+            self.matching_codes = Memo(self._matching_codes, self.memo_size)
+
+    def names_for(self, code: str) -> List[str]:
+        """
+        業種コードに対応する業種名
+        """
+        return self.code_names.get(code, [])
+
+    def _scan(self, text: str):
+        """
+        text に含まれる業種名の番号と、「・」区切りの語が含まれる業種名の番号
+        """
+        found = self._automaton.search(text)
+        names = {self._keyword_names[keyword] for keyword in found if keyword in self._keyword_names}
+        words = {owner for keyword in found for owner in self._word_owners[keyword]}
+        return names, words
+
+    def _classify(self, industry: str) -> str:
+        if not industry:
+            return ""
+        names, words = self._scan(industry)
+        # 業種名に含まれる場合（例: 「IT」）
+        names.update(i for i, name in enumerate(self.names) if industry in name)
+        if names:
+            return self.codes[min(names)]
+        if words:
+            return self.codes[min(words)]
+        return OTHER_CODE
+
+    def _matching_codes(self, industry: str) -> FrozenSet[str]:
+        """
+        業種名が industry に含まれる、または industry を含む業種のコード
+        """
+        if not industry:
+            return frozenset()
+        names, _ = self._scan(industry)
+        names.update(i for i, name in enumerate(self.names) if industry in name)
+        return frozenset(self.codes[i] for i in names)
+
+    def mentioned_codes(self, text: str) -> FrozenSet[str]:
+        """
+        業種名または「・」区切りの語が text に含まれる業種のコード（会社名や説明文からの推測用）
+        """
+        if not text:
+            return frozenset()
+        names, words = self._scan(text)
+        return frozenset(self.codes[i] for i in names | words)
+
+    def resolve_codes(self, codes_or_names: Iterable[str]) -> Set[str]:
+        """
+        業種コードまたは業種名の指定を業種コードの集合にする
+        """
+        resolved = set()
+        for value in codes_or_names:
+            if value in self.code_names:
+                resolved.add(value)
+            elif value:
+                resolved.add(self.classify(value))
+        return resolved
+
+    def classify_industries(self, industries) -> np.ndarray:
+        """
+        業種の列をまとめて業種コードにする（異なる値ごとに1回だけ求める）
+        """
+        codes, uniques = pd.factorize(np.asarray(industries, dtype=object))
+        result = np.empty(len(uniques) + 1, dtype=object)
+        result[:-1] = [self.classify(value) for value in uniques]
+        # 欠損値（factorize の -1）は空文字列
+        result[-1] = ""
+        return result[codes]
+
+
+@lru_cache(maxsize=1)
+def default_industry_index() -> IndustryIndex:
+    """
+    プロセス全体で共有する業種の索引
+    """
+    return IndustryIndex()
@@ -0,0 +1,230 @@
+"""
+リストに保存済みの企業データとの重複判定（リストごとの永続的な重複キーの索引）
+
+企業データを保存する際に、正規化した重複キー（remove_duplicates のキーと名寄せのキー）を
+company_keys テーブルに一緒に保存する。新しいデータは chunk_size 件ずつまとめてキーを照会し、
+一致した既存の企業データにマージする（mode="skip" の場合は保存しない）。
+リスト全体をメモリに読み込まずに済むため、大きなリストへの追加でも照会の件数は追加するデータの件数に比例する。
+"""
+import logging
+import os
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.services.company_record import COLUMN_DEFAULTS, as_record
+from app.services.company_writer import CompanyWriter, company_row
+from app.services.data_processor import DataProcessor
+from app.services.entity_resolution import ENTITY_KEYS
+from app.services.pipeline import batched
+
+logger = logging.getLogger(__name__)
+
+# 既存の企業データと重複した場合の扱い（merge: 既存のデータにマージする, skip: 保存しない）
+LIST_DEDUP_MODE = os.getenv("RISMA_LIST_DEDUP_MODE", "merge")
+# まとめて照会・保存する件数（SQLite のパラメータ数の上限 999 を超えない値）
+LIST_DEDUP_CHUNK_SIZE = int(os.getenv("RISMA_LIST_DEDUP_CHUNK_SIZE", "500"))
+
+# 既定で使う名寄せのキー（ENTITY_KEYS のうち電話番号・メールアドレスによるもの）。
+# domain は、クロールした企業データの website が取得元のページで、同じディレクトリのサイトから取得した
+# 別の企業が既存の企業にマージされるため、公式サイトの項目が確かな場合だけ keys で指定する
+LIST_DEDUP_KEYS = [
+    key.strip() for key in os.getenv("RISMA_LIST_DEDUP_KEYS", "phone,email,email_domain_address").split(",")
+    if key.strip()
+]
+
+# 完全一致のキー（DataProcessor.remove_duplicates と同じ会社名と電話番号）の種類
+EXACT_KEY = "exact"
+
+DEDUP_MODES = ("merge", "skip")
+
+# (キーの種類, キーの値)
+DedupKey = Tuple[str, str]
+
+
+class ListDedupIndex:
+    """
+    リストに保存済みの企業データと重複するデータをまとめて保存するクラス
+
+    キーは EXACT_KEY と名寄せのキー（ENTITY_KEYS のうち keys で指定したもの。既定は LIST_DEDUP_KEYS）で、
+    いずれかが既存のデータと一致したデータを同じ企業とみなす（一致したデータのうち最も古いもの）。
+    索引のないリスト（この仕組みより前に作られたもの）は最初の保存時に索引を作る。
+    """
+    def __init__(self, db: Session, list_id: int, processor: Optional[DataProcessor] = None,
+                 mode: str = LIST_DEDUP_MODE, keys: Optional[Sequence[str]] = None,
+                 chunk_size: int = LIST_DEDUP_CHUNK_SIZE, commit: bool = False):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        self.keys = list(keys) if keys is not None else list(LIST_DEDUP_KEYS)
+        unknown = [key for key in self.keys if key not in ENTITY_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown entity keys: {unknown}")
+        self.db = db
+        self.list_id = list_id
+        self.processor = processor or DataProcessor()
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.commit = commit
+
+    def record_keys(self, record: Dict[str, Any]) -> List[DedupKey]:
+        """
+        企業データの重複キー（空のキーは除く）
+        """
+        keys = []
+        exact = self.processor.duplicate_key(record)
+        if exact:
+            keys.append((EXACT_KEY, exact))
+        for kind in self.keys:
+            value = ENTITY_KEYS[kind](record)
+            if value:
+                keys.append((kind, value))
+        return keys
+
+    def _chunks(self, items: Sequence) -> List[Sequence]:
+        return [items[start:start + self.chunk_size] for start in range(0, len(items), self.chunk_size)]
+
+    def lookup(self, keys: Sequence[DedupKey]) -> Dict[DedupKey, int]:
+        """
+        キーごとに一致する既存の企業データのID（キーの種類ごとにまとめて照会する）
+        """
+        values_by_kind: Dict[str, List[str]] = {}
+        for kind, value in set(keys):
+            values_by_kind.setdefault(kind, []).append(value)
+
+        found: Dict[DedupKey, int] = {}
+        for kind, values in values_by_kind.items():
+            for chunk in self._chunks(values):
+                rows = self.db.query(models.CompanyKey.value, models.CompanyKey.company_id).filter(
+                    models.CompanyKey.list_id == self.list_id,
+                    models.CompanyKey.kind == kind,
+                    models.CompanyKey.value.in_(chunk),
+                )
+                for value, company_id in rows:
+                    key = (kind, value)
+                    if key not in found or company_id < found[key]:
+                        found[key] = company_id
+        return found
+
+    def is_indexed(self) -> bool:
+        """
+        リストの索引があるか（企業データがない場合も索引があるものとする）
+        """
+        has_keys = self.db.query(models.CompanyKey.id).filter(models.CompanyKey.list_id == self.list_id).first()
+        if has_keys:
+            return True
+        return not self.db.query(models.Company.id).filter(models.Company.list_id == self.list_id).first()
+
+    def rebuild(self) -> int:
+        """
+        リストに保存済みの企業データから索引を作り直す（chunk_size 件ずつ読み込む）
+
+        作成したキーの件数を返す。
+        """
+        self.db.query(models.CompanyKey).filter(models.CompanyKey.list_id == self.list_id).delete()
+        created = 0
+        last_id = 0
+        while True:
+            companies = self.db.query(models.Company).filter(
+                models.Company.list_id == self.list_id, models.Company.id > last_id
+            ).order_by(models.Company.id).limit(self.chunk_size).all()
+            if not companies:
+                break
+            created += self._insert_keys(
+                (company.id, key) for company in companies for key in self.record_keys(self._company_values(company))
+            )
+            last_id = companies[-1].id
+            # 読み込んだ企業データはセッションから外し、メモリに溜めない
+            for company in companies:
+                self.db.expunge(company)
+        return created
+
+    def _insert_keys(self, keys: Iterable[Tuple[int, DedupKey]]) -> int:
+        """
+        (企業データのID, キー) をまとめて company_keys に保存する（ORM のオブジェクトを作らない）
+        """
+        rows = [
+            {"list_id": self.list_id, "company_id": company_id, "kind": kind, "value": value}
+            for company_id, (kind, value) in keys
+        ]
+        if rows:
+            self.db.execute(models.CompanyKey.__table__.insert(), rows)
+        return len(rows)
+
+    @staticmethod
+    def _company_values(company: models.Company) -> Dict[str, Any]:
+        return {name: getattr(company, name) for name in COLUMN_DEFAULTS}
+
+    def _merge_into(self, company: models.Company, record: Dict[str, Any]) -> None:
+        merged = self.processor.merge_company_data(self._company_values(company), as_record(record).column_values())
+        for name in COLUMN_DEFAULTS:
+            setattr(company, name, merged[name])
+
+    def _merge_row(self, row: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+        merged = self.processor.merge_company_data(row, as_record(record).column_values())
+        return {"list_id": self.list_id, **{name: merged[name] for name in COLUMN_DEFAULTS}}
+
+    def store(self, records: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        企業データをリストに保存する（既存のデータと重複するものはマージ、または保存しない）
+
+        records はジェネレーターでもよく、chunk_size 件ずつ読んで保存する（新しい企業データは CompanyWriter で
+        まとめて INSERT し、セッションに溜めない）。List.total_records には保存した件数を加える。
+        commit が False の場合、コミットは呼び出し側で行う。保存・マージ・スキップした件数を返す。
+        """
+        counts = {"inserted": 0, "merged": 0, "skipped": 0}
+        if not self.is_indexed():
+            logger.info(f"Building dedup index for list {self.list_id}")
+            self.rebuild()
+        writer = CompanyWriter(self.db, self.list_id, batch_size=self.chunk_size, returning=True, commit=False)
+
+        for chunk in batched(records, self.chunk_size):
+            chunk_keys = [self.record_keys(record) for record in chunk]
+            existing = self.lookup([key for keys in chunk_keys for key in keys])
+
+            companies: Dict[int, models.Company] = {}
+            if self.mode == "merge" and existing:
+                for company_id_chunk in self._chunks(sorted(set(existing.values()))):
+                    for company in self.db.query(models.Company).filter(models.Company.id.in_(company_id_chunk)):
+                        companies[company.id] = company
+
+            # このチャンクで追加した行（行番号）・マージした既存の企業データのキー（同じチャンク内の重複もまとめる）
+            rows: List[Dict[str, Any]] = []
+            pending: Dict[DedupKey, Union[int, models.Company]] = {}
+            new_keys: List[Tuple[Union[int, models.Company], DedupKey]] = []
+            for record, keys in zip(chunk, chunk_keys):
+                target = next((existing[key] for key in keys if key in existing), None)
+                if target is not None and self.mode == "skip":
+                    counts["skipped"] += 1
+                    continue
+                company = companies.get(target)
+                if company is None:
+                    company = next((pending[key] for key in keys if key in pending), None)
+                if company is None:
+                    company = len(rows)
+                    rows.append(company_row(self.list_id, record))
+                    counts["inserted"] += 1
+                elif self.mode == "skip":
+                    counts["skipped"] += 1
+                    continue
+                elif isinstance(company, int):
+                    rows[company] = self._merge_row(rows[company], record)
+                    counts["merged"] += 1
+                else:
+                    self._merge_into(company, record)
+                    counts["merged"] += 1
+                for key in keys:
+                    if key not in existing and key not in pending:
+                        pending[key] = company
+                        new_keys.append((company, key))
+
+            # 追加した企業データのID（行の順）を受け取ってからキーを保存する
+            ids = writer.insert_rows(rows)
+            self._insert_keys(
+                (ids[company] if isinstance(company, int) else company.id, key) for company, key in new_keys
+            )
+            if self.commit:
+                self.db.commit()
+            else:
+                self.db.flush()
+        return counts
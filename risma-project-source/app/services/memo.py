@@ -0,0 +1,53 @@
+"""
+正規化などの結果を入力ごとに記憶するサイズ上限付きのキャッシュ（LRU）
+
+取り込むデータでは同じ業種・住所・会社名が繰り返し現れるため、一度求めた結果を使い回す。
+キャッシュはプロセスごとに持ち（プロセス間で共有しない）、スレッドから同時に呼び出してもよい。
+"""
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+# 関数ごとに記憶する入力の件数の上限（0 の場合は記憶しない）
+MEMO_SIZE = int(os.getenv("RISMA_MEMO_SIZE", "32768"))
+
+
+class Memo:
+    """
+    1引数の関数の結果を記憶するキャッシュ
+
+    ハッシュできない入力（リストなど）は記憶せずにそのまま関数を呼ぶ。
+    関数が参照する表（マッピングなど）を変更した場合は clear を呼ぶ。
+    """
+    def __init__(self, func: Callable[[Any], Any], maxsize: int = MEMO_SIZE):
+        self.func = func
+        self.maxsize = maxsize
+        # functools.lru_cache は C で実装されており、スレッドから同時に呼び出しても安全
+        self._cached = lru_cache(maxsize=maxsize)(func)
+
+    def __call__(self, value: Any) -> Any:
+        try:
+            return self._cached(value)
+        except TypeError:
+            try:
+                hash(value)
+            except TypeError:
+                return self.func(value)
+            raise
+
+    def clear(self) -> None:
+        self._cached.cache_clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        ヒット数・ミス数・記憶している件数・ヒット率
+        """
+        info = self._cached.cache_info()
+        calls = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": self.maxsize,
+            "hit_rate": round(info.hits / calls, 4) if calls else 0.0,
+        }
@@ -0,0 +1,183 @@
+"""
+プロセスプールによる企業データの正規化の並列実行（大量の取り込み用）
+
+ワーカーは起動時に1回だけ DataProcessor（正規表現・変換テーブル・地名辞書）を用意し、
+レコードは辞書のリストではなく列ごとの値のリストとしてやり取りする。
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.data_processor import DataProcessor, _MISSING
+
+# 正規化に使うプロセス数
+NORMALIZE_WORKERS = int(os.getenv("RISMA_NORMALIZE_WORKERS", str(os.cpu_count() or 1)))
+# 1つのワーカーにまとめて渡す行数
+PARALLEL_SHARD_SIZE = int(os.getenv("RISMA_PARALLEL_SHARD_SIZE", "20000"))
+# これより少ない行数はプロセス間のやり取りの方が高くつくため、同じプロセスで処理する
+PARALLEL_MIN_ROWS = int(os.getenv("RISMA_PARALLEL_MIN_ROWS", "50000"))
+
+# 列ごとの値のリストと、項目を持つ行のマスク
+PackedColumns = Dict[str, Tuple[list, np.ndarray]]
+
+_processor: Optional[DataProcessor] = None
+
+
+def _init_worker() -> None:
+    global _processor
+    _processor = DataProcessor()
+
+
+def _pack_records(rows: List[Dict[str, Any]]) -> PackedColumns:
+    keys = list(dict.fromkeys(key for row in rows for key in row))
+    return {
+        key: ([row.get(key) for row in rows], np.fromiter((key in row for row in rows), bool, len(rows)))
+        for key in keys
+    }
+
+
+def _unpack_columns(packed: PackedColumns) -> Dict[str, pd.Series]:
+    columns = {}
+    for key, (values, present) in packed.items():
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        column[~present] = _MISSING
+        columns[key] = pd.Series(column, dtype=object)
+    return columns
+
+
+def _normalize_packed(packed: PackedColumns) -> Optional[Tuple[Dict[str, list], Dict[str, np.ndarray]]]:
+    """
+    ワーカーで列ごとに正規化する（一括処理できない値を含む場合は None）
+    """
+    columns = _unpack_columns(packed)
+    if not _processor._batch_supported(columns):
+        return None
+    columns, added = _processor._normalize_columns(columns)
+    values = {key: [None if value is _MISSING else value for value in column] for key, column in columns.items()}
+    return values, added
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    return _processor._normalize_frame_batch(df)
+
+
+def _normalize_csv_frame(df: pd.DataFrame) -> pd.DataFrame:
+    return _processor._normalize_csv_frame(df)
+
+
+def _normalize_csv_shard(shard: Tuple[pd.DataFrame, List[str]]) -> pd.DataFrame:
+    df, text_columns = shard
+    return _processor._normalize_csv_frame(df, text_columns)
+
+
+class ParallelNormalizer:
+    """
+    企業データを shard_size 行ずつに分けてプロセスプールで正規化し、元の順序に戻して返すクラス
+
+    結果は DataProcessor の一括処理（normalize_company_data_batch など）と同じになる。
+    プロセスプールは最初に並列処理が必要になった時点で起動し、close まで使い回す。
+    """
+    def __init__(self, processor: Optional[DataProcessor] = None, workers: int = NORMALIZE_WORKERS,
+                 shard_size: int = PARALLEL_SHARD_SIZE, min_rows: int = PARALLEL_MIN_ROWS):
+        self.processor = processor or DataProcessor()
+        self.workers = workers
+        self.shard_size = shard_size
+        self.min_rows = min_rows
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ParallelNormalizer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _parallel(self, rows: int) -> bool:
+        return self.workers > 1 and rows >= self.min_rows
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork はスレッドやイベントループを持つ親プロセスの状態を引き継ぐため spawn で起動する
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+        return self._executor
+
+    def _ordered_map(self, func: Callable, items: Iterable) -> Iterator:
+        """
+        items を順にワーカーへ渡し、結果を渡した順に返す（処理中の件数はワーカー数の2倍まで）
+        """
+        pool = self._pool()
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= self.workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _shards(self, size: int) -> List[slice]:
+        return [slice(start, start + self.shard_size) for start in range(0, size, self.shard_size)]
+
+    def normalize_records(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        normalize_company_data と同じ結果のリストを返す
+        """
+        rows = [row for row in records if row and row.get("name")]
+        if not self._parallel(len(rows)):
+            return self.processor.normalize_company_data(rows)
+
+        shards = [rows[shard] for shard in self._shards(len(rows))]
+        normalized_data = []
+        for shard, result in zip(shards, self._ordered_map(_normalize_packed, (_pack_records(shard) for shard in shards))):
+            if result is None:
+                normalized_data.extend(self.processor.normalize_company_data(shard))
+            else:
+                normalized_data.extend(self.processor._columns_to_records(shard, *result))
+        return normalized_data
+
+    def normalize_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        normalize_company_data_batch に DataFrame を渡した場合と同じ結果を返す
+        """
+        if not self._parallel(len(df)):
+            return self.processor.normalize_company_data_batch(df)
+        return self._concat(self._ordered_map(_normalize_frame, (df.iloc[shard] for shard in self._shards(len(df)))))
+
+    def normalize_csv_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        CSVから読み込んだ DataFrame を process_csv_file と同じ方法で正規化する
+        """
+        if not self._parallel(len(df)):
+            return self.processor._normalize_csv_frame(df)
+        # 正規化する列は全体から1回だけ求める（シャードごとに求めると、欠損値の有無で結果が変わる）
+        text_columns = self.processor._csv_text_columns(df)
+        shards = ((df.iloc[shard], text_columns) for shard in self._shards(len(df)))
+        return self._concat(self._ordered_map(_normalize_csv_shard, shards))
+
+    def map_csv_frames(self, frames: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        分割して読み込んだCSVの DataFrame をワーカーで正規化し、読み込んだ順に返す
+        """
+        if self.workers <= 1:
+            for frame in frames:
+                yield self.processor._normalize_csv_frame(frame)
+            return
+        yield from self._ordered_map(_normalize_csv_frame, frames)
+
+    @staticmethod
+    def _concat(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,198 @@
+"""
+企業データを1件ずつ流して処理するパイプライン
+
+各段階はレコードの iterable を受け取り、処理したレコードを1件ずつ返すジェネレーターで、
+段階の間でリスト全体の複製を作らない。全件が必要な段階（重複削除）だけがその内部でレコードを保持する。
+"""
+import os
+import time
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+
+from app.services.data_processor import DataProcessor
+from app.services.processing_profile import ProcessingProfile
+
+# 正規化などをまとめて行う件数
+PIPELINE_BATCH_SIZE = int(os.getenv("RISMA_PIPELINE_BATCH_SIZE", "1000"))
+
+Record = Dict[str, Any]
+Stage = Callable[[Iterable[Record]], Iterator[Record]]
+
+
+def batched(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    size 件ずつのリストに分ける
+    """
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Pipeline:
+    """
+    段階を順につないだパイプライン
+
+    run（または呼び出し）はジェネレーターを返し、結果を読み進めた分だけ入力を読む。
+    """
+    def __init__(self, stages: Optional[Iterable[Stage]] = None):
+        self.stages: List[Stage] = list(stages or [])
+
+    def add(self, stage: Stage) -> "Pipeline":
+        self.stages.append(stage)
+        return self
+
+    def run(self, records: Iterable[Record], profile: Optional[ProcessingProfile] = None) -> Iterator[Record]:
+        """
+        profile を渡した場合は、段階ごとの処理時間（前の段階の時間を除く）と返した件数を
+        pipeline.<段階の名前> として記録する（結果を読み終えた時点、または途中で閉じた時点で記録する）
+        """
+        stream = iter(records)
+        if profile is not None:
+            return self._run_profiled(stream, profile)
+        for stage in self.stages:
+            stream = stage(stream)
+        return stream
+
+    __call__ = run
+
+    def _run_profiled(self, stream: Iterator[Record], profile: ProcessingProfile) -> Iterator[Record]:
+        # 段階ごとの [実時間, CPU時間, 件数]（前の段階の時間を含む）
+        totals = []
+        for stage in self.stages:
+            total = [0.0, 0.0, 0]
+            totals.append(total)
+            stream = _timed(stage(stream), total)
+        try:
+            yield from stream
+        finally:
+            upstream_wall = upstream_cpu = 0.0
+            for stage, (wall, cpu, rows) in zip(self.stages, totals):
+                profile.record_stage(f"pipeline.{stage_name(stage)}", wall - upstream_wall, cpu - upstream_cpu, rows)
+                upstream_wall, upstream_cpu = wall, cpu
+
+
+def stage_name(stage: Stage) -> str:
+    """
+    段階を作った関数の名前（normalize・deduplicate など）
+    """
+    return stage.__qualname__.split(".")[0]
+
+
+def _timed(records: Iterator[Record], total: List) -> Iterator[Record]:
+    while True:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            record = next(records)
+        except StopIteration:
+            return
+        finally:
+            total[0] += time.perf_counter() - wall
+            total[1] += time.process_time() - cpu
+        total[2] += 1
+        yield record
+
+
+def normalize(normalize_batch: Callable[[List[Record]], List[Record]],
+              batch_size: int = PIPELINE_BATCH_SIZE) -> Stage:
+    """
+    batch_size 件ずつ正規化する段階（normalize_batch は DataProcessor.normalize_company_data_batch
+    や ParallelNormalizer.normalize_records など、レコードのリストを受け取るもの）
+    """
+    def stage(records: Iterable[Record]) -> Iterator[Record]:
+        for batch in batched(records, batch_size):
+            yield from normalize_batch(batch)
+    return stage
+
+
+def exclude_keywords(keywords: Optional[List[str]]) -> Stage:
+    """
+    会社名または説明文に除外キーワードを含むレコードを除く段階
+    """
+    lowered = [keyword.lower() for keyword in keywords or []]
+
+    def stage(records: Iterable[Record]) -> Iterator[Record]:
+        for record in records:
+            name = record.get("name", "").lower()
+            description = record.get("description", "").lower()
+            if not any(keyword in name or keyword in description for keyword in lowered):
+                yield record
+    return stage
+
+
+def filter_by_industry(processor: DataProcessor, industry_codes: Optional[List[str]]) -> Stage:
+    """
+    DataProcessor.filter_by_industry と同じ条件で絞り込む段階
+    """
+    codes = set(industry_codes or [])
+
+    def stage(records: Iterable[Record]) -> Iterator[Record]:
+        if not codes:
+            yield from records
+            return
+        for record in records:
+            if processor.matches_industry(record, codes):
+                yield record
+    return stage
+
+
+def filter_by_location(processor: DataProcessor, prefectures: Optional[List[str]] = None,
+                       cities: Optional[List[str]] = None) -> Stage:
+    """
+    DataProcessor.filter_by_location と同じ条件で絞り込む段階
+    """
+    def stage(records: Iterable[Record]) -> Iterator[Record]:
+        for record in records:
+            if processor.gazetteer.matches(record, prefectures, cities):
+                yield record
+    return stage
+
+
+def suppress(suppression) -> Stage:
+    """
+    電話番号・ドメイン・メールアドレスが除外リスト（SuppressionList・SuppressionSet）にあるレコードを除く段階
+    """
+    def stage(records: Iterable[Record]) -> Iterator[Record]:
+        if not suppression:
+            yield from records
+            return
+        for record in records:
+            if not suppression.is_suppressed(record):
+                yield record
+    return stage
+
+
+def deduplicate(processor: DataProcessor, external: bool = False, fuzzy: Optional[bool] = None) -> Stage:
+    """
+    重複をまとめる段階（入力をすべて読んでから結果を返す）
+
+    external が True の場合は remove_duplicates_external で、ディスク上のパーティションを使って
+    完全一致の重複だけを削除する（メモリに載らない件数用）。fuzzy は DataProcessor.deduplicate に渡す。
+    """
+    def stage(records: Iterable[Record]) -> Iterator[Record]:
+        if external:
+            yield from processor.remove_duplicates_external(records)
+        else:
+            yield from processor.deduplicate(list(records), fuzzy=fuzzy)
+    return stage
+
+
+def heartbeat(beat: Callable[[], None], interval: float) -> Stage:
+    """
+    レコードをそのまま返しながら、前回から interval 秒以上経っていれば beat を呼ぶ段階
+    （長い処理の間もジョブが動いていることを記録する。全件を読む段階の中の処理の間は呼ばれない）
+    """
+    def stage(records: Iterable[Record]) -> Iterator[Record]:
+        last = time.monotonic()
+        for record in records:
+            now = time.monotonic()
+            if now - last >= interval:
+                beat()
+                last = now
+            yield record
+        if time.monotonic() - last >= interval:
+            beat()
+    return stage
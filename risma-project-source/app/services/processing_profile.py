@@ -0,0 +1,185 @@
+"""
+企業データの処理の計測（段階・関数ごとの実時間・CPU時間・呼び出し回数・行数）
+
+DataProcessor.profiling の with の間だけ、計測する段階と関数をインスタンスの属性として計測用のラッパーに置き換える。
+計測していない間はメソッドをそのまま呼ぶため、1件ごとの処理に計測の負荷はかからない
+（一括処理の中の列ごとの段階は、何もしないコンテキストマネージャーを通るだけ）。
+
+段階の時間はその中で呼んだ段階・関数の時間を含む。Pipeline の段階（pipeline.*）は、
+前の段階の時間を除いたその段階だけの時間。
+"""
+import json
+import os
+import time
+from collections.abc import Iterator as IteratorABC
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, Optional
+
+import pandas as pd
+
+
+class TimingStats:
+    """
+    1つの段階または関数の計測値の合計
+    """
+    __slots__ = ("calls", "rows", "wall", "cpu")
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def add(self, wall: float, cpu: float, rows: int = 0) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.wall += wall
+        self.cpu += cpu
+
+    def merge(self, other: "TimingStats") -> None:
+        self.calls += other.calls
+        self.rows += other.rows
+        self.wall += other.wall
+        self.cpu += other.cpu
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "rows": self.rows,
+            "wall_seconds": round(self.wall, 6),
+            "cpu_seconds": round(self.cpu, 6),
+            "rows_per_sec": round(self.rows / self.wall, 1) if self.wall > 0 and self.rows else None,
+        }
+
+
+def _rows(value: Any) -> Optional[int]:
+    """
+    処理した行数（レコードのリスト・DataFrame は件数、書き出した行数などの整数はその値）
+    """
+    if isinstance(value, (str, bytes, bool)) or value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if hasattr(value, "__len__"):
+        return len(value)
+    return None
+
+
+class ProcessingProfile:
+    """
+    1つのジョブ・取り込みでの処理の計測値
+
+    stages はレコードのリスト・DataFrame・CSVファイル単位の処理（行数は入力の件数、ジェネレーターは返した件数）、
+    functions は1件ごとの処理（行数は呼び出し回数）。
+    """
+    def __init__(self):
+        self.stages: Dict[str, TimingStats] = {}
+        self.functions: Dict[str, TimingStats] = {}
+
+    @staticmethod
+    def _stats(table: Dict[str, TimingStats], name: str) -> TimingStats:
+        stats = table.get(name)
+        if stats is None:
+            stats = table[name] = TimingStats()
+        return stats
+
+    def record_stage(self, name: str, wall: float, cpu: float, rows: int = 0) -> None:
+        self._stats(self.stages, name).add(wall, cpu, rows)
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        """
+        with の中の処理を段階 name として計測する
+        """
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - wall, time.process_time() - cpu, rows)
+
+    def wrap_function(self, name: str, func: Callable) -> Callable:
+        """
+        呼び出しごとに計測する関数を返す（1回の呼び出しを1行とする）
+        """
+        stats = self._stats(self.functions, name)
+        perf_counter = time.perf_counter
+        process_time = time.process_time
+
+        def wrapper(*args, **kwargs):
+            wall = perf_counter()
+            cpu = process_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.add(perf_counter() - wall, process_time() - cpu, 1)
+        return wrapper
+
+    def wrap_stage(self, name: str, func: Callable) -> Callable:
+        """
+        段階として計測する関数を返す
+
+        行数は最初の引数（レコードのリスト・DataFrame）の件数、ない場合は戻り値の件数。
+        イテレーターを返す関数は、結果を読み進めた間の時間と返した件数（DataFrame は行数）を、読み終えた時点で記録する。
+        """
+        stats = self._stats(self.stages, name)
+
+        def wrapper(*args, **kwargs):
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            result = func(*args, **kwargs)
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            if isinstance(result, IteratorABC):
+                return self._timed(result, stats, wall, cpu)
+            rows = _rows(args[0]) if args else None
+            stats.add(wall, cpu, rows if rows is not None else _rows(result) or 0)
+            return result
+        return wrapper
+
+    @staticmethod
+    def _timed(iterator: Iterator, stats: TimingStats, wall: float = 0.0, cpu: float = 0.0) -> Iterator:
+        rows = 0
+        try:
+            while True:
+                started_wall = time.perf_counter()
+                started_cpu = time.process_time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    wall += time.perf_counter() - started_wall
+                    cpu += time.process_time() - started_cpu
+                rows += len(item) if isinstance(item, pd.DataFrame) else 1
+                yield item
+        finally:
+            stats.add(wall, cpu, rows)
+
+    def merge(self, other: "ProcessingProfile") -> None:
+        """
+        他の計測値を加算する
+        """
+        for mine, theirs in ((self.stages, other.stages), (self.functions, other.functions)):
+            for name, stats in theirs.items():
+                self._stats(mine, name).merge(stats)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSONとして保存可能な形式で返す（それぞれ実時間の長い順）
+        """
+        def table(stats: Dict[str, TimingStats]) -> Dict[str, Any]:
+            ordered = sorted(stats.items(), key=lambda item: item[1].wall, reverse=True)
+            return {name: value.to_dict() for name, value in ordered}
+
+        return {"stages": table(self.stages), "functions": table(self.functions)}
+
+    def write(self, path: str) -> None:
+        """
+        計測値をJSONファイルに書き出す（取り込みごとの記録用）
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
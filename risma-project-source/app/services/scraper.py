@@ -1,24 +1,60 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
 import asyncio
 import aiohttp
 from urllib.parse import urlparse, urljoin, quote_plus
 import re
 import time
 import random
+from contextlib import asynccontextmanager
+
+from app.services.checkpoint import CrawlCheckpoint
+from app.services.company_record import CompanyRecord
+from app.services.suppression import SuppressionSet
+from app.services.budget import CrawlBudget
+from app.services.fetch_broker import FetchBroker, BrokerJob
+from app.services.extraction_templates import ExtractionTemplateCache, labeled_text
+from app.services.transport import transport_from_env
+from app.services.crawl_stats import CrawlStats
+from app.services import text_normalizer
+from app.services.gazetteer import default_gazetteer, PREFECTURES
+from app.services.industry_index import default_industry_index
 
 logger = logging.getLogger(__name__)
 
+# 電話番号のパターン（全角の数字・区切り文字で書かれたものも1回の走査で探す）
+_PHONE_PATTERNS = [
+    re.compile(r"[0０]\d{1,4}[-(－（]?\d{1,4}[-)－）]*\d{4}"),  # 一般的な電話番号
+    re.compile(r"[0０][1１][2２][0０][-(－（]?\d{3}[-)－）]*\d{3}"),  # フリーダイヤル
+]
+# テキストの中で最初に現れる都道府県から始まる住所
+_PREFECTURE_ADDRESS_RE = re.compile(f"(?:{'|'.join(PREFECTURES)})[^\n。、]{{5,50}}")
+
 class WebScraper:
     """
     Webスクレイピングを行うクラス
     """
-    def __init__(self, max_concurrent_requests: int = 5, timeout: int = 30, delay_between_requests: float = 1.0):
+    def __init__(self, max_concurrent_requests: int = 5, timeout: int = 30, delay_between_requests: float = 1.0,
+                 budget: Optional[CrawlBudget] = None, broker: Optional[FetchBroker] = None,
+                 use_templates: bool = True, transport=None):
         self.max_concurrent_requests = max_concurrent_requests
         self.timeout = timeout
         self.delay_between_requests = delay_between_requests
+        # ジョブごとのクロール上限の既定値（検索ごとに未使用の予算として複製する）
+        self.budget = budget
+        # 複数ジョブで共有するリクエスト枠（None の場合はジョブ内のセマフォのみで制限する）
+        self.broker = broker
+        # レイアウトごとに学習した抽出位置（同じレイアウトのページではラベル探索を省略する）
+        self.template_cache = ExtractionTemplateCache() if use_templates else None
+        # プロセス全体の計測値（完了したクロールの分を加算する）と実行中のクロールの計測値
+        self.stats = CrawlStats()
+        self.active_stats: Dict[str, CrawlStats] = {}
+        # 住所から都道府県・市区町村を求める地名辞書
+        self.gazetteer = default_gazetteer()
+        # 業種名と業種コードの索引（DataProcessor と共有）
+        self.industry_index = default_industry_index()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
             "Accept-Language": "ja,en-US;q=0.9,en;q=0.8",
@@ -28,6 +64,8 @@ class WebScraper:
             "Upgrade-Insecure-Requests": "1",
             "Cache-Control": "max-age=0",
         }
+        # ページの取得方法（live / record / replay、既定は環境変数 RISMA_FETCH_MODE で切り替える）
+        self.transport = transport or transport_from_env(self.headers)
         # 検索エンジンのURLテンプレート
         self.search_engines = {
             "google": "https://www.google.com/search?q={query}&num=100",
@@ -39,12 +77,26 @@ class WebScraper:
             "townpage": "https://itp.ne.jp/result/?keyword={query}",
             "navitime": "https://www.navitime.co.jp/category/search?keyword={query}",
         }
+        # 企業ページで各項目の近くにあるラベル
+        self.labeled_field_patterns = {
+            "phone": [r"電話番号", r"TEL", r"Tel", r"tel", r"電話", r"お問い合わせ", r"連絡先"],
+            "address": [r"住所", r"所在地", r"本社", r"支社", r"オフィス", r"事務所"],
+            "representative": [r"代表", r"社長", r"CEO", r"代表取締役"],
+            "established_year": [r"設立", r"創業", r"創立"],
+            "capital": [r"資本金"],
+            "employees": [r"従業員", r"社員", r"人数", r"スタッフ"],
+            "industry": [r"業種", r"事業内容", r"業界"],
+        }
     
-    async def search_by_keyword(self, keywords: List[str], max_results: int = 100, exclude_keywords: List[str] = None) -> List[Dict[str, Any]]:
+    async def search_by_keyword(self, keywords: List[str], max_results: int = 100, exclude_keywords: List[str] = None,
+                                checkpoint: Optional[CrawlCheckpoint] = None,
+                                budget: Optional[CrawlBudget] = None,
+                                job_key: Optional[str] = None, user_key: Optional[str] = None,
+                                stats: Optional[CrawlStats] = None,
+                                suppression: Optional[SuppressionSet] = None) -> List[Dict[str, Any]]:
         """
         キーワード検索を行い、企業情報を取得する
         """
-        results = []
         search_urls = []
         
         # 検索クエリを生成
@@ -58,71 +110,27 @@ class WebScraper:
             for site, url_template in self.directory_sites.items():
                 search_urls.append(url_template.format(query=quote_plus(keyword)))
         
-        # 非同期でリクエストを実行
-        async with aiohttp.ClientSession(headers=self.headers) as session:
-            # セマフォを使用して同時リクエスト数を制限
-            semaphore = asyncio.Semaphore(self.max_concurrent_requests)
-            
-            async def fetch_with_semaphore(url):
-                async with semaphore:
-                    # リクエスト間の遅延
-                    await asyncio.sleep(self.delay_between_requests * (0.5 + random.random()))
-                    return await self.fetch_search_results(session, url)
-            
-            tasks = [fetch_with_semaphore(url) for url in search_urls]
-            search_results = await asyncio.gather(*tasks)
-            
-            # 検索結果から企業URLを抽出
-            company_urls = []
-            for result in search_results:
-                extracted_urls = self.extract_company_urls(result)
-                logger.info(f"Extracted {len(extracted_urls)} URLs from search result")
-                company_urls.extend(extracted_urls)
-            
-            # 重複を削除
-            company_urls = list(set(company_urls))
-            logger.info(f"Total unique company URLs: {len(company_urls)}")
-            
-            # 最大結果数を制限
-            company_urls = company_urls[:max_results * 2]  # 余裕を持って取得
-            
-            # 企業ページから情報を抽出
-            company_tasks = []
-            for url in company_urls:
-                # リクエスト間の遅延
-                await asyncio.sleep(self.delay_between_requests * random.random())
-                company_tasks.append(self.fetch_company_info(session, url))
-            
-            company_results = await asyncio.gather(*company_tasks)
-            
-            # 有効な結果のみを追加
-            for result in company_results:
-                if result and "name" in result and result["name"]:
-                    # 除外キーワードでフィルタリング
-                    if exclude_keywords:
-                        exclude = False
-                        for keyword in exclude_keywords:
-                            if keyword.lower() in result.get("name", "").lower():
-                                exclude = True
-                                break
-                        if exclude:
-                            continue
-                    
-                    results.append(result)
-                    
-                    # 最大結果数に達したら終了
-                    if len(results) >= max_results:
-                        break
+        def accept(result: Dict[str, Any]) -> bool:
+            # 除外キーワードでフィルタリング
+            if exclude_keywords:
+                for keyword in exclude_keywords:
+                    if keyword.lower() in result.get("name", "").lower():
+                        return False
+            return True
         
-        logger.info(f"Final company results: {len(results)}")
-        return results
+        return await self._crawl(search_urls, max_results, accept, checkpoint, budget, job_key, user_key, stats,
+                                 suppression)
     
     async def search_by_industry_location(self, industry_codes: List[str], prefectures: Optional[List[str]] = None, 
-                                         cities: Optional[List[str]] = None, max_results: int = 100) -> List[Dict[str, Any]]:
+                                         cities: Optional[List[str]] = None, max_results: int = 100,
+                                         checkpoint: Optional[CrawlCheckpoint] = None,
+                                         budget: Optional[CrawlBudget] = None,
+                                         job_key: Optional[str] = None, user_key: Optional[str] = None,
+                                         stats: Optional[CrawlStats] = None,
+                                         suppression: Optional[SuppressionSet] = None) -> List[Dict[str, Any]]:
         """
         業種と住所で検索を行い、企業情報を取得する
         """
-        results = []
         search_urls = []
         
         # 検索クエリを生成
@@ -149,148 +157,255 @@ class WebScraper:
                 else:
                     search_urls.append(url_template.format(query=quote_plus(industry)))
         
+        def accept(result: Dict[str, Any]) -> bool:
+            # 業種と住所でフィルタリング
+            return self.match_industry_location(result, industry_codes, prefectures, cities)
+        
+        return await self._crawl(search_urls, max_results, accept, checkpoint, budget, job_key, user_key, stats,
+                                 suppression)
+    
+    async def _crawl(self, search_urls: List[str], max_results: int, accept: Callable[[Dict[str, Any]], bool],
+                     checkpoint: Optional[CrawlCheckpoint] = None,
+                     budget: Optional[CrawlBudget] = None,
+                     job_key: Optional[str] = None, user_key: Optional[str] = None,
+                     stats: Optional[CrawlStats] = None,
+                     suppression: Optional[SuppressionSet] = None) -> List[Dict[str, Any]]:
+        """
+        検索結果ページから企業URLを収集し、企業ページから情報を抽出する
+
+        checkpoint が渡された場合は処理済みのページを飛ばし、進捗を逐次記録する。
+        budget の上限に達した場合は新たなリクエストを行わず、取得済みの結果を返す。
+        broker が設定されている場合は、job_key・user_key 単位で他のジョブとリクエスト枠を分け合う。
+        stats が渡された場合はリクエスト・待ち時間・解析時間をそこに記録する。
+        suppression が渡された場合は、ドメインが除外リストにある企業ページを取得せず、
+        電話番号・メールアドレスが除外リストにある企業を結果から除く。
+        """
+        if budget is None:
+            budget = self.budget.fresh() if self.budget else CrawlBudget()
+        budget.start()
+        
+        if checkpoint is None:
+            checkpoint = CrawlCheckpoint()
+        elif checkpoint.is_resumed:
+            logger.info(f"Resuming crawl: {len(checkpoint.serp_done)} search pages and "
+                        f"{len(checkpoint.visited)} company pages already done")
+        
+        if stats is None:
+            stats = CrawlStats()
+        stats.crawls += 1
+        stats_key = job_key or f"crawl-{id(stats)}"
+        self.active_stats[stats_key] = stats
+        
+        broker_job = None
+        if self.broker is not None:
+            # 見込みリクエスト数が少ないジョブは共有枠で優先される
+            expected_requests = len(search_urls) + max_results * 2
+            if budget.max_requests is not None:
+                expected_requests = min(expected_requests, budget.max_requests)
+            broker_job = self.broker.register(job_key or f"crawl-{id(checkpoint)}", user_key,
+                                              expected_requests=expected_requests)
+        
+        try:
+            return await self._crawl_pages(search_urls, max_results, accept, checkpoint, budget, broker_job, stats,
+                                           suppression)
+        finally:
+            if broker_job is not None:
+                broker_job.close()
+            self.active_stats.pop(stats_key, None)
+            self.stats.merge(stats)
+    
+    async def _crawl_pages(self, search_urls: List[str], max_results: int, accept: Callable[[Dict[str, Any]], bool],
+                           checkpoint: CrawlCheckpoint, budget: CrawlBudget,
+                           broker_job: Optional[BrokerJob], stats: CrawlStats,
+                           suppression: Optional[SuppressionSet] = None) -> List[Dict[str, Any]]:
         # 非同期でリクエストを実行
-        async with aiohttp.ClientSession(headers=self.headers) as session:
+        async with self.transport.session() as session:
             # セマフォを使用して同時リクエスト数を制限
             semaphore = asyncio.Semaphore(self.max_concurrent_requests)
             
-            async def fetch_with_semaphore(url):
+            async def fetch_search_page(url):
+                queued_at = time.perf_counter()
                 async with semaphore:
+                    stats.record_wait(CrawlStats.SEMAPHORE, time.perf_counter() - queued_at)
+                    if budget.is_exhausted():
+                        return
                     # リクエスト間の遅延
-                    await asyncio.sleep(self.delay_between_requests * (0.5 + random.random()))
-                    return await self.fetch_search_results(session, url)
-            
-            tasks = [fetch_with_semaphore(url) for url in search_urls]
-            search_results = await asyncio.gather(*tasks)
-            
-            # 検索結果から企業URLを抽出
-            company_urls = []
-            for result in search_results:
+                    delay = self.delay_between_requests * (0.5 + random.random())
+                    await asyncio.sleep(delay)
+                    stats.record_delay(delay)
+                    async with self._request_slot(broker_job, stats):
+                        result = await self.fetch_search_results(session, url, budget, stats)
+                    if result is None:
+                        # 予算不足で取得しなかったページは未処理のまま残す
+                        return
+                
+                # 検索結果から企業URLを抽出
+                parse_started = time.perf_counter()
                 extracted_urls = self.extract_company_urls(result)
+                stats.record_parse("search", time.perf_counter() - parse_started)
                 logger.info(f"Extracted {len(extracted_urls)} URLs from search result")
-                company_urls.extend(extracted_urls)
+                checkpoint.add_serp_result(url, extracted_urls)
             
-            # 重複を削除
-            company_urls = list(set(company_urls))
-            logger.info(f"Total unique company URLs: {len(company_urls)}")
+            pending_search_urls = [url for url in dict.fromkeys(search_urls) if not checkpoint.is_serp_done(url)]
+            await asyncio.gather(*[fetch_search_page(url) for url in pending_search_urls])
+            checkpoint.flush()
             
-            # 最大結果数を制限
-            company_urls = company_urls[:max_results * 2]  # 余裕を持って取得
+            logger.info(f"Total unique company URLs: {len(checkpoint.frontier)}")
             
-            # 企業ページから情報を抽出
-            company_tasks = []
-            for url in company_urls:
-                # リクエスト間の遅延
-                await asyncio.sleep(self.delay_between_requests * random.random())
-                company_tasks.append(self.fetch_company_info(session, url))
+            # 最大結果数を制限
+            company_urls = checkpoint.frontier[:max_results * 2]  # 余裕を持って取得
             
-            company_results = await asyncio.gather(*company_tasks)
+            async def fetch_company_page(url):
+                queued_at = time.perf_counter()
+                async with semaphore:
+                    stats.record_wait(CrawlStats.SEMAPHORE, time.perf_counter() - queued_at)
+                    if budget.is_exhausted():
+                        return
+                    # リクエスト間の遅延
+                    delay = self.delay_between_requests * random.random()
+                    await asyncio.sleep(delay)
+                    stats.record_delay(delay)
+                    async with self._request_slot(broker_job, stats):
+                        result = await self.fetch_company_info(session, url, budget, stats)
+                    if result is None:
+                        return
+                checkpoint.add_company_result(url, result)
             
-            # 有効な結果のみを追加
-            for result in company_results:
-                if result and "name" in result and result["name"]:
-                    # 業種と住所でフィルタリング
-                    if self.match_industry_location(result, industry_codes, prefectures, cities):
-                        results.append(result)
-                        
-                        # 最大結果数に達したら終了
-                        if len(results) >= max_results:
-                            break
+            # 企業ページから情報を抽出
+            if suppression:
+                # 除外リストにあるドメインの企業ページは取得しない
+                company_urls = [url for url in company_urls if not suppression.is_suppressed_url(url)]
+            pending_company_urls = [url for url in company_urls if not checkpoint.is_visited(url)]
+            await asyncio.gather(*[fetch_company_page(url) for url in pending_company_urls])
+            checkpoint.flush()
+        
+        # 有効な結果のみを追加（発見順）
+        results = []
+        for url in company_urls:
+            result = checkpoint.records.get(url)
+            if result and "name" in result and result["name"] and accept(result) and \
+                    not (suppression and suppression.is_suppressed(result)):
+                results.append(result)
+                
+                # 最大結果数に達したら終了
+                if len(results) >= max_results:
+                    break
+        stats.accepted += len(results)
         
+        if budget.exhausted:
+            logger.info(f"Crawl budget exhausted ({budget.exhausted}): returning partial results")
         logger.info(f"Final company results: {len(results)}")
         return results
     
+    @asynccontextmanager
+    async def _request_slot(self, broker_job: Optional[BrokerJob], stats: Optional[CrawlStats] = None):
+        """
+        共有のリクエスト枠を確保する（broker を使わない場合は何もしない）
+        """
+        if broker_job is None:
+            yield
+            return
+        queued_at = time.perf_counter()
+        async with broker_job.slot():
+            if stats is not None:
+                stats.record_wait(CrawlStats.BROKER, time.perf_counter() - queued_at)
+            yield
+    
     def match_industry_location(self, company: Dict[str, Any], industry_codes: List[str], 
                                prefectures: Optional[List[str]] = None, 
                                cities: Optional[List[str]] = None) -> bool:
         """
         企業情報が業種と住所の条件に一致するかチェックする
         """
-        # 業種のマッチング
-        industry_match = False
-        if "industry" in company and company["industry"]:
-            for code in industry_codes:
-                if code.lower() in company["industry"].lower():
-                    industry_match = True
-                    break
-        elif "industry_code" in company and company["industry_code"]:
-            if company["industry_code"] in industry_codes:
-                industry_match = True
+        # 業種のマッチング（業種コード・業種名のどちらの指定も業種コードにして比較する）
+        codes = self.industry_index.resolve_codes(industry_codes)
+        industry = company.get("industry")
+        if industry:
+            industry_match = self.industry_index.classify(industry) in codes or \
+                not codes.isdisjoint(self.industry_index.matching_codes(industry))
+        elif company.get("industry_code"):
+            industry_match = company["industry_code"] in codes
         else:
             # 業種情報がない場合は、会社名や説明文から推測
-            for code in industry_codes:
-                if ("name" in company and code.lower() in company["name"].lower()) or \
-                   ("description" in company and company["description"] and code.lower() in company["description"].lower()):
-                    industry_match = True
-                    break
+            industry_match = any(
+                not codes.isdisjoint(self.industry_index.mentioned_codes(company.get(key) or ""))
+                for key in ("name", "description")
+            )
         
         # 業種が一致しない場合は早期リターン
         if not industry_match:
             return False
         
-        # 住所のマッチング（都道府県と市区町村）
-        if not prefectures and not cities:
-            # 住所条件がない場合は業種のみでマッチ
-            return True
-        
-        location_match = False
-        address = company.get("address", "")
-        prefecture = company.get("prefecture", "")
-        city = company.get("city", "")
-        
-        # 都道府県のマッチング
-        if prefectures:
-            if prefecture and prefecture in prefectures:
-                # 都道府県が一致
-                if not cities:
-                    # 市区町村の指定がない場合は都道府県のみでマッチ
-                    location_match = True
-                elif city and city in cities:
-                    # 市区町村も一致
-                    location_match = True
-            elif not prefecture and address:
-                # 都道府県が取得できていない場合は住所全体で検索
-                for pref in prefectures:
-                    if pref in address:
-                        if not cities:
-                            # 市区町村の指定がない場合は都道府県のみでマッチ
-                            location_match = True
-                            break
-                        else:
-                            # 市区町村も検索
-                            for c in cities:
-                                if c in address:
-                                    location_match = True
-                                    break
-                            if location_match:
-                                break
-        elif cities:
-            # 都道府県の指定がなく、市区町村のみ指定
-            if city and city in cities:
-                location_match = True
-            elif not city and address:
-                # 市区町村が取得できていない場合は住所全体で検索
-                for c in cities:
-                    if c in address:
-                        location_match = True
-                        break
-        
-        return location_match
+        # 住所のマッチング（都道府県と市区町村、設定されていない場合は住所から求める）
+        return self.gazetteer.matches(company, prefectures, cities)
+    
+    async def fetch_search_results(self, session: aiohttp.ClientSession, url: str,
+                                   budget: Optional[CrawlBudget] = None,
+                                   stats: Optional[CrawlStats] = None) -> Optional[str]:
+        """
+        検索結果ページを取得する（予算不足で取得しなかった場合は None）
+        """
+        return await self._fetch_html(session, url, budget, "search results", stats, self._source_name(url))
     
-    async def fetch_search_results(self, session: aiohttp.ClientSession, url: str) -> str:
+    def _source_name(self, url: str) -> str:
         """
-        検索結果ページを取得する
+        検索結果ページのURLから検索エンジン・電話帳サイトの名前を求める
         """
+        netloc = urlparse(url).netloc
+        for name, url_template in {**self.search_engines, **self.directory_sites}.items():
+            if urlparse(url_template).netloc == netloc:
+                return name
+        return "search"
+
+    
+    async def _fetch_html(self, session: aiohttp.ClientSession, url: str, budget: Optional[CrawlBudget],
+                          kind: str, stats: Optional[CrawlStats] = None, source: str = "company") -> Optional[str]:
+        """
+        予算を確認しながらページを取得する
+
+        予算不足で取得しなかった場合は None、取得に失敗した場合は空文字列を返す。
+        """
+        if budget is not None and not budget.acquire(url):
+            if stats is not None:
+                stats.record_skip()
+            return None
+        
+        timeout = self.timeout
+        max_content_length = None
+        if budget is not None:
+            if budget.remaining_seconds() is not None:
+                # ジョブの期限を超えて待たない
+                timeout = min(timeout, budget.remaining_seconds())
+            # 残りの予算を超えるサイズのページは本文を読まない
+            max_content_length = budget.remaining_bytes()
+        
+        started = time.perf_counter()
+        status = "error"
+        size = 0
         try:
-            async with session.get(url, timeout=self.timeout) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    logger.error(f"Error fetching search results: {response.status} - {url}")
-                    return ""
+            response = await self.transport.fetch(session, url, timeout, max_content_length)
+            status = str(response.status)
+            size = len(response.body) if response.body else 0
+            if response.status != 200:
+                logger.error(f"Error fetching {kind}: {response.status} - {url}")
+                return ""
+            if response.body is None:
+                logger.info(f"Skipping {kind} over the byte budget: {response.content_length} bytes - {url}")
+                return None
+            if budget is not None:
+                budget.record_bytes(len(response.body))
+            return response.text()
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.error(f"Timeout during {kind} request - {url}")
+            return ""
         except Exception as e:
-            logger.error(f"Exception during search request: {str(e)} - {url}")
+            logger.error(f"Exception during {kind} request: {str(e)} - {url}")
             return ""
+        finally:
+            if stats is not None:
+                stats.record_request(urlparse(url).netloc.lower(), source, status,
+                                     time.perf_counter() - started, size)
     
     def extract_company_urls(self, html_content: str) -> List[str]:
         """
@@ -386,52 +501,56 @@ class WebScraper:
         except:
             return False
     
-    async def fetch_company_info(self, session: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
-        """
-        企業ページから情報を抽出する
-        """
-        try:
-            async with session.get(url, timeout=self.timeout) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    return self.extract_company_data(html, url)
-                else:
-                    logger.error(f"Error fetching company page: {response.status} - {url}")
-                    return {}
-        except Exception as e:
-            logger.error(f"Exception during company page request: {str(e)} - {url}")
-            return {}
+    async def fetch_company_info(self, session: aiohttp.ClientSession, url: str,
+                                 budget: Optional[CrawlBudget] = None,
+                                 stats: Optional[CrawlStats] = None) -> Optional[CompanyRecord]:
+        """
+        企業ページから情報を抽出する（予算不足で取得しなかった場合は None）
+        """
+        html = await self._fetch_html(session, url, budget, "company page", stats)
+        if html is None:
+            return None
+        if not html:
+            return CompanyRecord()
+        if stats is None:
+            return self.extract_company_data(html, url)
+        
+        parse_started = time.perf_counter()
+        company_data = self.extract_company_data(html, url)
+        stats.record_parse("company", time.perf_counter() - parse_started)
+        stats.record_company(bool(company_data.get("name")))
+        return company_data
     
-    def extract_company_data(self, html_content: str, url: str) -> Dict[str, Any]:
+    def extract_company_data(self, html_content: str, url: str) -> CompanyRecord:
         """
         HTMLから企業情報を抽出する
         """
         if not html_content:
-            return {}
+            return CompanyRecord()
         
         try:
             soup = BeautifulSoup(html_content, "html.parser")
             
             # 基本情報を初期化
-            company_data = {
-                "name": "",
-                "address": "",
-                "phone": "",
-                "email": "",
-                "website": url,
-                "industry": "",
-                "prefecture": "",
-                "city": "",
-                "representative": "",
-                "established_year": None,
-                "capital": None,
-                "employees": None,
-                "annual_revenue": None,
-                "has_fax": False,
-                "has_contact_form": False,
-                "source_url": url,
-                "description": ""
-            }
+            company_data = CompanyRecord(
+                name="",
+                address="",
+                phone="",
+                email="",
+                website=url,
+                industry="",
+                prefecture="",
+                city="",
+                representative="",
+                established_year=None,
+                capital=None,
+                employees=None,
+                annual_revenue=None,
+                has_fax=False,
+                has_contact_form=False,
+                source_url=url,
+                description=""
+            )
             
             # タイトルから会社名を推測
             title = soup.title.text if soup.title else ""
@@ -470,45 +589,45 @@ class WebScraper:
                     if company_data["name"]:
                         break
             
-            # 電話番号を探す
-            phone_patterns = [
-                r"電話番号", r"TEL", r"Tel", r"tel", r"電話", r"お問い合わせ", r"連絡先"
-            ]
-            for pattern in phone_patterns:
-                elements = soup.find_all(text=lambda text: text and pattern in text)
-                for element in elements:
-                    parent = element.parent
-                    # 親要素とその周辺のテキストを確認
-                    surrounding_text = parent.get_text() if parent else ""
-                    phone = self.extract_phone_number(surrounding_text)
-                    if phone:
-                        company_data["phone"] = phone
-                        break
-                if company_data["phone"]:
-                    break
+            # ラベル（「電話番号」「所在地」など）の近くから各項目を探す
+            located = None
+            template = None
+            fingerprint = None
+            extractors = self._labeled_field_extractors()
+            if self.template_cache is not None:
+                fingerprint = self.template_cache.fingerprint(soup)
+                template = self.template_cache.lookup(url, fingerprint)
+                if template is not None:
+                    # 同じレイアウトのページは学習済みの位置から直接抽出する
+                    located = self.template_cache.apply(soup, template, extractors)
+                    if located is None:
+                        self.template_cache.invalidate(template, url)
+                    else:
+                        # 位置を学習していない項目はこのページで探し、見つかった場合はその位置も学習し直す
+                        # （指紋のみのキーで見つけたテンプレートは、このドメインで見つからなかった項目も学習する）
+                        missing = self.template_cache.fields_to_search(template, list(extractors))
+                        found = self._locate_labeled_fields(soup, missing, extractors) if missing else {}
+                        located.update(found)
+                        if found or (missing and template.key[0] == "*"):
+                            self.template_cache.learn(url, fingerprint, located, list(extractors))
+            
+            if located is None:
+                located = self._locate_labeled_fields(soup, list(self.labeled_field_patterns), extractors)
+                
+                # 抽出に成功したページのレイアウトを学習する
+                if self.template_cache is not None and company_data["name"] and located:
+                    self.template_cache.learn(url, fingerprint, located, list(extractors))
             
-            # 住所を探す
-            address_patterns = [
-                r"住所", r"所在地", r"本社", r"支社", r"オフィス", r"事務所"
-            ]
-            for pattern in address_patterns:
-                elements = soup.find_all(text=lambda text: text and pattern in text)
-                for element in elements:
-                    parent = element.parent
-                    # 親要素とその周辺のテキストを確認
-                    surrounding_text = parent.get_text() if parent else ""
-                    address = self.extract_address(surrounding_text)
-                    if address:
-                        company_data["address"] = address
-                        # 住所から都道府県と市区町村を抽出
-                        prefecture, city = self.extract_prefecture_city(address)
-                        if prefecture:
-                            company_data["prefecture"] = prefecture
-                        if city:
-                            company_data["city"] = city
-                        break
-                if company_data["address"]:
-                    break
+            for field, (value, _) in located.items():
+                company_data[field] = value
+            
+            # 住所から都道府県と市区町村を抽出
+            if company_data["address"]:
+                prefecture, city = self.extract_prefecture_city(company_data["address"])
+                if prefecture:
+                    company_data["prefecture"] = prefecture
+                if city:
+                    company_data["city"] = city
             
             # メールアドレスを探す
             email_elements = soup.select("a[href^='mailto:']")
@@ -516,91 +635,6 @@ class WebScraper:
                 email = email_elements[0]["href"].replace("mailto:", "")
                 company_data["email"] = email
             
-            # 代表者名を探す
-            representative_patterns = [
-                r"代表", r"社長", r"CEO", r"代表取締役"
-            ]
-            for pattern in representative_patterns:
-                elements = soup.find_all(text=lambda text: text and pattern in text)
-                for element in elements:
-                    parent = element.parent
-                    # 親要素とその周辺のテキストを確認
-                    surrounding_text = parent.get_text() if parent else ""
-                    representative = self.extract_representative(surrounding_text)
-                    if representative:
-                        company_data["representative"] = representative
-                        break
-                if company_data["representative"]:
-                    break
-            
-            # 設立年を探す
-            established_patterns = [
-                r"設立", r"創業", r"創立"
-            ]
-            for pattern in established_patterns:
-                elements = soup.find_all(text=lambda text: text and pattern in text)
-                for element in elements:
-                    parent = element.parent
-                    # 親要素とその周辺のテキストを確認
-                    surrounding_text = parent.get_text() if parent else ""
-                    year = self.extract_year(surrounding_text)
-                    if year:
-                        company_data["established_year"] = year
-                        break
-                if company_data["established_year"]:
-                    break
-            
-            # 資本金を探す
-            capital_patterns = [
-                r"資本金"
-            ]
-            for pattern in capital_patterns:
-                elements = soup.find_all(text=lambda text: text and pattern in text)
-                for element in elements:
-                    parent = element.parent
-                    # 親要素とその周辺のテキストを確認
-                    surrounding_text = parent.get_text() if parent else ""
-                    capital = self.extract_capital(surrounding_text)
-                    if capital:
-                        company_data["capital"] = capital
-                        break
-                if company_data["capital"]:
-                    break
-            
-            # 従業員数を探す
-            employees_patterns = [
-                r"従業員", r"社員", r"人数", r"スタッフ"
-            ]
-            for pattern in employees_patterns:
-                elements = soup.find_all(text=lambda text: text and pattern in text)
-                for element in elements:
-                    parent = element.parent
-                    # 親要素とその周辺のテキストを確認
-                    surrounding_text = parent.get_text() if parent else ""
-                    employees = self.extract_employees(surrounding_text)
-                    if employees:
-                        company_data["employees"] = employees
-                        break
-                if company_data["employees"]:
-                    break
-            
-            # 業種を探す
-            industry_patterns = [
-                r"業種", r"事業内容", r"業界"
-            ]
-            for pattern in industry_patterns:
-                elements = soup.find_all(text=lambda text: text and pattern in text)
-                for element in elements:
-                    parent = element.parent
-                    # 親要素とその周辺のテキストを確認
-                    surrounding_text = parent.get_text() if parent else ""
-                    industry = self.extract_industry(surrounding_text)
-                    if industry:
-                        company_data["industry"] = industry
-                        break
-                if company_data["industry"]:
-                    break
-            
             # FAXの有無を確認
             fax_patterns = [r"FAX", r"Fax", r"fax", r"ファックス"]
             company_data["has_fax"] = any(pattern in html_content for pattern in fax_patterns)
@@ -614,25 +648,56 @@ class WebScraper:
         
         except Exception as e:
             logger.error(f"Error extracting company data: {str(e)} - {url}")
-            return {}
+            return CompanyRecord()
+    
+    def _labeled_field_extractors(self) -> Dict[str, Callable[[str], Any]]:
+        """
+        ラベルの周辺テキストから各項目の値を取り出す関数
+        """
+        return {
+            "phone": self.extract_phone_number,
+            "address": self.extract_address,
+            "representative": self.extract_representative,
+            "established_year": self.extract_year,
+            "capital": self.extract_capital,
+            "employees": self.extract_employees,
+            "industry": self.extract_industry,
+        }
+    
+    def _locate_labeled_fields(self, soup: BeautifulSoup, fields: List[str],
+                               extractors: Dict[str, Callable[[str], Any]]) -> Dict[str, Tuple[Any, Tag]]:
+        """
+        ラベルの近くから fields の各項目を探し、見つかった項目の値と要素を返す
+        """
+        located = {}
+        for field in fields:
+            value, element = self._find_labeled_value(soup, self.labeled_field_patterns[field], extractors[field])
+            if value:
+                located[field] = (value, element)
+        return located
+
+    def _find_labeled_value(self, soup: BeautifulSoup, patterns: List[str],
+                            extractor: Callable[[str], Any]) -> Tuple[Any, Optional[Tag]]:
+        """
+        ラベルを含むテキストの親要素から値を抽出し、値とその要素を返す
+        """
+        for pattern in patterns:
+            elements = soup.find_all(text=lambda text: text and pattern in text)
+            for element in elements:
+                parent = element.parent
+                # 親要素とその周辺のテキストを確認
+                surrounding_text = labeled_text(parent) if parent else ""
+                value = extractor(surrounding_text)
+                if value:
+                    return value, parent
+        return None, None
     
     def clean_company_name(self, text: str) -> str:
         """
         テキストから会社名を抽出・クリーニングする
         """
-        # 会社名の後ろについている可能性のある不要な文字列
-        suffixes = [
-            "株式会社", "有限会社", "合同会社", "公式サイト", "公式ホームページ", 
-            "オフィシャルサイト", "ホーム", "トップ", "- ", " | ", "｜"
-        ]
-        
-        # 不要な文字列を削除
-        name = text
-        for suffix in suffixes:
-            name = name.replace(suffix, "")
-        
-        # 前後の空白を削除
-        name = name.strip()
+        # 会社名の後ろについている可能性のある不要な文字列を削除
+        name = text_normalizer.strip_title_noise(text).strip()
         
         # 会社名が短すぎる場合は元のテキストを使用
         if len(name) < 2:
@@ -648,20 +713,11 @@ class WebScraper:
         """
         テキストから電話番号を抽出する
         """
-        # 電話番号のパターン
-        patterns = [
-            r"0\d{1,4}[-(]?\d{1,4}[-)]*\d{4}",  # 一般的な電話番号
-            r"0120[-(]?\d{3}[-)]*\d{3}",        # フリーダイヤル
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                # 最初にマッチした電話番号を返す
-                phone = matches[0]
-                # 区切り文字を統一
-                phone = re.sub(r"[^\d]", "-", phone)
-                return phone
+        for pattern in _PHONE_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                # 最初にマッチした電話番号を返す（全角の数字は半角にし、区切り文字を統一）
+                return re.sub(r"[^\d]", "-", text_normalizer.normalize_width(match.group()))
         
         return ""
     
@@ -669,27 +725,11 @@ class WebScraper:
         """
         テキストから住所を抽出する
         """
-        # 都道府県のリスト
-        prefectures = [
-            "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
-            "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
-            "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
-            "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
-            "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
-            "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
-            "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
-        ]
-        
         # 都道府県から始まる住所を探す
-        for prefecture in prefectures:
-            pattern = f"{prefecture}[^\n。、]{5,50}"
-            matches = re.findall(pattern, text)
-            if matches:
-                # 最初にマッチした住所を返す
-                address = matches[0]
-                # 不要な文字を削除
-                address = re.sub(r"[「」『』【】\(\)]", "", address)
-                return address
+        match = _PREFECTURE_ADDRESS_RE.search(text)
+        if match:
+            # 不要な文字を削除
+            return re.sub(r"[「」『』【】\(\)]", "", match.group())
         
         # 郵便番号から始まる住所を探す
         zip_pattern = r"〒?\d{3}[-－]?\d{4}[^\n。、]{5,50}"
@@ -705,35 +745,8 @@ class WebScraper:
         """
         住所から都道府県と市区町村を抽出する
         """
-        # 都道府県のリスト
-        prefectures = [
-            "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
-            "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
-            "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
-            "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
-            "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
-            "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
-            "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
-        ]
-        
-        prefecture = ""
-        city = ""
-        
-        # 都道府県を抽出
-        for pref in prefectures:
-            if pref in address:
-                prefecture = pref
-                # 都道府県の後の文字列を取得
-                after_pref = address[address.index(pref) + len(pref):]
-                
-                # 市区町村を抽出
-                city_match = re.search(r"([^\s]{2,6}[市区町村])", after_pref)
-                if city_match:
-                    city = city_match.group(1)
-                
-                break
-        
-        return prefecture, city
+        location = self.gazetteer.resolve(address)
+        return location.prefecture, location.city
     
     def extract_representative(self, text: str) -> str:
         """
@@ -0,0 +1,335 @@
+"""
+除外リスト（連絡しない企業・既存顧客の電話番号・ドメイン・メールアドレス）による企業データの除外
+
+除外リストの項目は「種類:正規化した値」の64ビットのハッシュとして、並べ替えたディスク上の配列に保存し、
+メモリ上のブルームフィルタで大部分の非該当を先に判定する。
+該当の可能性がある場合だけ配列を二分探索するため、1000万件のリストでも1件の判定は数マイクロ秒で済む。
+配列はメモリマップで読み込むため、リストの件数に比例するメモリを使うのはブルームフィルタだけになる。
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.entity_resolution import SHARED_DOMAINS, phone_key, email_key, registrable_domain
+from app.services.fuzzy_dedup import website_domain
+
+# 除外リストを保存するディレクトリ
+SUPPRESSION_DIR = os.getenv("RISMA_SUPPRESSION_DIR", "./suppression")
+# ブルームフィルタの偽陽性率（偽陽性は配列の二分探索で確かめるため、結果は変わらない）
+SUPPRESSION_ERROR_RATE = float(os.getenv("RISMA_SUPPRESSION_ERROR_RATE", "0.001"))
+# 除外リストのCSVを読み込む行数
+SUPPRESSION_CSV_CHUNK_SIZE = 100000
+
+def domain_entry(record: Dict[str, Any]) -> str:
+    """
+    website のドメイン（共用のホスティング・メールのドメインは除く）
+
+    名寄せの domain_key と異なり、website が取得元のページと同じドメインでも使う
+    （クローラーが取得した企業の公式サイトも、そのドメインで除外する）。
+    """
+    domain = registrable_domain(website_domain(record.get("website") or ""))
+    return "" if domain in SHARED_DOMAINS else domain
+
+
+# 除外の種類と、企業データから正規化した値を求める関数
+SUPPRESSION_KEYS = {
+    "phone": phone_key,
+    "domain": domain_entry,
+    "email": email_key,
+}
+
+# 除外リストのCSVの列名（DataProcessor.standardize_column_names で標準化した後の名前）と種類
+_COLUMN_KINDS = {"phone": "phone", "website": "domain", "domain": "domain", "ドメイン": "domain", "email": "email"}
+# 除外リストの名前（ファイル名に使う）
+_NAME_RE = re.compile(r'^[\w\-]{1,64}$')
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def key_hash(kind: str, value: str) -> int:
+    """
+    除外の種類と正規化した値の64ビットのハッシュ
+    """
+    digest = hashlib.blake2b(f"{kind}:{value}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def record_entries(record: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    企業データの (除外の種類, 正規化した値)（値が空の種類は除く）
+    """
+    entries = []
+    for kind, key_function in SUPPRESSION_KEYS.items():
+        value = key_function(record)
+        if value:
+            entries.append((kind, value))
+    return entries
+
+
+class BloomFilter:
+    """
+    64ビットのハッシュの集合のブルームフィルタ（ハッシュの上位・下位32ビットによるダブルハッシュ）
+    """
+    def __init__(self, bits: int, hashes: int, data: Optional[bytes] = None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = data if data is not None else bytes((bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = SUPPRESSION_ERROR_RATE) -> "BloomFilter":
+        capacity = max(capacity, 1)
+        bits = max(int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))), 8)
+        hashes = max(int(round(bits / capacity * math.log(2))), 1)
+        return cls(bits, hashes)
+
+    def _positions(self, hashes: np.ndarray) -> Iterator[np.ndarray]:
+        low = hashes & _MASK32
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        bits = np.uint64(self.bits)
+        for i in range(self.hashes):
+            yield (low + np.uint64(i) * high) % bits
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """
+        ハッシュの配列をまとめて追加する
+        """
+        array = np.frombuffer(self.data, dtype=np.uint8).copy()
+        for positions in self._positions(np.asarray(hashes, dtype=np.uint64)):
+            positions = np.unique(positions)
+            index = (positions >> np.uint64(3)).astype(np.int64)
+            values = np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8)
+            # 同じバイトに入るビットは reduceat でまとめる（positions は並べ替え済み）
+            starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+            array[index[starts]] |= np.bitwise_or.reduceat(values, starts)
+        self.data = array.tobytes()
+
+    def __contains__(self, value: int) -> bool:
+        low = value & 0xFFFFFFFF
+        high = (value >> 32) | 1
+        data, bits = self.data, self.bits
+        for i in range(self.hashes):
+            position = (low + i * high) % bits
+            if not data[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class SuppressionList:
+    """
+    1つの除外リスト（並べ替えたハッシュの配列とブルームフィルタ）
+    """
+    def __init__(self, hashes: np.ndarray, bloom: BloomFilter, name: str = "", counts: Optional[Dict[str, int]] = None):
+        self.hashes = hashes
+        self.bloom = bloom
+        self.name = name
+        self.counts = counts or {}
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, str]], name: str = "",
+              error_rate: float = SUPPRESSION_ERROR_RATE) -> "SuppressionList":
+        """
+        (除外の種類, 値) から除外リストを作る（値は種類ごとの規則で正規化する）
+        """
+        counts = {kind: 0 for kind in SUPPRESSION_KEYS}
+        chunks = []
+        chunk = []
+        for kind, value in entries:
+            value = normalize_entry(kind, value)
+            if not value:
+                continue
+            chunk.append(key_hash(kind, value))
+            counts[kind] += 1
+            if len(chunk) >= SUPPRESSION_CSV_CHUNK_SIZE:
+                chunks.append(np.array(chunk, dtype=np.uint64))
+                chunk = []
+        chunks.append(np.array(chunk, dtype=np.uint64))
+        hashes = np.unique(np.concatenate(chunks))
+        bloom = BloomFilter.for_capacity(len(hashes), error_rate)
+        bloom.add_hashes(hashes)
+        return cls(hashes, bloom, name, counts)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def contains(self, kind: str, value: str) -> bool:
+        """
+        正規化した値が除外リストにあるか
+        """
+        key = key_hash(kind, value)
+        if key not in self.bloom:
+            return False
+        index = int(np.searchsorted(self.hashes, np.uint64(key)))
+        return index < len(self.hashes) and int(self.hashes[index]) == key
+
+    def is_suppressed(self, record: Dict[str, Any]) -> bool:
+        """
+        企業データの電話番号・ドメイン・メールアドレスのいずれかが除外リストにあるか
+        """
+        return any(self.contains(kind, value) for kind, value in record_entries(record))
+
+    def is_suppressed_url(self, url: str) -> bool:
+        """
+        URLのドメインが除外リストにあるか（企業ページを取得する前の判定用）
+        """
+        domain = domain_entry({"website": url})
+        return bool(domain) and self.contains("domain", domain)
+
+    def info(self) -> Dict[str, Any]:
+        return {"name": self.name, "entries": len(self), "counts": self.counts}
+
+
+class SuppressionSet:
+    """
+    複数の除外リストのいずれかにあるものを除外する
+    """
+    def __init__(self, lists: Iterable[SuppressionList]):
+        self.lists = list(lists)
+
+    def __bool__(self) -> bool:
+        return bool(self.lists)
+
+    def contains(self, kind: str, value: str) -> bool:
+        return any(suppression.contains(kind, value) for suppression in self.lists)
+
+    def is_suppressed(self, record: Dict[str, Any]) -> bool:
+        entries = record_entries(record)
+        return any(suppression.contains(kind, value) for suppression in self.lists for kind, value in entries)
+
+    def is_suppressed_url(self, url: str) -> bool:
+        domain = domain_entry({"website": url})
+        return bool(domain) and self.contains("domain", domain)
+
+
+def normalize_entry(kind: str, value: Any) -> str:
+    """
+    除外リストの値を企業データと同じ規則で正規化する
+    """
+    if kind not in SUPPRESSION_KEYS:
+        raise ValueError(f"Unknown suppression kind: {kind}")
+    if not isinstance(value, str) or not value.strip():
+        return ""
+    field = "website" if kind == "domain" else kind
+    return SUPPRESSION_KEYS[kind]({field: value.strip()})
+
+
+def csv_entries(file_path: str, processor=None) -> Iterator[Tuple[str, str]]:
+    """
+    除外リストのCSV（電話番号・ドメインまたはURL・メールアドレスの列）の項目を順に返す
+    """
+    from app.services.data_processor import DataProcessor, read_csv_chunks
+    processor = processor or DataProcessor()
+    columns = None
+    for chunk in read_csv_chunks(file_path, SUPPRESSION_CSV_CHUNK_SIZE, dtype=str, keep_default_na=False):
+        if columns is None:
+            renamed = processor.standardize_column_names(chunk.columns)
+            columns = [
+                (column, _COLUMN_KINDS.get(column.lower()) or _COLUMN_KINDS.get(renamed.get(column, "")))
+                for column in chunk.columns
+            ]
+            columns = [(column, kind) for column, kind in columns if kind]
+            if not columns:
+                raise ValueError("Suppression CSV has no phone, domain or email column")
+        for column, kind in columns:
+            for value in chunk[column]:
+                yield kind, value
+
+
+class SuppressionStore:
+    """
+    名前ごとの除外リストをディレクトリに保存・読み込みするクラス
+
+    ファイルは <name>.keys.npy（ハッシュの配列）・<name>.bloom.bin（ブルームフィルタ）・<name>.json（件数など）。
+    読み込んだ除外リストはファイルが更新されるまで使い回す。
+    """
+    def __init__(self, directory: str = SUPPRESSION_DIR):
+        self.directory = directory
+        self._loaded: Dict[str, Tuple[float, SuppressionList]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str, suffix: str) -> str:
+        if not _NAME_RE.match(name):
+            raise ValueError(f"Invalid suppression list name: {name}")
+        return os.path.join(self.directory, f"{name}{suffix}")
+
+    def save(self, name: str, suppression: SuppressionList) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        keys_path, bloom_path, meta_path = (self._path(name, suffix) for suffix in (".keys.npy", ".bloom.bin", ".json"))
+        # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える（メタデータは最後）
+        np.save(keys_path + ".tmp.npy", suppression.hashes)
+        os.replace(keys_path + ".tmp.npy", keys_path)
+        with open(bloom_path + ".tmp", "wb") as file:
+            file.write(suppression.bloom.data)
+        os.replace(bloom_path + ".tmp", bloom_path)
+        meta = {"entries": len(suppression), "counts": suppression.counts,
+                "bits": suppression.bloom.bits, "hashes": suppression.bloom.hashes}
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def import_csv(self, name: str, file_path: str, error_rate: float = SUPPRESSION_ERROR_RATE) -> SuppressionList:
+        """
+        CSVファイルから除外リストを作って保存する（同じ名前の除外リストは置き換える）
+        """
+        suppression = SuppressionList.build(csv_entries(file_path), name, error_rate)
+        self.save(name, suppression)
+        return suppression
+
+    def load(self, name: str) -> SuppressionList:
+        meta_path = self._path(name, ".json")
+        try:
+            modified = os.path.getmtime(meta_path)
+        except OSError:
+            raise KeyError(name) from None
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached is not None and cached[0] == modified:
+                return cached[1]
+            with open(meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(self._path(name, ".bloom.bin"), "rb") as file:
+                bloom = BloomFilter(meta["bits"], meta["hashes"], file.read())
+            hashes = np.load(self._path(name, ".keys.npy"), mmap_mode="r")
+            suppression = SuppressionList(hashes, bloom, name, meta.get("counts"))
+            self._loaded[name] = (modified, suppression)
+            return suppression
+
+    def load_many(self, names: Optional[Iterable[str]]) -> Optional[SuppressionSet]:
+        """
+        名前を指定した除外リストをまとめる（指定がない場合は None）
+        """
+        names = list(names or [])
+        if not names:
+            return None
+        return SuppressionSet(self.load(name) for name in names)
+
+    def delete(self, name: str) -> None:
+        for suffix in (".json", ".keys.npy", ".bloom.bin"):
+            path = self._path(name, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+        with self._lock:
+            self._loaded.pop(name, None)
+
+    def names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(filename[:-5] for filename in os.listdir(self.directory) if filename.endswith(".json"))
+
+
+_default_store: Optional[SuppressionStore] = None
+
+
+def get_suppression_store() -> SuppressionStore:
+    """
+    プロセス全体で共有する除外リストの保存先
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = SuppressionStore()
+    return _default_store
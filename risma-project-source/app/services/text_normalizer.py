@@ -0,0 +1,206 @@
+"""
+会社名・電話番号・住所などの文字列の正規化（WebScraper と DataProcessor で共通）
+
+変換テーブルと正規表現はモジュールの読み込み時に一度だけ作成する。
+"""
+import re
+import unicodedata
+from typing import Dict, Optional
+
+# 法人格の正式名称と略称
+LEGAL_FORMS = {
+    '株式会社': '(株)',
+    '有限会社': '(有)',
+    '合同会社': '(同)',
+    '一般社団法人': '(一社)',
+    '公益社団法人': '(公社)',
+    '一般財団法人': '(一財)',
+    '公益財団法人': '(公財)',
+    '社会福祉法人': '(福)',
+    '医療法人': '(医)',
+    '学校法人': '(学)',
+    '宗教法人': '(宗)',
+    '特定非営利活動法人': 'NPO法人',
+}
+
+# 都道府県の略称と正式名称
+PREFECTURES = {
+    '北海道': '北海道', '青森': '青森県', '岩手': '岩手県', '宮城': '宮城県',
+    '秋田': '秋田県', '山形': '山形県', '福島': '福島県', '茨城': '茨城県',
+    '栃木': '栃木県', '群馬': '群馬県', '埼玉': '埼玉県', '千葉': '千葉県',
+    '東京': '東京都', '神奈川': '神奈川県', '新潟': '新潟県', '富山': '富山県',
+    '石川': '石川県', '福井': '福井県', '山梨': '山梨県', '長野': '長野県',
+    '岐阜': '岐阜県', '静岡': '静岡県', '愛知': '愛知県', '三重': '三重県',
+    '滋賀': '滋賀県', '京都': '京都府', '大阪': '大阪府', '兵庫': '兵庫県',
+    '奈良': '奈良県', '和歌山': '和歌山県', '鳥取': '鳥取県', '島根': '島根県',
+    '岡山': '岡山県', '広島': '広島県', '山口': '山口県', '徳島': '徳島県',
+    '香川': '香川県', '愛媛': '愛媛県', '高知': '高知県', '福岡': '福岡県',
+    '佐賀': '佐賀県', '長崎': '長崎県', '熊本': '熊本県', '大分': '大分県',
+    '宮崎': '宮崎県', '鹿児島': '鹿児島県', '沖縄': '沖縄県'
+}
+
+# ページタイトルから会社名を取り出す際に除く文字列
+TITLE_NOISE = [
+    "株式会社", "有限会社", "合同会社", "公式サイト", "公式ホームページ",
+    "オフィシャルサイト", "ホーム", "トップ", "- ", " | ", "｜"
+]
+
+# 4桁の局番で始まる10桁の番号（フリーダイヤル・ナビダイヤルなど）
+_FOUR_DIGIT_PREFIXES = ("0120", "0800", "0570")
+
+
+def _build_width_table() -> Dict[int, str]:
+    """
+    全角英数字・記号と全角スペースを半角に、半角カタカナを全角に変換するテーブル
+    """
+    table = {code: chr(code - 0xFEE0) for code in range(0xFF01, 0xFF5F)}
+    table[0x3000] = ' '
+    for code in range(0xFF61, 0xFF9E):
+        table[code] = unicodedata.normalize('NFKC', chr(code))
+    # 濁点・半濁点は単独の場合、結合文字ではなく全角の記号にする
+    table[0xFF9E] = '゛'
+    table[0xFF9F] = '゜'
+    return table
+
+
+def _build_phone_table() -> Dict[int, Optional[str]]:
+    """
+    全角を半角にしつつ、空白・ハイフン・カッコを取り除くテーブル（電話番号用）
+    """
+    table: Dict[int, Optional[str]] = dict(_build_width_table())
+    for code in range(0x3001):
+        if _WHITESPACE_RE.match(chr(code)):
+            table[code] = None
+    for char in "-()\u3000（）－":
+        table[ord(char)] = None
+    return table
+
+
+def _build_voiced_kana() -> Dict[str, str]:
+    """
+    半角カタカナと濁点・半濁点の組み合わせから、全角の濁音・半濁音への対応
+    """
+    voiced = {}
+    for base in "ｳｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾊﾋﾌﾍﾎ":
+        voiced[base + 'ﾞ'] = unicodedata.normalize('NFKC', base + 'ﾞ')
+    for base in "ﾊﾋﾌﾍﾎ":
+        voiced[base + 'ﾟ'] = unicodedata.normalize('NFKC', base + 'ﾟ')
+    return voiced
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_WIDTH_TABLE = _build_width_table()
+_PHONE_TABLE = _build_phone_table()
+_VOICED_KANA = _build_voiced_kana()
+_VOICED_KANA_RE = re.compile('|'.join(_VOICED_KANA))
+# 変換対象の文字（全角英数字・記号、全角スペース、半角カタカナ）の連続
+_CONVERTIBLE_RE = re.compile('[\uff01-\uff5e\u3000\uff61-\uff9f]+')
+
+# 長い名称を先に試し、1回の走査で置換する
+_LEGAL_FORM_RE = re.compile('|'.join(re.escape(name) for name in sorted(LEGAL_FORMS, key=len, reverse=True)))
+_TITLE_NOISE_RE = re.compile('|'.join(re.escape(noise) for noise in sorted(TITLE_NOISE, key=len, reverse=True)))
+
+# 先頭が略称で、正式名称になっていない都道府県（例: 「東京千代田区」）
+# 「京都市」「大阪市」のように同名の市で始まる場合は除く
+_PREFECTURE_PREFIX_RE = re.compile('^(?:' + '|'.join(
+    f"{re.escape(short_name)}(?!{re.escape(full_name[len(short_name):])}|市)"
+    for short_name, full_name in PREFECTURES.items() if short_name != full_name
+) + ')')
+
+_BANCHI_RE = re.compile(r'([0-9]+)番地?([0-9]+)')
+_FLOOR_RE = re.compile(r'([0-9]+階)([^\s])')
+_FLOOR_F_RE = re.compile(r'([0-9]+F)([^\s])')
+
+
+def normalize_width(text: str) -> str:
+    """
+    全角英数字・記号を半角に、半角カタカナを全角に変換する
+    """
+    if not text:
+        return ""
+    if 'ﾞ' in text or 'ﾟ' in text:
+        text = _VOICED_KANA_RE.sub(lambda m: _VOICED_KANA[m.group()], text)
+    # 変換対象の部分だけを変換する（文字列全体を translate するより速い）
+    return _CONVERTIBLE_RE.sub(_translate_match, text)
+
+
+def _translate_match(match: "re.Match") -> str:
+    return match.group().translate(_WIDTH_TABLE)
+
+
+def clean_whitespace(text: str) -> str:
+    """
+    連続する空白・タブ・改行を1つの空白にし、前後の空白を削除する
+    """
+    if not text:
+        return ""
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def normalize_name(name: str) -> str:
+    """
+    会社名を正規化する（法人格を略称に、全角英数字・記号を半角に）
+    """
+    if not name:
+        return ""
+    name = name.strip()
+    # 法人格はいずれも「会社」か「法人」を含む
+    if '会社' in name or '法人' in name:
+        name = _LEGAL_FORM_RE.sub(lambda m: LEGAL_FORMS[m.group()], name)
+    return normalize_width(name)
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    電話番号を正規化する（区切りを取り除き、桁数に応じてハイフンを入れ直す）
+    """
+    if not phone:
+        return ""
+    phone = phone.translate(_PHONE_TABLE)
+
+    if len(phone) == 10:
+        if phone.startswith(_FOUR_DIGIT_PREFIXES):
+            return f"{phone[:4]}-{phone[4:7]}-{phone[7:]}"
+        return f"{phone[:2]}-{phone[2:6]}-{phone[6:]}"  # 固定電話（市外局番2桁）
+    if len(phone) == 11 and phone.startswith("0"):  # 携帯電話または固定電話（市外局番3桁）
+        return f"{phone[:3]}-{phone[3:7]}-{phone[7:]}"
+    if len(phone) == 9:  # 固定電話（市外局番なし）
+        return f"{phone[:3]}-{phone[3:7]}-{phone[7:]}"
+    return phone
+
+
+def normalize_address(address: str) -> str:
+    """
+    住所を正規化する（都道府県の略称・番地・階数の表記）
+    """
+    if not address:
+        return ""
+    address = normalize_width(address.strip())
+    address = _PREFECTURE_PREFIX_RE.sub(lambda m: PREFECTURES[m.group()], address, count=1)
+
+    # 「1番地2」「1番2」を「1-2」に
+    if '番' in address:
+        address = _BANCHI_RE.sub(r'\1-\2', address)
+
+    # 建物名の前にスペースを追加
+    if '階' in address:
+        address = _FLOOR_RE.sub(r'\1 \2', address)
+    if 'F' in address:
+        address = _FLOOR_F_RE.sub(r'\1 \2', address)
+    return address
+
+
+def normalize_industry(industry: str) -> str:
+    """
+    業種名を正規化する
+    """
+    if not industry:
+        return ""
+    return normalize_width(industry.strip())
+
+
+def strip_title_noise(text: str) -> str:
+    """
+    ページタイトルから法人格やサイト名の定型句を取り除く
+    """
+    return _TITLE_NOISE_RE.sub('', text)
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import zipfile
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Callable
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+class FetchResponse:
+    """
+    取得したページ（ステータス・本文・文字コード）
+    """
+    def __init__(self, url: str, status: int, body: Optional[bytes], encoding: Optional[str] = None,
+                 content_length: Optional[int] = None):
+        self.url = url
+        self.status = status
+        # 本文を読み込まなかった場合（サイズ超過など）は None
+        self.body = body
+        self.encoding = encoding
+        self.content_length = content_length if content_length is not None else (len(body) if body is not None else None)
+
+    def text(self) -> str:
+        if not self.body:
+            return ""
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+class LiveTransport:
+    """
+    aiohttp で実際にリクエストを送るトランスポート
+    """
+    mode = "live"
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None):
+        self.headers = headers or {}
+
+    @asynccontextmanager
+    async def session(self):
+        async with aiohttp.ClientSession(headers=self.headers) as session:
+            yield session
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, timeout: float,
+                    max_content_length: Optional[int] = None) -> FetchResponse:
+        """
+        ページを取得する（宣言されたサイズが max_content_length を超える場合は本文を読まない）
+        """
+        async with session.get(url, timeout=timeout) as response:
+            if response.status != 200:
+                return FetchResponse(url, response.status, b"")
+            if max_content_length is not None and response.content_length is not None \
+                    and response.content_length > max_content_length:
+                return FetchResponse(url, response.status, None, content_length=response.content_length)
+            body = await response.read()
+            return FetchResponse(url, response.status, body, response.get_encoding())
+
+
+class FetchArchive:
+    """
+    リクエストとレスポンスの組を保存するZIPアーカイブ
+
+    本文はURLのハッシュ名のエントリに圧縮して格納し、ステータスなどのメタデータはエントリのコメントに持たせる。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[Dict[str, zipfile.ZipInfo]] = None
+        self._writer: Optional[zipfile.ZipFile] = None
+        self._reader: Optional[zipfile.ZipFile] = None
+
+    @staticmethod
+    def entry_name(url: str) -> str:
+        return "responses/" + hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _load_index(self) -> Dict[str, zipfile.ZipInfo]:
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self.path):
+                with zipfile.ZipFile(self.path) as archive:
+                    for info in archive.infolist():
+                        meta = json.loads(info.comment.decode("utf-8"))
+                        self._index[meta["url"]] = info
+        return self._index
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._load_index())
+
+    def add(self, response: FetchResponse) -> None:
+        """
+        レスポンスを追記する（同じURLが記録済みの場合は何もしない）
+        """
+        index = self._load_index()
+        if response.url in index or response.body is None:
+            return
+        if self._writer is None:
+            self._close_reader()
+            self._writer = zipfile.ZipFile(self.path, "a", compression=zipfile.ZIP_DEFLATED)
+        info = zipfile.ZipInfo(self.entry_name(response.url), date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.comment = json.dumps({
+            "url": response.url,
+            "status": response.status,
+            "encoding": response.encoding,
+        }).encode("utf-8")
+        self._writer.writestr(info, response.body)
+        index[response.url] = info
+
+    def get(self, url: str) -> Optional[FetchResponse]:
+        info = self._load_index().get(url)
+        if info is None:
+            return None
+        if self._writer is not None:
+            # 書き込み中の内容を読めるよう一度閉じる
+            self.close()
+        if self._reader is None:
+            self._reader = zipfile.ZipFile(self.path)
+        meta = json.loads(info.comment.decode("utf-8"))
+        return FetchResponse(url, meta["status"], self._reader.read(info.filename), meta.get("encoding"))
+
+    def _close_reader(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._close_reader()
+
+
+class RecordingTransport(LiveTransport):
+    """
+    実際に取得したレスポンスをアーカイブに記録するトランスポート
+    """
+    mode = "record"
+
+    def __init__(self, archive_path: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(headers)
+        self.archive = FetchArchive(archive_path)
+        self._sessions = 0
+
+    @asynccontextmanager
+    async def session(self):
+        self._sessions += 1
+        try:
+            async with super().session() as session:
+                yield session
+        finally:
+            self._sessions -= 1
+            if self._sessions == 0:
+                self.archive.close()
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, timeout: float,
+                    max_content_length: Optional[int] = None) -> FetchResponse:
+        response = await super().fetch(session, url, timeout, max_content_length)
+        self.archive.add(response)
+        return response
+
+
+class ReplayTransport:
+    """
+    アーカイブからレスポンスを返すトランスポート（ネットワークに接続しない）
+
+    latency・jitter（秒）で応答までの遅延を、latency_fn で任意の遅延分布を指定できる。
+    """
+    mode = "replay"
+
+    def __init__(self, archive_path: str, latency: float = 0.0, jitter: float = 0.0,
+                 latency_fn: Optional[Callable[[str], float]] = None, missing_status: int = 404):
+        self.archive = FetchArchive(archive_path)
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_fn = latency_fn
+        self.missing_status = missing_status
+
+    @asynccontextmanager
+    async def session(self):
+        yield None
+
+    def _delay(self, url: str) -> float:
+        if self.latency_fn is not None:
+            return self.latency_fn(url)
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    async def fetch(self, session: Any, url: str, timeout: float,
+                    max_content_length: Optional[int] = None) -> FetchResponse:
+        delay = self._delay(url)
+        if delay > timeout:
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        response = self.archive.get(url)
+        if response is None:
+            logger.info(f"Replay archive has no response for {url}")
+            return FetchResponse(url, self.missing_status, b"")
+        if max_content_length is not None and response.content_length > max_content_length:
+            return FetchResponse(url, response.status, None, content_length=response.content_length)
+        return response
+
+
+def transport_from_env(headers: Optional[Dict[str, str]] = None):
+    """
+    環境変数 RISMA_FETCH_MODE（live / record / replay）と RISMA_FETCH_ARCHIVE からトランスポートを作る
+    """
+    mode = os.getenv("RISMA_FETCH_MODE", "live")
+    archive_path = os.getenv("RISMA_FETCH_ARCHIVE", "fetch_archive.zip")
+    if mode == "record":
+        return RecordingTransport(archive_path, headers)
+    if mode == "replay":
+        return ReplayTransport(archive_path, latency=float(os.getenv("RISMA_REPLAY_LATENCY", "0")))
+    return LiveTransport(headers)
@@ -2,88 +2,88 @@ import pytest
 import time
 import asyncio
 import aiohttp
+from aiohttp import web
 import pandas as pd
 import numpy as np
 from app.services.scraper import WebScraper
 from app.services.data_processor import DataProcessor
+from app.services.transport import FetchArchive, FetchResponse, ReplayTransport
+from app.benchmarks.synthetic_web import SyntheticWeb, SyntheticWebConfig
+from app.benchmarks.crawl_benchmark import CrawlBenchmark
+from app.benchmarks.extraction_benchmark import ExtractionBenchmark, baseline_path, compare
+from app.benchmarks import data_processor_benchmark
+from app.benchmarks.data_processor_benchmark import DataProcessorBenchmark
+from app.benchmarks.data_processor_benchmark import baseline_path as data_processor_baseline_path
+from app.benchmarks.data_processor_benchmark import compare as compare_data_processor
+import json
+from urllib.parse import quote_plus
 from concurrent.futures import ThreadPoolExecutor
 import psutil
 import os
 
-# パフォーマンステスト用の設定
-@pytest.fixture
-def large_dataset():
-    # 大量のテストデータを生成
-    companies = []
-    for i in range(10000):
-        companies.append({
-            'company_name': f'株式会社テスト{i}',
-            'address': f'東京都千代田区{i % 100}丁目',
-            'tel': f'03-{i % 10000:04d}-{i % 10000:04d}',
-            'url': f'https://example{i}.com',
-            'industry': '情報通信' if i % 3 == 0 else '製造業' if i % 3 == 1 else 'サービス業'
-        })
-    return pd.DataFrame(companies)
+# 処理時間・メモリを基準値と比較するテストは RISMA_RUN_BENCHMARKS=1 の場合のみ実行する
+# （計測環境の負荷で結果が揺らぐため、通常のテストでは期待値などの確認のみ行う）
+RUN_BENCHMARKS = os.getenv("RISMA_RUN_BENCHMARKS", "").lower() in ("1", "true", "yes")
+benchmark_only = pytest.mark.skipif(not RUN_BENCHMARKS, reason="RISMA_RUN_BENCHMARKS が設定されていません")
+
+# テスト: データ処理のベンチマークの計測対象
+def test_data_processor_benchmark_coverage(monkeypatch):
+    # 公開メソッドがすべて計測対象になっていること
+    benchmark = DataProcessorBenchmark(sizes=[100], iterations=1, memory=False)
+    assert benchmark.uncovered_methods() == []
+    
+    # 少ない件数で、すべての計測対象が動くこと（短い処理を繰り返して計測しない）
+    monkeypatch.setattr(data_processor_benchmark, "MIN_SAMPLE_SECONDS", 0)
+    report = benchmark.run()
+    assert all(metric["100"]["rows_per_sec"] > 0 for metric in report["metrics"].values())
 
 # テスト: データ処理の性能
-def test_data_processor_performance(large_dataset):
-    processor = DataProcessor()
-    
-    # 処理時間の計測
-    start_time = time.time()
-    
-    # 重複削除の性能テスト
-    result = processor.remove_duplicates(large_dataset)
-    
-    # 電話番号の正規化の性能テスト
-    result = processor.normalize_phone_numbers(large_dataset)
-    
-    # 住所の正規化の性能テスト
-    result = processor.normalize_addresses(large_dataset)
-    
-    # 業種フィルタリングの性能テスト
-    result = processor.filter_by_industry(large_dataset, ['情報通信'])
-    
-    end_time = time.time()
-    execution_time = end_time - start_time
-    
-    # 10,000件のデータを10秒以内に処理できることを確認
-    assert execution_time < 10, f"データ処理に{execution_time}秒かかりました。10秒以内に処理できる必要があります。"
-    
-    # メモリ使用量の確認
-    process = psutil.Process(os.getpid())
-    memory_usage = process.memory_info().rss / 1024 / 1024  # MB単位
-    
-    # メモリ使用量が1GB以下であることを確認
-    assert memory_usage < 1024, f"メモリ使用量が{memory_usage}MBです。1GB以下である必要があります。"
+@benchmark_only
+def test_data_processor_performance():
+    # DataProcessor の公開メソッドごとに、生成した10,000件の企業データ（表記ゆれ・重複を含む）を処理する速度を計測する
+    benchmark = DataProcessorBenchmark(sizes=[10000], iterations=1, memory=False)
+    
+    report = benchmark.run()
+    with open(data_processor_baseline_path(), encoding="utf-8") as f:
+        baseline = json.load(f)
+    
+    # 計測環境の揺らぎを考慮し、基準値の2倍を超える劣化のみを検出する
+    assert compare_data_processor(report, baseline, tolerance=1.0) == []
+    assert all(metric["10000"]["rows_per_sec"] > 0 for metric in report["metrics"].values())
+    
+    # 主な処理のピークメモリも基準値の2倍以内であること
+    memory_report = DataProcessorBenchmark(
+        sizes=[10000], iterations=1, methods=["normalize_company_data_batch", "deduplicate", "process_csv_file"]
+    ).run()
+    assert all(metric["10000"]["peak_bytes"] > 0 for metric in memory_report["metrics"].values())
+    assert compare_data_processor(memory_report, baseline, tolerance=1.0) == []
 
 # テスト: 並列スクレイピングの性能
 @pytest.mark.asyncio
-async def test_parallel_scraping_performance():
-    # 並列スクレイピングのシミュレーション
-    scraper = WebScraper()
-    
-    # 同時に処理するURL数
+async def test_parallel_scraping_performance(tmp_path):
+    # 記録済みのアーカイブからWebScraperの処理全体を再生する
     num_urls = 50
-    urls = [f"https://example.com/{i}" for i in range(num_urls)]
+    company_urls = [f"https://example{i}.co.jp/" for i in range(num_urls)]
+    search_url = "https://search.example.com/?q=" + quote_plus("テスト 会社 企業 電話番号")
+    
+    archive = FetchArchive(str(tmp_path / "archive.zip"))
+    serp = "".join(f'<a href="{url}">{url}</a>' for url in company_urls)
+    archive.add(FetchResponse(search_url, 200, serp.encode("utf-8"), "utf-8"))
+    for i, url in enumerate(company_urls):
+        html = f"<html><head><title>株式会社テスト{i}</title></head><body><p>電話番号：03-1234-{i:04d}</p></body></html>"
+        archive.add(FetchResponse(url, 200, html.encode("utf-8"), "utf-8"))
+    archive.close()
+    
+    # ネットワークレイテンシのシミュレーション
+    transport = ReplayTransport(str(tmp_path / "archive.zip"), latency=0.1, jitter=0.05)
+    scraper = WebScraper(max_concurrent_requests=10, delay_between_requests=0, transport=transport)
+    scraper.search_engines = {"engine": "https://search.example.com/?q={query}"}
+    scraper.directory_sites = {}
     
     # 処理時間の計測
     start_time = time.time()
     
-    # 非同期処理のシミュレーション
-    async def fetch_mock(url):
-        await asyncio.sleep(0.1)  # ネットワークレイテンシのシミュレーション
-        return f"<html><body><h1>Company {url.split('/')[-1]}</h1></body></html>"
-    
-    async def process_url(url):
-        html = await fetch_mock(url)
-        # HTMLの解析処理をシミュレーション
-        await asyncio.sleep(0.05)
-        return {'url': url, 'company_name': f"Company {url.split('/')[-1]}"}
-    
-    # 並列処理の実行
-    tasks = [process_url(url) for url in urls]
-    results = await asyncio.gather(*tasks)
+    results = await scraper.search_by_keyword(["テスト"], max_results=num_urls)
     
     end_time = time.time()
     execution_time = end_time - start_time
@@ -91,6 +91,49 @@ async def test_parallel_scraping_performance():
     # 50件のURLを10秒以内に処理できることを確認
     assert execution_time < 10, f"並列スクレイピングに{execution_time}秒かかりました。10秒以内に処理できる必要があります。"
     assert len(results) == num_urls
+    assert all(result["phone"] for result in results)
+
+# テスト: 合成Webに対するクロールのスケーリング計測
+@pytest.mark.asyncio
+async def test_crawl_scaling_benchmark():
+    # 合成Webを同じイベントループ上で起動し、小さな規模でジョブの実行から保存までを計測する
+    config = SyntheticWebConfig(companies=500, results_per_page=10, latency_ms=5, error_rate=0.0, page_size=2000)
+    runner = web.AppRunner(SyntheticWeb(config).make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    
+    try:
+        benchmark = CrawlBenchmark(f"http://127.0.0.1:{port}", mode="pipeline", jobs=2, max_results=10)
+        result = await benchmark.run(concurrency=5)
+    finally:
+        await runner.cleanup()
+    
+    # キーワード検索ジョブの結果がすべて保存され、計測値が揃っていること
+    assert result["companies"] >= 10
+    assert result["requests"] > result["companies"]
+    assert result["companies_per_sec"] > 0
+    assert result["job_latency_p50"] <= result["job_latency_p99"]
+    assert result["peak_rss_mb"] > 0
+
+# テスト: 抽出処理のコーパスの期待値
+def test_extraction_expected():
+    # コーパスの期待値どおりに抽出できること
+    assert ExtractionBenchmark(iterations=1).check_expected() == []
+
+# テスト: 抽出処理のマイクロベンチマーク
+@benchmark_only
+def test_extraction_benchmark():
+    benchmark = ExtractionBenchmark(iterations=2)
+    
+    report = benchmark.run()
+    with open(baseline_path(), encoding="utf-8") as f:
+        baseline = json.load(f)
+    
+    # 計測環境の揺らぎを考慮し、基準値の2倍を超える劣化のみを検出する
+    assert compare(report, baseline, tolerance=1.0) == []
+    assert report["pages_per_sec"] > 0
 
 # テスト: 大量リクエスト時のAPI性能
 def test_api_load_performance():
@@ -1,8 +1,38 @@
 import pytest
+import asyncio
+from urllib.parse import quote_plus
 from app.services.scraper import WebScraper
-from app.services.data_processor import DataProcessor
+from app.services.data_processor import DataProcessor, detect_encoding
+from app.services import data_processor as data_processor_module
+from app.services.checkpoint import CrawlCheckpoint
+from app.services.budget import CrawlBudget
+from app.services.fetch_broker import FetchBroker
+from app.services.transport import FetchArchive, FetchResponse, ReplayTransport
+from app.services.crawl_stats import CrawlStats, Histogram
+from app.services import text_normalizer
+from app.services.gazetteer import Gazetteer
+from app.services.memo import Memo
+from app.services.industry_index import IndustryIndex, KeywordAutomaton
+from app.services.parallel_normalizer import ParallelNormalizer
+from app.services.fuzzy_dedup import FuzzyDeduplicator, name_key
+from app.services.entity_resolution import ENTITY_KEYS, EntityResolver, canonical_address, domain_key, registrable_domain
+from app.services.disjoint_set import DisjointSet
+from app.services.company_record import CompanyRecord, as_dicts
+from app.services.list_dedup import ListDedupIndex
+from app.services.company_writer import CompanyWriter, company_row
+from app.services import pipeline
+from app.services.processing_profile import ProcessingProfile
+from app.services.suppression import SuppressionList, SuppressionStore, SuppressionSet, BloomFilter, csv_entries
+from app.db.database import Base
+from app.api import search
+from app.models import models
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 import pandas as pd
 import numpy as np
+import json
+import datetime
+from bs4 import BeautifulSoup
 
 # WebScraperのテスト
 class TestWebScraper:
@@ -49,6 +79,19 @@ class TestWebScraper:
         
         for input_name, expected_output in test_cases:
             assert self.scraper.normalize_company_name(input_name) == expected_output
+    
+    def test_extract_phone_number(self):
+        # 電話番号抽出のテスト（全角の数字・区切り文字を含む）
+        test_cases = [
+            ("TEL：03-1234-5678", "03-1234-5678"),
+            ("電話 03(1234)5678", "03-1234-5678"),
+            ("TEL：０６（６３４５）１２３４", "06-6345-1234"),
+            ("フリーダイヤル ０１２０－１２３－４５６", "0120-123-456"),
+            ("電話番号は非公開です", ""),
+        ]
+        
+        for text, expected in test_cases:
+            assert self.scraper.extract_phone_number(text) == expected
 
 # DataProcessorのテスト
 class TestDataProcessor:
@@ -116,5 +159,1238 @@ class TestDataProcessor:
         assert len(result) == 2
         assert all('東京都' in address for address in result['address'])
 
+# 企業データの一括正規化のテスト
+class TestNormalizeBatch:
+    def setup_method(self):
+        self.processor = DataProcessor()
+    
+    def test_batch_matches_per_row(self):
+        records = [
+            {"name": " 株式会社ＡＢＣ ", "phone": "０３（１２３４）５６７８", "address": "東京千代田区丸の内１－１"},
+            {"name": "テスト有限会社", "phone": "0901234567", "address": "京都市下京区1番地2 5階ビル", "industry": " ＩＴ "},
+            {"name": "サンプル(株)", "phone": None, "address": "大阪府大阪市北区", "prefecture": "東京都", "industry": "製造業"},
+            {"name": "", "phone": "03-1234-5678"},
+            {"name": "一般社団法人　日本\n協会", "phone": "123456789", "industry": "", "employees": 10},
+            {"name": "株式会社テスト", "address": None, "industry_code": "233", "industry": "IT・情報通信"},
+        ]
+        
+        expected = self.processor.normalize_company_data(records)
+        result = self.processor.normalize_company_data_batch(records)
+        
+        assert result == expected
+        assert [list(row) for row in result] == [list(row) for row in expected]
+    
+    def test_batch_dataframe_and_fallback(self):
+        df = pd.DataFrame({
+            "name": ["株式会社テスト", "合同会社サンプル", None],
+            "phone": ["0312345678", np.nan, "0312345678"],
+            "address": ["神奈川横浜市中区", "北海道札幌市中央区", "東京都"],
+        })
+        
+        result = self.processor.normalize_company_data_batch(df)
+        
+        assert list(result["name"]) == ["(株)テスト", "(同)サンプル"]
+        assert result["phone"].iloc[0] == "03-1234-5678" and pd.isna(result["phone"].iloc[1])
+        assert list(result["prefecture"]) == ["神奈川県", "北海道"]
+        # 文字列以外の値がある場合はレコードごとの処理と同じ結果になる
+        records = [{"name": "株式会社テスト", "phone": 312345678}]
+        with pytest.raises(AttributeError):
+            self.processor.normalize_company_data(records)
+        with pytest.raises(AttributeError):
+            self.processor.normalize_company_data_batch(records)
+
+# 文字列の正規化のテスト
+class TestTextNormalizer:
+    def test_normalize_width(self):
+        assert text_normalizer.normalize_width("ＡＢＣ１２３（東京）　ｶﾞｲﾄﾞﾌﾞｯｸ") == "ABC123(東京) ガイドブック"
+        assert text_normalizer.normalize_width("株式会社テスト") == "株式会社テスト"
+    
+    def test_normalize_fields(self):
+        assert text_normalizer.normalize_name(" 株式会社ＡＢＣ（東京） ") == "(株)ABC(東京)"
+        assert text_normalizer.normalize_name("特定非営利活動法人みらい") == "NPO法人みらい"
+        assert text_normalizer.normalize_phone("０３（１２３４）５６７８") == "03-1234-5678"
+        assert text_normalizer.normalize_phone("0120-123-456") == "0120-123-456"
+        assert text_normalizer.normalize_phone("090 1234 5678") == "090-1234-5678"
+        assert text_normalizer.normalize_address("東京千代田区丸の内１番地１　５階ビル") == "東京都千代田区丸の内1-1 5階 ビル"
+        assert text_normalizer.normalize_address("東京都千代田区") == "東京都千代田区"
+
+# 地名辞書のテスト
+class TestGazetteer:
+    def setup_method(self):
+        self.gazetteer = Gazetteer.bundled()
+    
+    def test_resolve(self):
+        assert self.gazetteer.resolve("東京都千代田区丸の内1-1")[:2] == ("東京都", "千代田区")
+        assert self.gazetteer.resolve("神奈川県横浜市中区山下町1")[:2] == ("神奈川県", "横浜市中区")
+        assert self.gazetteer.resolve("京都市下京区烏丸通")[:2] == ("京都府", "京都市下京区")
+        assert self.gazetteer.resolve("北海道倶知安町北1条")[:2] == ("北海道", "虻田郡倶知安町")
+        assert self.gazetteer.resolve("山梨県南都留郡富士河口湖町船津")[:2] == ("山梨県", "南都留郡富士河口湖町")
+        assert self.gazetteer.resolve("東京都港区芝浦町1")[:2] == ("東京都", "港区")
+        # 同名の市は都道府県を決めない
+        assert self.gazetteer.resolve("府中市宮町")[:2] == ("", "府中市")
+        assert self.gazetteer.resolve("〒530-0001 梅田1-1") == ("大阪府", "", "5300001")
+    
+    def test_fallback_municipality_containing_suffix(self):
+        # 辞書にない市区町村で、名前の中に「市」「町」「村」を含むもの
+        addresses = {
+            "長崎県大村市玖島1-1": "大村市",
+            "東京都町田市原町田1-1": "町田市",
+            "埼玉県東村山市本町1": "東村山市",
+            "新潟県十日町市本町1": "十日町市",
+            "三重県四日市市諏訪町1-5": "四日市市",
+            "北海道余市町大川町1": "余市町",
+            "千葉県市川市八幡1": "市川市",
+            "奈良県大和郡山市北郡山町1": "大和郡山市",
+            "長野県北佐久郡軽井沢町長倉": "北佐久郡軽井沢町",
+        }
+        for address, city in addresses.items():
+            assert self.gazetteer.resolve(address).city == city
+        assert DataProcessor().extract_prefecture_city("長崎県大村市玖島1-1") == ("長崎県", "大村市")
+    
+    def test_ken_all_round_trip(self, tmp_path):
+        source = tmp_path / "KEN_ALL.CSV"
+        source.write_text(
+            '01101,"060  ","0600042","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｵｵﾄﾞｵﾘﾆｼ","北海道","札幌市中央区","大通西",0,0,1,0,0,0\n'
+            '13101,"100  ","1000001","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ﾁﾖﾀﾞ","東京都","千代田区","千代田",0,0,0,0,0,0\n',
+            encoding="cp932",
+        )
+        path = str(tmp_path / "gazetteer.bin")
+        Gazetteer.from_ken_all(str(source)).save(path)
+        
+        gazetteer = Gazetteer.load(path)
+        
+        assert gazetteer.resolve("〒060-0042 大通西1丁目") == ("北海道", "札幌市中央区", "0600042")
+        assert gazetteer.resolve("札幌市中央区大通西1")[:2] == ("北海道", "札幌市中央区")
+        assert gazetteer.lookup_postal_code("100-0001") == ("東京都", "千代田区")
+    
+    def test_filter_by_location(self):
+        processor = DataProcessor()
+        companies = [
+            {"name": "A", "address": "横浜市中区山下町1"},
+            {"name": "B", "address": "東京都港区芝浦1", "prefecture": "東京都", "city": "港区"},
+            {"name": "C", "address": "〒231-0023 山下町1"},
+        ]
+        
+        assert [c["name"] for c in processor.filter_by_location(companies, prefectures=["神奈川県"])] == ["A", "C"]
+        assert [c["name"] for c in processor.filter_by_location(companies, cities=["横浜市"])] == ["A"]
+
+# 業種の索引のテスト
+class TestIndustryIndex:
+    def setup_method(self):
+        self.index = IndustryIndex()
+        self.processor = DataProcessor()
+        self.scraper = WebScraper()
+    
+    def test_keyword_automaton(self):
+        automaton = KeywordAutomaton(["he", "she", "his", "hers"])
+        
+        assert {automaton.keywords[i] for i in automaton.search("ushers")} == {"she", "he", "hers"}
+        assert automaton.search("xyz") == set()
+    
+    def test_classify(self):
+        assert self.index.classify("IT・情報通信") == "233"
+        assert self.index.classify("IT") == "233"
+        assert self.index.classify("不動産仲介業") == "250"
+        assert self.index.classify("物流倉庫") == "260"
+        assert self.index.classify("農業") == "999"
+        assert self.index.classify("") == ""
+        assert self.index.names_for("271") == ["広告・マーケティング"]
+        assert self.index.classify_industries(["物流", None, "物流", "IT"]).tolist() == ["260", "", "260", "233"]
+    
+    def test_filter_and_match(self):
+        companies = [
+            {"name": "A", "industry": "不動産"},
+            {"name": "B", "industry": "人材派遣", "industry_code": "290"},
+            {"name": "C", "industry": "建設"},
+        ]
+        
+        assert [c["name"] for c in self.processor.filter_by_industry(companies, ["250", "290"])] == ["A", "B"]
+        
+        # 業種コードでも業種名でも指定できる
+        assert self.scraper.match_industry_location(companies[0], ["250"])
+        assert self.scraper.match_industry_location(companies[0], ["不動産"])
+        assert not self.scraper.match_industry_location(companies[2], ["250"])
+        assert self.scraper.match_industry_location({"name": "テスト不動産"}, ["250"])
+        assert self.scraper.match_industry_location({"industry_code": "251"}, ["251"], prefectures=None)
+
+# 正規化の結果のキャッシュのテスト
+class TestMemo:
+    def test_memo(self):
+        calls = []
+        memo = Memo(lambda value: calls.append(value) or len(value), maxsize=2)
+        
+        assert [memo("a"), memo("bb"), memo("a"), memo("ccc"), memo("bb")] == [1, 2, 1, 3, 2]
+        assert calls == ["a", "bb", "ccc", "bb"]
+        assert memo.stats() == {"hits": 1, "misses": 4, "size": 2, "maxsize": 2, "hit_rate": 0.2}
+        # ハッシュできない入力は記憶しない
+        assert memo(["x", "y"]) == 2
+        memo.clear()
+        assert memo.stats()["size"] == 0
+    
+    def test_processor_memos(self):
+        processor = DataProcessor(memo_size=16)
+        processor.normalize_company_data([{"name": "株式会社テスト", "address": "東京都港区芝1", "industry": "農業"}] * 3)
+        
+        stats = processor.memo_stats()
+        assert stats["normalize_address"]["hits"] == 2
+        assert stats["extract_prefecture_city"]["misses"] == 1
+        
+        # マッピングを変更した場合は clear_memos で反映する
+        try:
+            processor.industry_code_mapping["農業"] = "100"
+            processor.clear_memos()
+            assert processor.get_industry_code("農業") == "100"
+        finally:
+            del processor.industry_code_mapping["農業"]
+            processor.clear_memos()
+        assert processor.get_industry_code("農業") == "999"
+
+# CSVファイルの分割読み込みのテスト
+class TestCsvStreaming:
+    def setup_method(self):
+        self.processor = DataProcessor()
+    
+    def write_csv(self, path, encoding):
+        path.write_text(
+            "会社名,住所,電話番号\n"
+            "株式会社テスト,東京都千代田区丸の内１－１,０３－１２３４－５６７８\n"
+            "ｻﾝﾌﾟﾙ有限会社,大阪市北区梅田1番2,06(1234)5678\n"
+            "合同会社例,京都市下京区1-2,\n",
+            encoding=encoding,
+        )
+        return str(path)
+    
+    def test_detect_encoding(self, tmp_path):
+        assert detect_encoding(self.write_csv(tmp_path / "utf8.csv", "utf-8")) == "utf-8"
+        assert detect_encoding(self.write_csv(tmp_path / "bom.csv", "utf-8-sig")) == "utf-8-sig"
+        assert detect_encoding(self.write_csv(tmp_path / "sjis.csv", "cp932")) == "cp932"
+        # 先頭のサンプルの途中で文字が切れていても UTF-8 と判定する
+        assert detect_encoding(self.write_csv(tmp_path / "cut.csv", "utf-8"), sample_size=20) == "utf-8"
+    
+    def test_non_ascii_after_sample(self, tmp_path, monkeypatch):
+        # 先頭のサンプルがASCIIだけのため UTF-8 と判定される Shift_JIS のファイル
+        monkeypatch.setattr(data_processor_module, "detect_encoding",
+                            lambda path: detect_encoding(path, sample_size=64))
+        path = tmp_path / "late.csv"
+        path.write_text("name,phone\n" + "Test Inc,03-1234-5678\n" * 5 + "株式会社テスト,06-1234-5678\n", encoding="cp932")
+        
+        df = self.processor.process_csv_file(str(path))
+        chunks = list(self.processor.iter_csv_file(str(path), chunksize=2))
+        
+        assert df["name"].tolist()[-1] == "(株)テスト"
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df.astype(str))
+        
+        # 読み込みの途中で読めない文字があった場合は、返し済みの行を除いて読み直す
+        big = tmp_path / "suppress.csv"
+        big.write_text("phone\n" + "".join(f"03-0000-{i % 10000:04d}\n" for i in range(30000))
+                       + "０６－１２３４－５６７８\n", encoding="cp932")
+        entries = list(csv_entries(str(big)))
+        assert len(entries) == 30001
+        assert entries[-1] == ("phone", "０６－１２３４－５６７８")
+    
+    def test_iter_csv_file(self, tmp_path):
+        path = self.write_csv(tmp_path / "sjis.csv", "cp932")
+        
+        chunks = list(self.processor.iter_csv_file(path, chunksize=2))
+        
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        result = pd.concat(chunks, ignore_index=True)
+        expected = self.processor.process_csv_file(path)
+        pd.testing.assert_frame_equal(result, expected)
+        assert result["name"].tolist() == ["(株)テスト", "サンプル(有)", "(同)例"]
+        assert result["prefecture"].tolist() == ["東京都", "大阪府", "京都府"]
+        
+        output = str(tmp_path / "out.csv")
+        assert self.processor.stream_csv_file(path, output, chunksize=2) == 3
+        pd.testing.assert_frame_equal(pd.read_csv(output, dtype=str, keep_default_na=False), expected)
+
+# 正規化の並列実行のテスト
+class TestParallelNormalizer:
+    def setup_method(self):
+        self.processor = DataProcessor()
+    
+    def test_parallel_matches_sequential(self, tmp_path):
+        records = [
+            {"name": f"株式会社テスト{i}", "phone": "０３（１２３４）５６７８", "address": "東京千代田区丸の内1番地2"}
+            if i % 3 else {"name": f"ﾃｽﾄ{i} 有限会社", "industry": "ＩＴ", "website": "https://example.com"}
+            for i in range(50)
+        ] + [{"phone": "03-0000-0000"}, None]
+        path = tmp_path / "companies.csv"
+        pd.DataFrame(records[:50]).rename(columns={"name": "会社名", "address": "住所"}).to_csv(path, index=False)
+        
+        with ParallelNormalizer(self.processor, workers=2, shard_size=7, min_rows=1) as normalizer:
+            assert normalizer.normalize_records(records) == self.processor.normalize_company_data(records)
+            
+            frames = list(self.processor.iter_csv_file(str(path), chunksize=20))
+            parallel = list(normalizer.map_csv_frames(self.processor._read_csv_chunks(str(path), 20, "utf-8")))
+            
+            df = self.processor.standardize_columns(pd.read_csv(path))
+            pd.testing.assert_frame_equal(normalizer.normalize_csv_frame(df), self.processor.process_csv_file(str(path)))
+        
+        assert len(parallel) == 3
+        for frame, expected in zip(parallel, frames):
+            pd.testing.assert_frame_equal(frame, expected)
+    
+    def test_parallel_csv_columns_missing_in_some_shards(self, tmp_path):
+        # 資本金は最初のシャードだけ欠損値があり、メールアドレスは最初のシャードだけにある
+        path = tmp_path / "companies.csv"
+        pd.DataFrame({
+            "会社名": [f"株式会社テスト{i}" for i in range(21)],
+            "資本金": [None if i < 3 else 1000 + i for i in range(21)],
+            "メールアドレス": [f" info{i}@test.co.jp " if i < 7 else None for i in range(21)],
+        }).to_csv(path, index=False)
+        expected = self.processor.process_csv_file(str(path))
+        
+        with ParallelNormalizer(self.processor, workers=2, shard_size=7, min_rows=1) as normalizer:
+            df = self.processor.standardize_columns(pd.read_csv(path))
+            pd.testing.assert_frame_equal(normalizer.normalize_csv_frame(df), expected)
+        assert expected["capital"].tolist()[3] == "1003.0"
+        assert expected["email"].tolist()[:2] == ["info0@test.co.jp", "info1@test.co.jp"]
+
+# 企業データのパイプラインのテスト
+class TestPipeline:
+    def setup_method(self):
+        self.processor = DataProcessor()
+        self.records = [
+            {"name": "株式会社テスト", "address": "東京都渋谷区渋谷1-1", "phone": "03-1234-5678", "industry": "IT"},
+            {"name": "テスト株式会社", "phone": "03-1234-5678", "email": "info@test.co.jp", "industry": "IT"},
+            {"name": "株式会社サンプル", "address": "大阪府大阪市北区梅田1-1", "industry": "建設"},
+            {"name": "株式会社求人サイト", "address": "東京都港区芝1-1", "industry": "IT", "description": "求人情報"},
+            {"name": "", "phone": "06-0000-0000"},
+        ]
+    
+    def test_matches_list_functions(self):
+        run = pipeline.Pipeline([
+            pipeline.exclude_keywords(["求人"]),
+            pipeline.normalize(self.processor.normalize_company_data_batch, batch_size=2),
+            pipeline.filter_by_industry(self.processor, ["233"]),
+            pipeline.filter_by_location(self.processor, ["東京都"]),
+            pipeline.deduplicate(self.processor),
+        ])
+        
+        normalized = self.processor.normalize_company_data(self.records[:3] + self.records[4:])
+        filtered = self.processor.filter_by_location(self.processor.filter_by_industry(normalized, ["233"]), ["東京都"])
+        expected = self.processor.deduplicate(filtered)
+        assert list(run(self.records)) == expected
+        assert len(expected) == 1
+    
+    def test_reads_input_lazily(self):
+        read = []
+        
+        def source():
+            for record in self.records * 10:
+                read.append(record)
+                yield record
+        
+        stream = pipeline.Pipeline([
+            pipeline.normalize(self.processor.normalize_company_data_batch, batch_size=3),
+            pipeline.filter_by_location(self.processor, ["東京都"]),
+        ]).run(source())
+        
+        assert read == []
+        assert next(stream)["prefecture"] == "東京都"
+        assert len(read) == 3
+        assert [batch for batch in pipeline.batched(range(5), 2)] == [[0, 1], [2, 3], [4]]
+    
+    def test_heartbeat(self):
+        beats = []
+        stream = pipeline.Pipeline([pipeline.heartbeat(lambda: beats.append(len(beats)), 0)]).run(self.records)
+        
+        assert list(stream) == self.records
+        # 1件ごとと読み終えた時点
+        assert len(beats) == len(self.records) + 1
+        assert list(pipeline.heartbeat(lambda: beats.append(None), 3600)(self.records)) == self.records
+        assert len(beats) == len(self.records) + 1
+
+# 処理時間の計測のテスト
+class TestProcessingProfile:
+    def setup_method(self):
+        self.processor = DataProcessor()
+        self.records = [
+            {"name": "株式会社テスト", "address": "東京都渋谷区渋谷1-1", "phone": "03-1234-5678", "industry": "IT"},
+            {"name": "テスト株式会社", "phone": "03-1234-5678", "email": "info@test.co.jp", "industry": "IT"},
+            {"name": "株式会社サンプル", "address": "大阪府大阪市北区梅田1-1", "industry": "建設"},
+        ]
+    
+    def test_records_stages_and_functions(self):
+        expected = self.processor.deduplicate(self.processor.normalize_company_data(self.records), fuzzy=True)
+        
+        with self.processor.profiling(ProcessingProfile()) as profile:
+            result = self.processor.deduplicate(self.processor.normalize_company_data(self.records), fuzzy=True)
+            self.processor.normalize_company_data_batch(self.records)
+        
+        # 計測しても結果は変わらず、with を抜けるとメソッドは元に戻る
+        assert result == expected
+        assert "normalize_company_name" not in vars(self.processor)
+        assert self.processor.profile is None
+        
+        report = profile.to_dict()
+        assert report["stages"]["normalize_company_data"]["rows"] == 3
+        assert report["stages"]["deduplicate"]["calls"] == 1
+        assert report["stages"]["remove_duplicates"]["calls"] == 1
+        assert report["stages"]["normalize_columns.name"]["rows"] == 3
+        assert report["functions"]["normalize_company_name"]["calls"] == 3
+        # 1件ごとの正規化で2回、一括処理で異なる住所ごとに2回
+        assert report["functions"]["extract_prefecture_city"]["calls"] == 4
+        assert report["functions"]["merge_company_data"]["calls"] >= 1
+        assert report["stages"]["deduplicate"]["wall_seconds"] >= report["stages"]["remove_duplicates"]["wall_seconds"]
+    
+    def test_iterators_and_files(self, tmp_path):
+        csv_path = tmp_path / "companies.csv"
+        csv_path.write_text("会社名,住所,電話番号\n株式会社テスト,東京都渋谷区渋谷1-1,0312345678\n"
+                            "株式会社サンプル,大阪府大阪市北区梅田1-1,06-1234-5678\n", encoding="utf-8")
+        
+        with self.processor.profiling(ProcessingProfile()) as profile:
+            chunks = list(self.processor.iter_csv_file(str(csv_path), chunksize=1))
+            self.processor.stream_csv_file(str(csv_path), str(tmp_path / "out.csv"))
+            with pytest.raises(RuntimeError):
+                with self.processor.profiling(ProcessingProfile()):
+                    pass
+        
+        assert len(chunks) == 2
+        report = profile.to_dict()
+        assert report["stages"]["iter_csv_file"]["rows"] == 4
+        assert report["stages"]["stream_csv_file"]["rows"] == 2
+        assert report["stages"]["normalize_csv_frame.phone"]["rows"] == 4
+        
+        profile.write(str(tmp_path / "profile" / "import.json"))
+        assert json.loads((tmp_path / "profile" / "import.json").read_text(encoding="utf-8")) == report
+    
+    def test_pipeline_stages(self):
+        profile = ProcessingProfile()
+        run = pipeline.Pipeline([
+            pipeline.normalize(self.processor.normalize_company_data_batch, batch_size=2),
+            pipeline.filter_by_location(self.processor, ["東京都"]),
+        ])
+        
+        assert list(run(self.records, profile)) == list(run(self.records))
+        report = profile.to_dict()["stages"]
+        assert report["pipeline.normalize"]["rows"] == 3
+        assert report["pipeline.filter_by_location"]["rows"] == 1
+        
+        # 途中で読むのをやめた場合も、それまでの計測値を記録する
+        merged = ProcessingProfile()
+        stream = run(self.records, merged)
+        next(stream)
+        stream.close()
+        merged.merge(profile)
+        assert merged.stages["pipeline.filter_by_location"].calls == 2
+        assert merged.stages["pipeline.filter_by_location"].rows == 2
+
+# ディスク上のパーティションによる重複削除のテスト
+class TestExternalDedup:
+    def setup_method(self):
+        self.processor = DataProcessor()
+    
+    def records(self):
+        return [
+            {"name": f"株式会社テスト{i % 40}", "phone": f"03-1234-{i % 40:04d}" if i % 3 else "",
+             "email": "info@example.com" if i % 7 == 0 else "", "employees": i % 5}
+            for i in range(200)
+        ] + [{"name": "", "phone": ""}, {"phone": "06-1111-2222"}, {"phone": "06-1111-2222", "email": "a@b.jp"}]
+    
+    def test_matches_remove_duplicates(self, tmp_path):
+        records = self.records()
+        expected = self.processor.remove_duplicates(records)
+        
+        for workers in (1, 2):
+            result = self.processor.remove_duplicates_external(iter(records), partitions=4, workers=workers,
+                                                               tmp_dir=str(tmp_path))
+            assert list(result) == expected
+        # パーティションのファイルは削除される
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_stream_csv_file_dedup(self, tmp_path):
+        path = tmp_path / "companies.csv"
+        path.write_text(
+            "会社名,電話番号,メールアドレス\n"
+            "株式会社テスト,03-1234-5678,\n"
+            "株式会社サンプル,06-1234-5678,\n"
+            "株式会社テスト,03-1234-5678,info@test.co.jp\n",
+            encoding="utf-8",
+        )
+        output = str(tmp_path / "out.csv")
+        
+        assert self.processor.stream_csv_file(str(path), output, chunksize=2, dedup=True) == 2
+        result = pd.read_csv(output, dtype=str, keep_default_na=False)
+        assert result["name"].tolist() == ["(株)テスト", "(株)サンプル"]
+        assert result["email"].tolist() == ["info@test.co.jp", ""]
+
+# 会社名の表記ゆれによる重複削除のテスト
+class TestFuzzyDedup:
+    def setup_method(self):
+        self.processor = DataProcessor()
+    
+    def test_name_key(self):
+        assert name_key("(株)テスト") == name_key("テスト株式会社") == name_key("ﾃｽﾄ 株式会社") == "テスト"
+        assert name_key("ＴＥＳＴ・システム") == "testシステム"
+    
+    def test_remove_fuzzy_duplicates(self):
+        data = [
+            {"name": "(株)テスト", "phone": "03-1234-5678", "prefecture": "東京都"},
+            {"name": "テスト株式会社", "phone": "", "website": "https://www.test.co.jp"},
+            {"name": "テスト商事", "phone": "03-1111-2222"},
+            {"name": "テスト2"},
+            # 都道府県の異なる同名の会社は、都道府県のないレコードを介してもまとめない
+            {"name": "テスト", "prefecture": "大阪府"},
+        ]
+        
+        result = self.processor.remove_fuzzy_duplicates(data)
+        
+        assert [company["name"] for company in result] == ["テスト株式会社", "テスト商事", "テスト2", "テスト"]
+        assert result[0]["phone"] == "03-1234-5678"
+        assert result[0]["website"] == "https://www.test.co.jp"
+        assert FuzzyDeduplicator().cluster(data) == [0, 0, 2, 3, 4]
+
+    def test_conflicting_phone_numbers(self):
+        # 名前が近くても、両方にある電話番号が異なる会社はまとめない
+        data = [
+            {"name": "サンテック", "phone": "03-1111-2222", "prefecture": "東京都"},
+            {"name": "サンテックス", "phone": "03-3333-4444", "prefecture": "東京都"},
+            {"name": "(株)ミライ", "phone": "06-1111-2222"},
+            {"name": "ミライ(株)", "phone": "06-1111-2223"},
+            # 片方にしか電話番号がない場合はまとめる
+            {"name": "株式会社アオバ", "phone": "０３－５５５５－６６６６"},
+            {"name": "アオバ(株)", "phone": ""},
+        ]
+
+        assert FuzzyDeduplicator().cluster(data) == [0, 1, 2, 3, 4, 4]
+        assert len(self.processor.deduplicate(data, fuzzy=True)) == 5
+
+    def test_deduplicate_is_exact_by_default(self):
+        data = [
+            {"name": "(株)テスト", "phone": "03-1234-5678"},
+            {"name": "テスト株式会社", "phone": ""},
+            {"name": "(株)テスト", "phone": "03-1234-5678", "email": "info@test.co.jp"},
+        ]
+
+        assert self.processor.deduplicate(data) == self.processor.remove_duplicates(data)
+        assert len(self.processor.deduplicate(data)) == 2
+        assert len(self.processor.deduplicate(data, fuzzy=True)) == 1
+        assert list(pipeline.deduplicate(self.processor, fuzzy=True)(data)) == self.processor.deduplicate(data, fuzzy=True)
+
+# 複数キーによる名寄せのテスト
+class TestEntityResolution:
+    def setup_method(self):
+        self.processor = DataProcessor()
+    
+    def test_disjoint_set(self):
+        clusters = DisjointSet(5)
+        clusters.union(3, 1)
+        clusters.union(4, 3)
+        
+        assert clusters.connected(1, 4)
+        assert not clusters.connected(0, 1)
+        assert clusters.labels() == [0, 1, 2, 1, 1]
+        assert clusters.groups() == {0: [0], 1: [1, 3, 4], 2: [2]}
+    
+    def test_keys(self):
+        assert registrable_domain("www.shop.example.co.jp") == "example.co.jp"
+        assert registrable_domain("example.com") == "example.com"
+        assert registrable_domain("127.0.0.1") == ""
+        assert canonical_address("東京都千代田区丸の内１丁目２番３号") == canonical_address("東京千代田区丸の内1-2-3")
+    
+    def test_resolve_entities(self):
+        data = [
+            {"name": "(株)サンプル", "phone": "03-1234-5678"},
+            {"name": "サンプル", "website": "https://www.sample.co.jp/about"},
+            {"name": "サンプル株式会社", "phone": "0312345678", "website": "http://sample.co.jp"},
+            {"name": "別会社", "email": "info@gmail.com"},
+            {"name": "他社", "email": "info@gmail.com", "address": "大阪府大阪市北区1-1"},
+            {"name": "A社", "email": "a@example.jp", "address": "大阪府大阪市北区梅田1丁目1番"},
+            {"name": "A", "email": "sales@example.jp", "address": "大阪府大阪市北区梅田1-1"},
+        ]
+        resolver = EntityResolver(list(ENTITY_KEYS))
+        
+        assert resolver.cluster(data) == [0, 0, 0, 3, 3, 5, 5]
+        assert {key for _, _, key in resolver.links} == {"phone", "domain", "email", "email_domain_address"}
+        # ドメインは指定した場合だけ使う
+        assert EntityResolver().cluster(data) == [0, 1, 0, 3, 3, 5, 5]
+        
+        result = self.processor.resolve_entities(data, keys=list(ENTITY_KEYS))
+        
+        assert [(c["cluster_id"], c["cluster_size"]) for c in result] == [(0, 3), (3, 2), (5, 2)]
+        assert result[0]["phone"] == "03-1234-5678"
+        assert result[0]["website"] == "https://www.sample.co.jp/about"
+    
+    def test_companies_from_one_directory_host(self):
+        # クローラーは website に取得元のページのURLを入れる
+        data = [
+            {"name": f"株式会社{name}", "phone": phone, "address": address,
+             "website": f"https://itp.ne.jp/info/{i}/", "source_url": f"https://itp.ne.jp/info/{i}/"}
+            for i, (name, phone, address) in enumerate([
+                ("アオバ", "03-1111-1111", "東京都千代田区丸の内1-1"),
+                ("ヒカリ", "06-2222-2222", "大阪府大阪市北区梅田2-2"),
+                ("ミライ", "052-333-3333", "愛知県名古屋市中区栄3-3"),
+            ])
+        ]
+        
+        result = self.processor.deduplicate(data, fuzzy=True)
+        assert [(c["name"], c["phone"], c["cluster_size"]) for c in result] == [
+            (c["name"], c["phone"], 1) for c in data
+        ]
+        assert domain_key(data[0]) == ""
+        assert EntityResolver(list(ENTITY_KEYS)).cluster(data) == [0, 1, 2]
+        assert domain_key({"website": "https://www.sample.co.jp/", "source_url": "https://itp.ne.jp/info/1/"}) == "sample.co.jp"
+
+# 企業データのレコードのテスト
+class TestCompanyRecord:
+    def setup_method(self):
+        self.processor = DataProcessor()
+
+    def test_mapping_behaviour(self):
+        record = CompanyRecord({"name": "株式会社テスト", "phone": "03-1234-5678", "note": "備考"})
+
+        assert record == {"name": "株式会社テスト", "phone": "03-1234-5678", "note": "備考"}
+        assert list(record) == ["name", "phone", "note"]
+        assert "address" not in record
+        assert record.get("address", "") == ""
+        assert record.extra == {"note": "備考"}
+        with pytest.raises(KeyError):
+            record["address"]
+        del record["phone"]
+        assert record.to_dict() == {"name": "株式会社テスト", "note": "備考"}
+        assert not hasattr(record, "__dict__")
+
+    def test_pipeline_keeps_records(self):
+        records = [
+            CompanyRecord(name="株式会社テスト", address="東京都渋谷区渋谷1-1", phone="03-1234-5678", industry="IT"),
+            CompanyRecord(name="株式会社テスト", phone="03-1234-5678", email="info@test.co.jp"),
+        ]
+        normalized = self.processor.normalize_company_data(records)
+        batch = self.processor.normalize_company_data_batch(records)
+        expected = self.processor.normalize_company_data(as_dicts(records))
+
+        assert all(isinstance(record, CompanyRecord) for record in normalized + batch)
+        assert normalized == expected
+        assert batch == expected
+
+        unique = self.processor.deduplicate(normalized)
+        assert len(unique) == 1
+        assert isinstance(unique[0], CompanyRecord)
+        assert unique[0]["email"] == "info@test.co.jp"
+        assert unique[0]["prefecture"] == "東京都"
+
+    def test_column_values(self):
+        record = CompanyRecord(name="株式会社テスト", has_fax=True, description="説明")
+        values = record.column_values()
+
+        assert values["name"] == "株式会社テスト"
+        assert values["has_fax"] is True
+        assert values["address"] == ""
+        assert "description" not in values
+
+# リストに保存済みの企業データとの重複判定のテスト
+class TestListDedupIndex:
+    def setup_method(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        self.processor = DataProcessor()
+
+    def teardown_method(self):
+        self.db.close()
+
+    def _companies(self, list_id=1):
+        return self.db.query(models.Company).filter(models.Company.list_id == list_id).order_by(models.Company.id).all()
+
+    def test_merges_into_existing_rows(self):
+        index = ListDedupIndex(self.db, 1, self.processor, chunk_size=2)
+        first = index.store([
+            {"name": "株式会社テスト", "phone": "03-1234-5678"},
+            {"name": "株式会社サンプル", "phone": "06-1111-2222"},
+        ])
+        second = index.store([
+            {"name": "テスト株式会社", "phone": "03-1234-5678", "email": "info@test.co.jp"},
+            {"name": "株式会社サンプル", "website": "https://sample.co.jp", "phone": "06-1111-2222"},
+            {"name": "株式会社新規", "phone": "045-000-0000"},
+            {"name": "株式会社新規", "phone": "045-000-0000", "address": "神奈川県横浜市"},
+        ])
+        self.db.commit()
+
+        assert first == {"inserted": 2, "merged": 0, "skipped": 0}
+        assert second == {"inserted": 1, "merged": 3, "skipped": 0}
+        companies = self._companies()
+        assert [company.name for company in companies] == ["株式会社テスト", "株式会社サンプル", "株式会社新規"]
+        assert companies[0].email == "info@test.co.jp"
+        assert companies[1].website == "https://sample.co.jp"
+        assert companies[2].address == "神奈川県横浜市"
+        # 別のリストとは重複判定しない
+        assert ListDedupIndex(self.db, 2, self.processor).store([{"name": "株式会社テスト", "phone": "03-1234-5678"}])["inserted"] == 1
+
+    def test_skip_mode(self):
+        ListDedupIndex(self.db, 1, self.processor).store([{"name": "株式会社テスト", "phone": "03-1234-5678"}])
+        counts = ListDedupIndex(self.db, 1, self.processor, mode="skip").store([
+            {"name": "株式会社テスト", "phone": "03-1234-5678", "email": "info@test.co.jp"},
+        ])
+
+        assert counts == {"inserted": 0, "merged": 0, "skipped": 1}
+        assert not self._companies()[0].email
+
+    def test_indexes_existing_list(self):
+        self.db.add(models.Company(list_id=1, name="株式会社テスト", phone="03-1234-5678"))
+        self.db.commit()
+        index = ListDedupIndex(self.db, 1, self.processor)
+
+        assert not index.is_indexed()
+        counts = index.store([{"name": "株式会社テスト", "phone": "0312345678", "city": "渋谷区"}])
+        assert counts["merged"] == 1
+        assert index.is_indexed()
+        assert self._companies()[0].city == "渋谷区"
+
+    def test_companies_from_one_directory_host(self):
+        # クローラーは website に取得元のページのURLを入れる
+        def company(i, name, phone):
+            url = f"https://itp.ne.jp/info/{i}/"
+            return {"name": name, "phone": phone, "website": url, "source_url": url}
+
+        index = ListDedupIndex(self.db, 1, self.processor)
+        first = index.store([company(1, "株式会社アオバ", "03-1111-1111")])
+        second = index.store([company(2, "株式会社ヒカリ", "06-2222-2222"), company(3, "株式会社ミライ", "052-333-3333")])
+
+        assert first["inserted"] == 1
+        assert second == {"inserted": 2, "merged": 0, "skipped": 0}
+        assert [c.name for c in self._companies()] == ["株式会社アオバ", "株式会社ヒカリ", "株式会社ミライ"]
+
+    def test_updates_total_records(self):
+        self.db.add(models.List(id=1, title="テスト"))
+        self.db.commit()
+        ListDedupIndex(self.db, 1, self.processor, chunk_size=2, commit=True).store([
+            {"name": "株式会社テスト", "phone": "03-1234-5678"},
+            {"name": "株式会社サンプル", "phone": "06-1111-2222"},
+            {"name": "テスト株式会社", "phone": "03-1234-5678"},
+        ])
+        self.db.rollback()
+
+        assert self.db.get(models.List, 1).total_records == 2
+        # キーは INSERT で受け取ったIDの企業データに対応する
+        key_ids = {key.company_id for key in self.db.query(models.CompanyKey)}
+        assert key_ids == {company.id for company in self._companies()}
+
+# 企業データの一括保存のテスト
+class TestCompanyWriter:
+    def setup_method(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        self.db.add(models.List(id=1, title="テスト"))
+        self.db.commit()
+
+    def teardown_method(self):
+        self.db.close()
+
+    def test_writes_batches(self):
+        writer = CompanyWriter(self.db, 1, batch_size=2, returning=True)
+        inserted = writer.write({"name": f"株式会社テスト{i}", "phone": f"03-0000-000{i}", "capital": i} for i in range(5))
+        # バッチごとにコミットされている
+        self.db.rollback()
+
+        companies = self.db.query(models.Company).order_by(models.Company.id).all()
+        assert inserted == writer.inserted == 5
+        assert writer.ids == [company.id for company in companies]
+        assert [company.phone for company in companies] == [f"03-0000-000{i}" for i in range(5)]
+        assert companies[0].created_at is not None
+        assert self.db.get(models.List, 1).total_records == 5
+
+    def test_insert_rows_without_commit(self):
+        writer = CompanyWriter(self.db, 1, commit=False)
+        assert writer.insert_rows([company_row(1, {"name": "株式会社テスト"})]) is None
+        self.db.rollback()
+
+        assert self.db.query(models.Company).count() == 0
+        assert self.db.get(models.List, 1).total_records == 0
+        with pytest.raises(ValueError):
+            CompanyWriter(self.db, 1, batch_size=0)
+
+# 除外リストのテスト
+class TestSuppression:
+    def setup_method(self):
+        self.processor = DataProcessor()
+        self.suppression = SuppressionList.build([
+            ("phone", "０３－１２３４－５６７８"),
+            ("domain", "https://www.customer.co.jp/about"),
+            ("email", "Sales@Example.com"),
+            ("phone", ""),
+        ], "dnc")
+    
+    def test_membership(self):
+        assert len(self.suppression) == 3
+        assert self.suppression.counts == {"phone": 1, "domain": 1, "email": 1}
+        assert self.suppression.is_suppressed({"name": "株式会社A", "phone": "03(1234)5678"})
+        assert self.suppression.is_suppressed({"name": "株式会社B", "website": "http://shop.customer.co.jp"})
+        assert self.suppression.is_suppressed({"name": "株式会社C", "email": "sales@example.com"})
+        assert not self.suppression.is_suppressed({"name": "株式会社D", "phone": "03-1234-0000",
+                                                   "email": "other@example.com"})
+        assert self.suppression.is_suppressed_url("https://customer.co.jp/company")
+        assert not self.suppression.is_suppressed_url("https://example.co.jp/")
+        # クローラーは website に取得元のページのURLを入れる
+        assert self.suppression.is_suppressed({"name": "株式会社E", "website": "https://www.customer.co.jp/",
+                                               "source_url": "https://www.customer.co.jp/"})
+        # 共用のホスティングのドメインは除外の対象にしない
+        hosted = SuppressionList.build([("domain", "https://customer.wixsite.com/"), ("email", "info@customer.co.jp")])
+        assert len(hosted) == 1
+        assert not hosted.is_suppressed({"name": "株式会社F", "website": "https://other.wixsite.com/"})
+        
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        values = np.arange(1, 1001, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        bloom.add_hashes(values)
+        assert all(int(value) in bloom for value in values)
+    
+    def test_store_round_trip(self, tmp_path):
+        path = tmp_path / "dnc.csv"
+        path.write_text("会社名,電話番号,メールアドレス,ドメイン\n"
+                        "株式会社A,03-1234-5678,,\n"
+                        "株式会社B,,info@b.co.jp,b.co.jp\n", encoding="cp932")
+        store = SuppressionStore(str(tmp_path / "suppression"))
+        store.import_csv("dnc", str(path))
+        
+        assert store.names() == ["dnc"]
+        loaded = store.load("dnc")
+        assert loaded is store.load("dnc")
+        assert loaded.info() == {"name": "dnc", "entries": 3, "counts": {"phone": 1, "domain": 1, "email": 1}}
+        assert loaded.is_suppressed({"name": "株式会社A", "phone": "0312345678"})
+        assert loaded.is_suppressed({"name": "株式会社B", "website": "https://www.b.co.jp"})
+        with pytest.raises(ValueError):
+            store.load("../dnc")
+        store.delete("dnc")
+        assert store.names() == []
+    
+    def test_filters_pipeline_and_csv(self, tmp_path):
+        records = [
+            {"name": "株式会社A", "phone": "03-1234-5678"},
+            {"name": "株式会社B", "phone": "06-1234-5678"},
+            {"name": "株式会社C", "email": "sales@example.com"},
+        ]
+        suppressed = SuppressionSet([self.suppression])
+        assert [r["name"] for r in pipeline.suppress(suppressed)(records)] == ["株式会社B"]
+        assert list(pipeline.suppress(None)(records)) == records
+        
+        path = tmp_path / "companies.csv"
+        pd.DataFrame(records).rename(columns={"name": "会社名", "phone": "電話番号", "email": "メール"}).to_csv(path, index=False)
+        result = self.processor.process_csv_file(str(path), suppression=suppressed)
+        assert result["name"].tolist() == ["(株)B"]
+        chunks = list(self.processor.iter_csv_file(str(path), chunksize=2, suppression=suppressed))
+        assert pd.concat(chunks)["name"].tolist() == ["(株)B"]
+    
+    def test_crawl_skips_suppressed_domains(self, tmp_path):
+        path = str(tmp_path / "archive.zip")
+        search_url = "https://search.example.com/?q=" + quote_plus("テスト 会社 企業 電話番号")
+        archive = FetchArchive(path)
+        archive.add(FetchResponse(search_url, 200, (
+            '<a href="https://www.customer.co.jp/">A</a><a href="https://b.example.co.jp/">B</a>'
+            '<a href="https://c.example.co.jp/">C</a>'
+        ).encode("utf-8"), "utf-8"))
+        archive.add(FetchResponse("https://b.example.co.jp/", 200,
+                                  "<title>株式会社B</title><p>TEL 03-1234-5678</p>".encode("utf-8"), "utf-8"))
+        archive.add(FetchResponse("https://c.example.co.jp/", 200, "<title>株式会社C</title>".encode("utf-8"), "utf-8"))
+        archive.close()
+        
+        scraper = WebScraper(delay_between_requests=0, transport=ReplayTransport(path))
+        scraper.search_engines = {"engine": "https://search.example.com/?q={query}"}
+        scraper.directory_sites = {}
+        stats = CrawlStats()
+        
+        results = asyncio.run(scraper.search_by_keyword(["テスト"], max_results=10, stats=stats,
+                                                        suppression=SuppressionSet([self.suppression])))
+        
+        assert [result["name"] for result in results] == ["株式会社C"]
+        # 除外リストにあるドメインの企業ページは取得しない
+        assert stats.to_dict()["company_pages"] == 2
+
+# クロールのチェックポイントのテスト
+class TestCrawlCheckpoint:
+    def setup_method(self):
+        self.scraper = WebScraper(delay_between_requests=0)
+        self.scraper.search_engines = {"engine": "https://search.example.com/?q={query}"}
+        self.scraper.directory_sites = {}
+        self.search_url = "https://search.example.com/?q=" + quote_plus("テスト 会社 企業 電話番号")
+        self.names = {"https://a.example.co.jp/": "株式会社A", "https://b.example.co.jp/": "株式会社B"}
+        self.fetched = []
+
+        async def fetch_search_results(session, url, budget=None, stats=None):
+            self.fetched.append(url)
+            return '<a href="https://a.example.co.jp/">A</a><a href="https://b.example.co.jp/">B</a>'
+
+        async def fetch_company_info(session, url, budget=None, stats=None):
+            self.fetched.append(url)
+            return {"name": self.names[url], "source_url": url}
+
+        self.scraper.fetch_search_results = fetch_search_results
+        self.scraper.fetch_company_info = fetch_company_info
+
+    def test_state_round_trip(self):
+        checkpoint = CrawlCheckpoint()
+        checkpoint.add_serp_result("https://search.example.com/?q=1", ["https://a.example.co.jp/", "https://a.example.co.jp/"])
+        checkpoint.add_company_result("https://a.example.co.jp/", {"name": "株式会社A"})
+
+        restored = CrawlCheckpoint(state=checkpoint.to_state(), records=checkpoint.records)
+
+        assert restored.is_resumed
+        assert restored.frontier == ["https://a.example.co.jp/"]
+        assert restored.is_serp_done("https://search.example.com/?q=1")
+        assert restored.is_visited("https://a.example.co.jp/")
+
+    def test_flush_collects_new_records(self):
+        saved = []
+        checkpoint = CrawlCheckpoint(on_flush=lambda c: saved.extend(c.new_records()), flush_every=2)
+        checkpoint.add_company_result("https://a.example.co.jp/", {"name": "株式会社A"})
+        checkpoint.add_company_result("https://b.example.co.jp/", {})
+
+        assert saved == [("https://a.example.co.jp/", {"name": "株式会社A"})]
+        assert checkpoint.new_records() == []
+
+    def test_failed_flush_keeps_new_records(self):
+        saved = []
+        failures = [RuntimeError("database is locked")]
+
+        def save(checkpoint):
+            records = checkpoint.new_records()
+            if failures:
+                raise failures.pop()
+            saved.extend(records)
+
+        checkpoint = CrawlCheckpoint(on_flush=save, flush_every=1)
+        checkpoint.add_company_result("https://a.example.co.jp/", {"name": "株式会社A"})
+        checkpoint.add_company_result("https://b.example.co.jp/", {"name": "株式会社B"})
+
+        # 失敗した回のレコードは次の永続化で保存される
+        assert [url for url, _ in saved] == ["https://a.example.co.jp/", "https://b.example.co.jp/"]
+        assert checkpoint.new_records() == []
+
+    def test_resume_skips_finished_pages(self):
+        first = CrawlCheckpoint()
+        first.add_serp_result(self.search_url, list(self.names))
+        first.add_company_result("https://a.example.co.jp/", {"name": "株式会社A"})
+        checkpoint = CrawlCheckpoint(state=first.to_state(), records=first.records)
+
+        results = asyncio.run(self.scraper.search_by_keyword(["テスト"], max_results=10, checkpoint=checkpoint))
+
+        assert self.fetched == ["https://b.example.co.jp/"]
+        assert [r["name"] for r in results] == ["株式会社A", "株式会社B"]
+
+# 中断されたジョブの検出のテスト
+class TestOrphanedJobs:
+    def setup_method(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        self.db.add(models.List(id=1, title="テスト"))
+        stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=search.JOB_HEARTBEAT_TIMEOUT * 2)
+        for job_id in (1, 2):
+            self.db.add(models.SearchJob(id=job_id, list_id=1, job_type="keyword", status="processing",
+                                         params={"keywords": ["テスト"]}, heartbeat_at=stale))
+        self.db.commit()
+
+    def teardown_method(self):
+        self.db.close()
+
+    def test_skips_jobs_running_in_this_process(self, monkeypatch):
+        found = []
+
+        async def search_by_keyword(keywords, max_results, **kwargs):
+            # クロールが長引いてハートビートが途絶えた状態
+            later = datetime.datetime.utcnow() + datetime.timedelta(seconds=search.JOB_HEARTBEAT_TIMEOUT * 2)
+            found.extend(job.id for job in search.find_orphaned_jobs(self.db, now=later))
+            return []
+
+        monkeypatch.setattr(search.scraper, "search_by_keyword", search_by_keyword)
+        asyncio.run(search.process_keyword_search(1, ["テスト"], list_id=1, db=self.db))
+
+        assert found == [2]
+        assert search._running_jobs == set()
+        assert [job.id for job in search.find_orphaned_jobs(self.db)] == [2]
+
+# クロール予算のテスト
+class TestCrawlBudget:
+    def setup_method(self):
+        self.scraper = WebScraper(delay_between_requests=0)
+        self.scraper.search_engines = {"engine": "https://search.example.com/?q={query}"}
+        self.scraper.directory_sites = {}
+        self.fetched = []
+
+        async def fetch_html(session, url, budget, kind, stats=None, source="company"):
+            if budget is not None and not budget.acquire(url):
+                return None
+            self.fetched.append(url)
+            if url.startswith("https://search.example.com/"):
+                return "".join(f'<a href="https://site{i}.example.co.jp/">{i}</a>' for i in range(10))
+            budget.record_bytes(100)
+            return f"<html><head><title>{url}</title></head></html>"
+
+        self.scraper._fetch_html = fetch_html
+
+    def test_domain_cap(self):
+        budget = CrawlBudget(max_pages_per_domain=2)
+
+        assert budget.acquire("https://a.example.co.jp/1")
+        assert budget.acquire("https://a.example.co.jp/2")
+        assert not budget.acquire("https://a.example.co.jp/3")
+        assert budget.acquire("https://b.example.co.jp/1")
+        assert budget.exhausted is None
+        assert budget.usage()["skipped_by_domain_cap"] == 1
+
+    def test_max_requests_returns_partial_results(self):
+        budget = CrawlBudget(max_requests=4)
+
+        results = asyncio.run(self.scraper.search_by_keyword(["テスト"], max_results=10, budget=budget))
+
+        assert len(self.fetched) == 4
+        assert len(results) == 3
+        assert budget.exhausted == CrawlBudget.MAX_REQUESTS
+
+    def test_max_bytes(self):
+        budget = CrawlBudget(max_bytes=250)
+
+        results = asyncio.run(self.scraper.search_by_keyword(["テスト"], max_results=10, budget=budget))
+
+        assert len(results) == 3
+        assert budget.exhausted == CrawlBudget.MAX_BYTES
+
+    def test_usage_carries_over_on_resume(self):
+        budget = CrawlBudget(max_requests=5)
+        budget.acquire("https://a.example.co.jp/")
+
+        resumed = CrawlBudget.from_params(budget.limits(), usage=budget.usage())
+
+        assert resumed.requests == 1
+        assert resumed.domain_pages["a.example.co.jp"] == 1
+
+# 共有リクエスト枠のテスト
+class TestFetchBroker:
+    async def _run(self, broker, job, count, order, active):
+        async def request(i):
+            async with job.slot():
+                active.append(broker.snapshot()["active"])
+                order.append(job.key)
+                await asyncio.sleep(0.001)
+        await asyncio.gather(*[request(i) for i in range(count)])
+
+    def test_global_ceiling(self):
+        async def main():
+            broker = FetchBroker(max_concurrent_requests=3, small_job_requests=0)
+            order, active = [], []
+            jobs = [broker.register(f"job:{i}", f"user:{i}") for i in range(4)]
+            await asyncio.gather(*[self._run(broker, job, 10, order, active) for job in jobs])
+            return broker, order, active
+
+        broker, order, active = asyncio.run(main())
+
+        assert len(order) == 40
+        assert max(active) <= 3
+        assert broker.snapshot()["active"] == 0
+
+    def test_small_job_jumps_ahead(self):
+        async def main():
+            broker = FetchBroker(max_concurrent_requests=1, small_job_requests=5)
+            order, active = [], []
+            bulk = broker.register("bulk", "user:1", expected_requests=1000)
+            bulk_task = asyncio.ensure_future(self._run(broker, bulk, 30, order, active))
+            await asyncio.sleep(0.005)
+            small = broker.register("small", "user:2", expected_requests=3)
+            await self._run(broker, small, 3, order, active)
+            await bulk_task
+            return order
+
+        order = asyncio.run(main())
+
+        # 小さいジョブは大量ジョブの待ち行列の途中で完了する
+        assert max(i for i, key in enumerate(order) if key == "small") < 15
+
+    def test_users_share_fairly(self):
+        async def main():
+            broker = FetchBroker(max_concurrent_requests=1, small_job_requests=0)
+            order, active = [], []
+            heavy_user_jobs = [broker.register(f"heavy:{i}", "user:heavy") for i in range(3)]
+            light_user_job = broker.register("light", "user:light")
+            await asyncio.gather(
+                *[self._run(broker, job, 20, order, active) for job in heavy_user_jobs],
+                self._run(broker, light_user_job, 20, order, active),
+            )
+            return order
+
+        order = asyncio.run(main())
+
+        # 最初の40件のうち半分程度は light ユーザーに割り当てられる
+        assert order[:40].count("light") >= 15
+
+# 抽出テンプレートのテスト
+DIRECTORY_PAGE = """
+<html><head><title>{name} | 企業ディレクトリ</title></head>
+<body>
+<div class="header"><a href="/">トップ</a></div>
+<div class="profile">
+  <ul>
+    <li>所在地：{address}</li>
+    <li>電話番号：{phone}</li>
+    <li>資本金：{capital}万円</li>
+  </ul>
+</div>
+</body></html>
+"""
+
+class TestExtractionTemplates:
+    def setup_method(self):
+        self.scraper = WebScraper()
+        self.heuristic = WebScraper(use_templates=False)
+
+    def _page(self, i):
+        return DIRECTORY_PAGE.format(
+            name=f"株式会社テスト{i}", address=f"東京都千代田区丸の内{i}-1-1",
+            phone=f"03-1234-{i:04d}", capital=1000 + i
+        )
+
+    def test_template_matches_heuristic(self):
+        for i in range(5):
+            url = f"https://directory.example.co.jp/company/{i}"
+            html = self._page(i)
+            assert self.scraper.extract_company_data(html, url) == self.heuristic.extract_company_data(html, url)
+
+        stats = self.scraper.template_cache.stats()
+        assert stats["hits"] == 4
+        assert stats["fallbacks"] == 0
+
+    def test_table_layout(self):
+        # ラベル（th）と値（td）が別のセルにある表
+        page = ("<html><head><title>株式会社テスト{i}</title></head><body><table>"
+                "<tr><th>所在地</th><td>大阪府大阪市北区梅田{i}-1-1</td></tr>"
+                "<tr><th>TEL</th><td>06-1234-{i:04d}</td></tr>"
+                "<tr><th>資本金</th><td>{i},000万円</td></tr></table></body></html>")
+        for i in range(1, 4):
+            url = f"https://directory.example.co.jp/company/{i}"
+            html = page.format(i=i)
+            result = self.scraper.extract_company_data(html, url)
+            assert result == self.heuristic.extract_company_data(html, url)
+            assert (result["address"], result["phone"], result["capital"]) == (
+                f"大阪府大阪市北区梅田{i}-1-1", f"06-1234-{i:04d}", i * 1000
+            )
+
+        assert self.scraper.template_cache.stats()["hits"] == 2
+
+    def test_fallback_when_validation_fails(self):
+        url = "https://directory.example.co.jp/company/1"
+        self.scraper.extract_company_data(self._page(1), url)
+
+        # 同じレイアウトで電話番号の欄が空のページ
+        html = self._page(2).replace("03-1234-0002", "非公開")
+        result = self.scraper.extract_company_data(html, "https://directory.example.co.jp/company/2")
+
+        assert result == self.heuristic.extract_company_data(html, "https://directory.example.co.jp/company/2")
+        assert self.scraper.template_cache.stats()["fallbacks"] == 1
+
+    def test_fields_absent_from_first_page(self):
+        # 最初のページには所在地と資本金がない（同じレイアウト）
+        cache = self.scraper.template_cache
+        cache.absent_recheck_interval = 3
+        first = self._page(1).replace("東京都千代田区丸の内1-1-1", "非公開").replace("1001万円", "非公開")
+        self.scraper.extract_company_data(first, "https://directory.example.co.jp/company/1")
+
+        # 指紋のみのキーには見つからなかった項目を共有しないため、別のドメインでは探す
+        url = "https://other.example.co.jp/company/2"
+        result = self.scraper.extract_company_data(self._page(2), url)
+        assert result == self.heuristic.extract_company_data(self._page(2), url)
+        assert (result["address"], result["capital"]) == ("東京都千代田区丸の内2-1-1", 1002)
+        assert all(not t.absent for key, t in cache._templates.items() if key[0] == "*")
+
+        # 同じドメインでは interval 回に1回だけ探し直し、見つかった位置を学習する
+        results = [
+            self.scraper.extract_company_data(self._page(i), f"https://directory.example.co.jp/company/{i}")
+            for i in range(3, 7)
+        ]
+        assert [r["capital"] for r in results] == [None, None, 1005, 1006]
+        assert [r["phone"] for r in results] == [f"03-1234-{i:04d}" for i in range(3, 7)]
+        template = cache.lookup("https://directory.example.co.jp/company/7", cache.fingerprint(BeautifulSoup(self._page(7), "html.parser")))
+        assert {"address", "capital"} <= set(template.paths)
+
+    def test_invalidate_removes_shared_template(self):
+        url = "https://directory.example.co.jp/company/1"
+        self.scraper.extract_company_data(self._page(1), url)
+        cache = self.scraper.template_cache
+        fingerprint = cache.fingerprint(BeautifulSoup(self._page(1), "html.parser"))
+
+        cache.invalidate(cache.lookup(url, fingerprint))
+        assert cache.lookup("https://other.example.co.jp/company/1", fingerprint) is None
+        assert cache.stats()["templates"] == 0
+
+# 記録・再生トランスポートのテスト
+class TestReplayTransport:
+    def test_archive_round_trip(self, tmp_path):
+        path = str(tmp_path / "archive.zip")
+        archive = FetchArchive(path)
+        archive.add(FetchResponse("https://a.example.co.jp/", 200, "株式会社A".encode("shift_jis"), "shift_jis"))
+        archive.add(FetchResponse("https://b.example.co.jp/", 500, b""))
+        archive.close()
+
+        reopened = FetchArchive(path)
+        assert len(reopened) == 2
+        assert reopened.get("https://a.example.co.jp/").text() == "株式会社A"
+        assert reopened.get("https://b.example.co.jp/").status == 500
+        assert reopened.get("https://c.example.co.jp/") is None
+
+    def test_replay_latency_and_missing(self, tmp_path):
+        path = str(tmp_path / "archive.zip")
+        archive = FetchArchive(path)
+        archive.add(FetchResponse("https://a.example.co.jp/", 200, b"<html></html>", "utf-8"))
+        archive.close()
+        transport = ReplayTransport(path, latency=0.05)
+
+        async def main():
+            async with transport.session() as session:
+                start = asyncio.get_running_loop().time()
+                found = await transport.fetch(session, "https://a.example.co.jp/", timeout=1)
+                elapsed = asyncio.get_running_loop().time() - start
+                missing = await transport.fetch(session, "https://z.example.co.jp/", timeout=1)
+            return found, elapsed, missing
+
+        found, elapsed, missing = asyncio.run(main())
+
+        assert found.text() == "<html></html>"
+        assert elapsed >= 0.05
+        assert missing.status == 404
+
+# クロールの計測値のテスト
+class TestCrawlStats:
+    def test_histogram_percentiles(self):
+        histogram = Histogram()
+        for seconds in [0.005] * 90 + [0.2] * 9 + [12.0]:
+            histogram.observe(seconds)
+
+        assert histogram.percentile(50) == 10.0
+        assert histogram.percentile(99) == 250.0
+        assert histogram.percentile(100) == 30000.0
+        assert histogram.to_dict()["max_ms"] == 12000.0
+
+    def test_crawl_records_per_host_and_yield(self, tmp_path):
+        path = str(tmp_path / "archive.zip")
+        search_url = "https://search.example.com/?q=" + quote_plus("テスト 会社 企業 電話番号")
+        archive = FetchArchive(path)
+        archive.add(FetchResponse(search_url, 200, (
+            '<a href="https://a.example.co.jp/">A</a><a href="https://b.example.co.jp/">B</a>'
+            '<a href="https://c.example.co.jp/">C</a>'
+        ).encode("utf-8"), "utf-8"))
+        archive.add(FetchResponse("https://a.example.co.jp/", 200, "<title>株式会社A</title>".encode("utf-8"), "utf-8"))
+        archive.add(FetchResponse("https://b.example.co.jp/", 200, b"<html></html>", "utf-8"))
+        archive.close()
+
+        scraper = WebScraper(delay_between_requests=0, transport=ReplayTransport(path))
+        scraper.search_engines = {"engine": "https://search.example.com/?q={query}"}
+        scraper.directory_sites = {}
+        stats = CrawlStats()
+
+        results = asyncio.run(scraper.search_by_keyword(["テスト"], max_results=10, stats=stats, job_key="job:1"))
+        summary = stats.to_dict()
+
+        assert len(results) == 1
+        assert summary["requests"] == 4
+        assert summary["sources"]["engine"]["requests"] == 1
+        assert summary["sources"]["company"]["statuses"] == {"200": 2, "404": 1}
+        assert summary["hosts"]["c.example.co.jp"]["statuses"] == {"404": 1}
+        assert summary["company_pages"] == 2
+        assert summary["valid_records"] == 1
+        assert summary["accepted"] == 1
+        assert summary["parse"]["company"]["count"] == 2
+        # 完了したクロールはプロセス全体の集計に加算される
+        assert scraper.active_stats == {}
+        assert scraper.stats.to_dict()["requests"] == 4
+
 if __name__ == "__main__":
     pytest.main(["-v", "test_services.py"])